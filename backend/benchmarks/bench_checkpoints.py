@@ -0,0 +1,180 @@
+"""Checkpoint bytes written per run, with and without delta channels.
+
+Runs the research graph against a local fake Gemini server with a byte-counting
+InMemorySaver and compares the append-only channels (`search_query`,
+`web_research_result`, `sources_gathered`) stored as DeltaChannels with the
+previous full rewrite of every channel value at each superstep. Also checks
+that the state restored from the delta checkpoints matches the run's output.
+
+Usage:
+    python benchmarks/bench_checkpoints.py [--loops 1,3,5] [--queries 3] [--serde source-table]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from collections import defaultdict
+
+from langgraph.channels import BinaryOperatorAggregate, DeltaChannel
+from langgraph.checkpoint.memory import InMemorySaver
+
+DELTA_CHANNELS = ("search_query", "web_research_result", "sources_gathered")
+
+
+class CountingSerde:
+    """Serializer wrapper that adds the size of every dumped value to a bucket."""
+
+    def __init__(self, serde):
+        """Wrap `serde`, counting bytes into the `checkpoints` bucket."""
+        self.serde = serde
+        self.bucket = "checkpoints"
+        self.written = defaultdict(int)
+
+    def dumps_typed(self, obj):
+        """Serialize `obj` and add its size to the current bucket."""
+        dumped = self.serde.dumps_typed(obj)
+        self.written[self.bucket] += len(dumped[1])
+        return dumped
+
+    def loads_typed(self, data):
+        """Deserialize `data` with the wrapped serializer."""
+        return self.serde.loads_typed(data)
+
+
+class CountingSaver(InMemorySaver):
+    """InMemorySaver counting the bytes of checkpoints (with channel blobs) and writes."""
+
+    def __init__(self, serde=None):
+        """Create a saver counting what `serde` writes."""
+        super().__init__(serde=serde)
+        self.serde = CountingSerde(self.serde)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        """Store a checkpoint, counting it in the `checkpoints` bucket."""
+        self.serde.bucket = "checkpoints"
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        """Store pending writes, counting them in the `writes` bucket."""
+        self.serde.bucket = "writes"
+        return super().put_writes(config, writes, task_id, task_path)
+
+
+def compile_graph(saver, variant, snapshot_frequency):
+    """Compile the graph, replacing the delta channels for the `full` variant."""
+    from agent.graph import builder
+    from agent.state import add_unique_queries, add_unique_sources
+
+    graph = builder.compile(checkpointer=saver)
+    reducers = {
+        "search_query": add_unique_queries,
+        "web_research_result": lambda left, right: left + right,
+        "sources_gathered": add_unique_sources,
+    }
+    for name in DELTA_CHANNELS:
+        current = graph.channels[name]
+        if variant == "full":
+            channel = BinaryOperatorAggregate(list, reducers[name])
+        elif snapshot_frequency:
+            channel = DeltaChannel(
+                current.reducer, list, snapshot_frequency=snapshot_frequency
+            )
+        else:
+            continue
+        channel.key = name
+        graph.channels[name] = channel
+    return graph
+
+
+async def run(variant, loops, queries, serde, snapshot_frequency):
+    """Run one research thread and return what its checkpoints and writes took."""
+    from langchain_core.messages import HumanMessage
+
+    saver = CountingSaver(serde)
+    graph = compile_graph(saver, variant, snapshot_frequency)
+    config = {
+        "configurable": {
+            "thread_id": f"{variant}-{loops}",
+            "max_research_loops": loops,
+            "search_cache_backend": "none",
+            "answer_cache_backend": "none",
+            "min_information_gain": 0.0,
+        }
+    }
+    result = await graph.ainvoke(
+        {
+            "messages": [HumanMessage(content="How are renewables changing the grid?")],
+            "initial_search_query_count": queries,
+            "max_research_loops": loops,
+        },
+        config,
+    )
+    start = time.perf_counter()
+    restored = (await graph.aget_state(config)).values
+    restore_seconds = time.perf_counter() - start
+    for name in DELTA_CHANNELS:
+        assert restored[name] == result[name], f"{name} restored differently"
+    return saver.serde.written, restore_seconds, len(result["sources_gathered"])
+
+
+def main() -> None:
+    """Parse the arguments and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loops", default="1,3,5")
+    parser.add_argument("--queries", type=int, default=3)
+    parser.add_argument(
+        "--serde",
+        choices=["jsonplus", "source-table", "compressed"],
+        default="jsonplus",
+    )
+    parser.add_argument(
+        "--snapshot-frequency",
+        type=int,
+        default=None,
+        help="Override the delta channels' snapshot frequency",
+    )
+    args = parser.parse_args()
+
+    from fake_gemini import FakeGeminiServer
+
+    serde = None
+    if args.serde == "source-table":
+        from agent.serde import SourceTableSerializer
+
+        serde = SourceTableSerializer()
+    elif args.serde == "compressed":
+        from agent.serde import CompressedSerializer
+
+        serde = CompressedSerializer()
+
+    with FakeGeminiServer(latency=0.0) as server:
+        os.environ["GEMINI_API_KEY"] = "fake"
+        os.environ["GOOGLE_GEMINI_BASE_URL"] = server.url
+        # One event loop for every run: the pooled Gemini clients are bound to it
+        asyncio.run(report(args, serde))
+
+
+async def report(args, serde):
+    """Print the bytes stored per loop count and channel variant."""
+    print(
+        f"{'loops':>5} {'channels':<8} {'sources':>7} {'checkpoints KiB':>16} "
+        f"{'writes KiB':>11} {'total KiB':>10} {'vs full':>8} {'restore ms':>11}"
+    )
+    for loops in [int(value) for value in args.loops.split(",")]:
+        totals = {}
+        for variant in ("full", "delta"):
+            written, restore_seconds, sources = await run(
+                variant, loops, args.queries, serde, args.snapshot_frequency
+            )
+            total = written["checkpoints"] + written["writes"]
+            totals[variant] = total
+            print(
+                f"{loops:>5} {variant:<8} {sources:>7} {written['checkpoints'] / 1024:>16.1f} "
+                f"{written['writes'] / 1024:>11.1f} {total / 1024:>10.1f} "
+                f"{total / totals['full']:>8.0%} {restore_seconds * 1000:>11.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
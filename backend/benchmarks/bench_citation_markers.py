@@ -0,0 +1,101 @@
+"""Micro-benchmark for `agent.utils.insert_citation_markers`.
+
+Compares the single-join implementation with the previous repeated-slicing one
+on texts from 10 KB to 1 MB with up to 10k citations.
+
+Usage:
+    python benchmarks/bench_citation_markers.py [--repeat 3]
+"""
+
+import argparse
+import random
+import time
+
+from agent.sources import Citation, make_source
+from agent.utils import insert_citation_markers
+
+
+def legacy_insert_citation_markers(text, citations_list):
+    """Previous implementation: rebuilds the string once per citation."""
+    sorted_citations = sorted(
+        citations_list, key=lambda c: (c.end_index, c.start_index), reverse=True
+    )
+    modified_text = text
+    for citation_info in sorted_citations:
+        end_idx = citation_info.end_index
+        marker_to_insert = ""
+        for segment in citation_info.segments:
+            marker_to_insert += f" [{segment.label}]({segment.short_url})"
+        modified_text = (
+            modified_text[:end_idx] + marker_to_insert + modified_text[end_idx:]
+        )
+    return modified_text
+
+
+def make_case(size, n_citations, seed=0):
+    """Build a response text of `size` characters and `n_citations` citations."""
+    rng = random.Random(seed)
+    words = ["solar", "wind", "grid", "storage", "policy", "market", "growth"]
+    chunks = []
+    length = 0
+    while length < size:
+        word = rng.choice(words)
+        chunks.append(word)
+        length += len(word) + 1
+    text = " ".join(chunks)[:size]
+    citations = []
+    for i in range(n_citations):
+        end = rng.randrange(1, len(text))
+        citations.append(
+            Citation(
+                start_index=rng.randrange(0, end),
+                end_index=end,
+                segments=(
+                    make_source(
+                        label="source",
+                        short_url=f"https://vertexaisearch.cloud.google.com/id/0-{i}",
+                        value="",
+                    ),
+                ),
+            )
+        )
+    return text, citations
+
+
+def best_of(fn, repeat):
+    """Return the fastest of `repeat` timings of `fn`."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main() -> None:
+    """Parse the arguments and print the timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'text':>8} {'citations':>9} {'legacy ms':>10} {'join ms':>9} {'speedup':>8}"
+    )
+    for size in (10_000, 100_000, 1_000_000):
+        for n_citations in (100, 1_000, 10_000):
+            text, citations = make_case(size, n_citations)
+            legacy_time, expected = best_of(
+                lambda: legacy_insert_citation_markers(text, citations), args.repeat
+            )
+            new_time, actual = best_of(
+                lambda: insert_citation_markers(text, citations), args.repeat
+            )
+            assert actual == expected, "implementations disagree on ASCII text"
+            print(
+                f"{size // 1000:>6}KB {n_citations:>9} {legacy_time * 1000:>10.2f} "
+                f"{new_time * 1000:>9.2f} {legacy_time / new_time:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Source page enrichment against a local fixture web server.
+
+Fetches HTML articles, oversized pages, PDFs and redirects from `FakeWebServer`
+through `PageFetcher` and checks that:
+
+- the extracted text holds the article and none of the navigation or scripts,
+- oversized pages stop downloading near the byte cap and PDFs are skipped,
+- no host ever has more than `--per-host` requests in flight and connections
+  are reused,
+- a second pass is served from the disk cache and, once it is stale, pages are
+  revalidated with their ETag (304s).
+
+Reports the time and connections of each pass.
+
+Usage:
+    python benchmarks/bench_enrichment.py [--pages 200] [--per-host 4] [--latency 0.02]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+
+async def fetch_pass(fetcher, server, urls, label):
+    """Fetch `urls`, print the counters of the pass and return the pages."""
+    connections = server.connections
+    fetcher.stats.clear()
+    start = time.perf_counter()
+    pages = await fetcher.fetch_many(urls)
+    seconds = time.perf_counter() - start
+    stats = dict(fetcher.stats)
+    print(
+        f"{label:<13} {seconds * 1000:>8.0f} ms {len(pages):>6} pages "
+        f"{stats.get('requests', 0):>6} requests {server.connections - connections:>5} connections "
+        f"{stats.get('cache_hits', 0):>5} cached {stats.get('not_modified', 0):>5} 304s"
+    )
+    return pages
+
+
+async def report(args, server):
+    """Fetch the pages cold, from the disk cache and revalidated, checking the results."""
+    from agent.enrichment import PageCache, PageFetcher
+
+    # Two host names for the same server, to check the limit is per host
+    hosts = [f"http://127.0.0.1:{server.port}", f"http://localhost:{server.port}"]
+    urls = [f"{hosts[n % 2]}/page/{n}" for n in range(args.pages)]
+    urls += [f"{hosts[0]}/redirect/{n}" for n in range(args.pages, args.pages + 10)]
+    urls += [f"{hosts[1]}/big/{n}" for n in range(3)]
+    urls += [f"{hosts[0]}/file/{n}.pdf" for n in range(5)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = PageCache(str(Path(directory) / "pages.sqlite3"))
+        fetcher = PageFetcher(
+            timeout_seconds=10.0,
+            max_bytes=args.max_bytes,
+            max_chars=8000,
+            connections_per_host=args.per_host,
+            cache=cache,
+            cache_ttl_seconds=3600,
+            allowed_hosts=("127.0.0.1", "localhost"),
+        )
+        pages = await fetch_pass(fetcher, server, urls, "cold")
+        read_bytes = fetcher.stats["bytes"]
+
+        article = pages[urls[0]]
+        assert "Grid operators added 0 gigawatts" in article["text"], article
+        assert not any(
+            marker in article["text"]
+            for marker in ("NAV_TEXT", "SCRIPT_TEXT", "FOOTER_TEXT")
+        ), article
+        assert article["title"] == "Article 0"
+        redirected = pages[f"{hosts[0]}/redirect/{args.pages}"]
+        assert redirected["url"].endswith(f"/page/{args.pages}")
+        assert all(pages[f"{hosts[1]}/big/{n}"]["truncated"] for n in range(3))
+        assert not any(url.endswith(".pdf") for url in pages)
+        # Per-host limits across two host names
+        assert server.max_in_flight <= 2 * args.per_host, server.max_in_flight
+        print(
+            f"max in flight {server.max_in_flight} (limit {args.per_host} per host, 2 hosts), "
+            f"{read_bytes / 1e6:.1f} MB read for "
+            f"{3 * server.big_page_bytes / 1e6:.0f} MB of oversized pages"
+        )
+
+        await fetch_pass(fetcher, server, urls, "disk cache")
+        fetcher.cache_ttl_seconds = 0
+        before = server.requests["not_modified"]
+        await fetch_pass(fetcher, server, urls, "revalidated")
+        assert server.requests["not_modified"] - before >= args.pages
+    print("ok")
+
+
+def main() -> None:
+    """Parse the arguments and run the report against a local server."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--per-host", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--max-bytes", type=int, default=256_000)
+    args = parser.parse_args()
+
+    from fake_web import FakeWebServer
+
+    with FakeWebServer(latency=args.latency, big_page_bytes=32_000_000) as server:
+        asyncio.run(report(args, server))
+
+
+if __name__ == "__main__":
+    main()
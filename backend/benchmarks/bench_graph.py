@@ -0,0 +1,179 @@
+"""End-to-end benchmark of the research graph against a local fake Gemini server.
+
+No GEMINI_API_KEY is needed: the parent process starts `FakeGeminiServer` and
+runs every configuration in a fresh worker process, so peak RSS is measured per
+configuration. Reports p50/p95 end-to-end latency, runs/sec at the requested
+concurrency, mean time per node and peak RSS.
+
+Usage:
+    python benchmarks/bench_graph.py --initial-queries 1,3 --loops 1,2 --concurrency 1,20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(values, q):
+    """Return the `q` quantile of `values`, nearest rank."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_once(graph, question, initial_queries, loops, configurable):
+    """Run the graph once and return its wall time and the time spent per node."""
+    from langchain_core.messages import HumanMessage
+
+    node_times = defaultdict(float)
+    started = {}
+    start = time.perf_counter()
+    async for _, chunk in graph.astream(
+        {
+            "messages": [HumanMessage(content=question)],
+            "initial_search_query_count": initial_queries,
+            "max_research_loops": loops,
+        },
+        {"configurable": {"max_research_loops": loops, **configurable}},
+        stream_mode=["tasks"],
+    ):
+        if "result" in chunk or "error" in chunk:
+            node_times[chunk["name"]] += time.perf_counter() - started.pop(chunk["id"])
+        else:
+            started[chunk["id"]] = time.perf_counter()
+    return time.perf_counter() - start, node_times
+
+
+async def worker(args):
+    """Run the questions of one worker process and return its timings."""
+    from agent.graph import graph
+
+    configurable = json.loads(args.configurable)
+    semaphore = asyncio.Semaphore(args.concurrency[0])
+    latencies = []
+    node_totals = defaultdict(float)
+
+    async def one(i):
+        async with semaphore:
+            latency, node_times = await run_once(
+                graph,
+                f"Benchmark question {i}",
+                args.initial_queries[0],
+                args.loops[0],
+                configurable,
+            )
+        latencies.append(latency)
+        for name, seconds in node_times.items():
+            node_totals[name] += seconds
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.runs)))
+    elapsed = time.perf_counter() - start
+
+    print(
+        json.dumps(
+            {
+                "p50": percentile(latencies, 0.5),
+                "p95": percentile(latencies, 0.95),
+                "runs_per_sec": args.runs / elapsed,
+                "node_seconds": {k: v / args.runs for k, v in node_totals.items()},
+                # ru_maxrss is in KiB on Linux and bytes on macOS
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                / (1024 * 1024 if sys.platform == "darwin" else 1024),
+            }
+        )
+    )
+
+
+def parse_ints(value):
+    """Parse a comma-separated list of integers."""
+    return [int(item) for item in value.split(",")]
+
+
+def main() -> None:
+    """Parse the arguments and print the latency report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--initial-queries", type=parse_ints, default=[1, 3])
+    parser.add_argument("--loops", type=parse_ints, default=[1, 2])
+    parser.add_argument("--concurrency", type=parse_ints, default=[1, 20])
+    parser.add_argument("--runs", type=int, default=20, help="Runs per configuration")
+    parser.add_argument("--search-latency", type=float, default=0.5)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Share of 429/503 answers"
+    )
+    parser.add_argument(
+        "--configurable",
+        default='{"search_cache_backend": "none", "answer_cache_backend": "none"}',
+        help="JSON object merged into the configurable section of every run",
+    )
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(worker(args))
+        return
+
+    from fake_gemini import FakeGeminiServer
+
+    latency = {
+        "search": args.search_latency,
+        "structured": args.llm_latency,
+        "answer": args.llm_latency,
+    }
+    with FakeGeminiServer(
+        latency=latency, jitter=args.jitter, error_rate=args.error_rate
+    ) as server:
+        env = {
+            **os.environ,
+            "GEMINI_API_KEY": "benchmark",
+            "GOOGLE_GEMINI_BASE_URL": server.url,
+            "PYTHONPATH": os.pathsep.join(
+                [str(BACKEND_DIR / "src"), os.environ.get("PYTHONPATH", "")]
+            ),
+        }
+        header = f"{'queries':>7} {'loops':>5} {'conc':>5} {'p50 s':>7} {'p95 s':>7} {'runs/s':>7} {'rss MB':>7}  per-node mean s"
+        print(header)
+        for initial_queries in args.initial_queries:
+            for loops in args.loops:
+                for concurrency in args.concurrency:
+                    output = subprocess.run(
+                        [
+                            sys.executable,
+                            __file__,
+                            "--worker",
+                            f"--initial-queries={initial_queries}",
+                            f"--loops={loops}",
+                            f"--concurrency={concurrency}",
+                            f"--runs={args.runs}",
+                            f"--configurable={args.configurable}",
+                        ],
+                        env=env,
+                        check=True,
+                        stdout=subprocess.PIPE,
+                        text=True,
+                    ).stdout
+                    result = json.loads(output.strip().splitlines()[-1])
+                    nodes = " ".join(
+                        f"{name}={seconds:.2f}"
+                        for name, seconds in sorted(result["node_seconds"].items())
+                    )
+                    print(
+                        f"{initial_queries:>7} {loops:>5} {concurrency:>5} "
+                        f"{result['p50']:>7.2f} {result['p95']:>7.2f} "
+                        f"{result['runs_per_sec']:>7.2f} {result['peak_rss_mb']:>7.0f}  {nodes}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Import-time benchmark for `agent.graph`.
+
+Runs `python -X importtime -c "import agent.graph"` in fresh interpreters without
+GEMINI_API_KEY and reports the best total import time, the slowest modules and
+whether any of the client libraries that should load lazily were imported.
+
+Usage:
+    python benchmarks/bench_import.py [--repeat 5] [--top 15] [--module agent.graph]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+LAZY_MODULES = ("google.genai", "langchain_google_genai", "numpy", "dotenv")
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(module):
+    """Import `module` in a fresh interpreter and return its import-time profile."""
+    env = {key: value for key, value in os.environ.items() if key != "GEMINI_API_KEY"}
+    env["PYTHONPATH"] = os.pathsep.join(
+        [str(BACKEND_DIR / "src"), os.environ.get("PYTHONPATH", "")]
+    )
+    check = ", ".join(repr(name) for name in LAZY_MODULES)
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys, {module}; print([m for m in ({check}) if m in sys.modules])",
+        ],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(cumulative_us), len(indent) // 2))
+    total = next(cumulative for name, cumulative, _ in entries if name == module)
+    return total, entries, result.stdout.strip()
+
+
+def main() -> None:
+    """Parse the arguments and print the import-time report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--module", default="agent.graph")
+    args = parser.parse_args()
+
+    runs = [import_profile(args.module) for _ in range(args.repeat)]
+    totals = sorted(total for total, _, _ in runs)
+    best_total, entries, eager = min(runs, key=lambda run: run[0])
+
+    print(
+        f"import {args.module}: best {best_total / 1000:.0f} ms, "
+        f"median {totals[len(totals) // 2] / 1000:.0f} ms over {args.repeat} runs"
+    )
+    print(f"lazy client modules imported eagerly: {eager}")
+    print(f"\n{'cumulative ms':>14}  module (direct imports of {args.module})")
+    # importtime lists children before their parent, one indent level deeper
+    position = next(i for i, entry in enumerate(entries) if entry[0] == args.module)
+    depth = entries[position][2]
+    direct = []
+    for name, cumulative, level in reversed(entries[:position]):
+        if level <= depth:
+            break
+        if level == depth + 1:
+            direct.append((name, cumulative, level))
+    for name, cumulative, _ in sorted(direct, key=lambda e: e[1], reverse=True)[
+        : args.top
+    ]:
+        print(f"{cumulative / 1000:>14.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Source ranking and top-K selection over large synthetic research states.
+
+Builds summaries with citation markers the way `insert_citation_markers` writes
+them, citing sources with Zipf-like popularity. Some sources keep grounding
+redirect links and the rest have publisher URLs on a mix of listed and unlisted
+domains, some with dates. Times `rank_sources` against a pure-Python version of
+the same scoring and checks that both rank the same sources. Then reports how
+much the summaries sent to finalize_answer shrink for several K.
+
+Usage:
+    python benchmarks/bench_ranking.py [--sources 1000,5000,10000] [--top-k 10,25,50]
+"""
+
+import argparse
+import math
+import random
+import time
+from datetime import datetime
+
+DOMAINS = [
+    "energy.gov",
+    "mit.edu",
+    "nature.com",
+    "en.wikipedia.org",
+    "reuters.com",
+    "medium.com",
+    "reddit.com",
+    "example-blog.net",
+    "greentech.io",
+    "gridnews.com",
+]
+
+
+def synthetic_state(n_sources, seed=0):
+    """Build research summaries citing `n_sources` synthetic sources."""
+    from agent.sources import make_source
+
+    rng = random.Random(seed)
+    sources = []
+    pages = {}
+    for i in range(n_sources):
+        short_url = f"https://vertexaisearch.cloud.google.com/id/{i // 8}-{i % 8}"
+        domain = rng.choice(DOMAINS)
+        if rng.random() < 0.3:
+            value = f"https://vertexaisearch.cloud.google.com/grounding-api-redirect/{i:08x}"
+        else:
+            year = rng.choice(
+                ["", "/2016", "/2021", "/2024", f"/{datetime.now().year}"]
+            )
+            value = f"https://{domain}{year}/article-{i}"
+        if rng.random() < 0.1:
+            pages[value] = {
+                "title": f"Report {rng.randint(2010, datetime.now().year)}",
+                "text": "",
+            }
+        sources.append(
+            make_source(label=domain.split(".")[-2], short_url=short_url, value=value)
+        )
+
+    # Zipf-like popularity: a few sources are cited by many summaries
+    weights = [1 / (rank + 1) ** 0.8 for rank in range(n_sources)]
+    summaries = []
+    for _ in range(max(1, n_sources // 10)):
+        parts = []
+        for sentence in range(20):
+            parts.append(f"Finding {sentence} about the grid and storage deployment.")
+            for source in {*rng.choices(sources, weights, k=rng.randint(1, 3))}:
+                parts.append(f" [{source.label}]({source.short_url})")
+            parts.append(" ")
+        summaries.append("".join(parts).strip())
+    return summaries, sources, pages
+
+
+def python_scores(summaries, sources, pages):
+    """Score the sources with dicts and loops, as a reference for `source_features`."""
+    from agent.ranking import (
+        FEATURE_WEIGHTS,
+        RECENCY_HORIZON_YEARS,
+        UNKNOWN_RECENCY,
+        citation_groups,
+        domain_authority,
+        publication_year,
+        source_domain,
+    )
+
+    by_short = {source.short_url: source.value for source in sources}
+    first = {}
+    for source in sources:
+        first.setdefault(source.value, source)
+    citations = dict.fromkeys(first, 0)
+    searches = dict.fromkeys(first, 0)
+    support = dict.fromkeys(first, 0.0)
+    for summary in summaries:
+        cited_here = set()
+        for group in citation_groups(summary):
+            cited = {by_short[url] for url in group if url in by_short}
+            for url in cited:
+                citations[url] += 1
+                support[url] += 1 / len(cited)
+                cited_here.add(url)
+        for url in cited_here:
+            searches[url] += 1
+    max_citations, max_support = max(citations.values()), max(support.values())
+    current_year = datetime.now().year
+    scores = {}
+    for url, source in first.items():
+        page = pages.get(url) or {}
+        year = publication_year(
+            [url, page.get("title", ""), page.get("text", "")[:2000]], current_year
+        )
+        recency = (
+            UNKNOWN_RECENCY
+            if year is None
+            else 1
+            - min(current_year - year, RECENCY_HORIZON_YEARS) / RECENCY_HORIZON_YEARS
+        )
+        features = {
+            "citations": math.log1p(citations[url]) / math.log1p(max_citations),
+            "searches": searches[url] / len(summaries),
+            "support": math.log1p(support[url]) / math.log1p(max_support),
+            "authority": domain_authority(source_domain(source)),
+            "recency": recency,
+        }
+        scores[url] = sum(
+            FEATURE_WEIGHTS[name] * value for name, value in features.items()
+        )
+    return scores
+
+
+def timed(fn, repeat):
+    """Call `fn` `repeat` times and return its result and mean time."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    """Parse the arguments and print the ranking timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sources", default="1000,5000,10000")
+    parser.add_argument("--top-k", default="10,25,50")
+    parser.add_argument("--budget", type=int, default=32000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    import numpy as np
+
+    from agent.context import count_tokens
+    from agent.ranking import FEATURE_WEIGHTS, FEATURES, rank_sources, source_features
+
+    weights = np.array([FEATURE_WEIGHTS[name] for name in FEATURES])
+
+    def numpy_scores(summaries, sources, pages):
+        _, features, _ = source_features(summaries, sources, pages)
+        return features @ weights
+
+    print(
+        "scoring (both parse the markers with citation_groups), and rank_sources end to end"
+    )
+    print(
+        f"{'sources':>7} {'summaries':>9} {'numpy ms':>9} {'python ms':>10} {'speedup':>8} {'rank ms':>8}"
+    )
+    for n_sources in [int(value) for value in args.sources.split(",")]:
+        summaries, sources, pages = synthetic_state(n_sources)
+        _, numpy_seconds = timed(
+            lambda: numpy_scores(summaries, sources, pages), args.repeat
+        )
+        scores, python_seconds = timed(
+            lambda: python_scores(summaries, sources, pages), args.repeat
+        )
+        (_, kept_sources, metrics), rank_seconds = timed(
+            lambda: rank_sources(summaries, sources, 50, args.budget, pages),
+            args.repeat,
+        )
+        expected = sorted(scores.values(), reverse=True)[: metrics["sources_kept"]]
+        kept_scores = sorted(
+            (scores[url] for url in {source.value for source in kept_sources}),
+            reverse=True,
+        )
+        assert all(abs(a - b) < 1e-9 for a, b in zip(kept_scores, expected)), (
+            "rankings differ"
+        )
+        print(
+            f"{n_sources:>7} {len(summaries):>9} {numpy_seconds * 1000:>9.1f} "
+            f"{python_seconds * 1000:>10.1f} {python_seconds / numpy_seconds:>7.1f}x "
+            f"{rank_seconds * 1000:>8.1f}"
+        )
+
+    summaries, sources, pages = synthetic_state(1000)
+    tokens_before = sum(count_tokens(summary) for summary in summaries)
+    print(
+        f"\nsummaries sent to finalize_answer for 1000 sources, {args.budget} token budget"
+    )
+    print(f"{'top K':>6} {'sources':>8} {'summaries':>10} {'tokens':>8} {'vs all':>7}")
+    for top_k in [int(value) for value in args.top_k.split(",")]:
+        _, _, metrics = rank_sources(summaries, sources, top_k, args.budget, pages)
+        print(
+            f"{top_k:>6} {metrics['sources_kept']:>8} {metrics['summaries_kept']:>10} "
+            f"{metrics['tokens_after']:>8} {metrics['tokens_after'] / tokens_before:>7.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Redirect link resolution against a local redirect server.
+
+Resolves grounding-style redirect links served by `FakeWebServer` (two hops and
+a tracking parameter before the page, four links per page) with
+`RedirectResolver` and checks that:
+
+- every link resolves to the canonical page URL and expired links are kept,
+- no more than `--concurrency` requests are in flight,
+- a second pass is answered by the in-process LRU and a new resolver, as in a
+  later run or another process, by the persistent store, without requests,
+- sources built from the links dedupe to one per page.
+
+Also times following the same links with GET and a new client per link, the
+way a one-off `httpx.get(url, follow_redirects=True)` would, at the same
+concurrency.
+
+Usage:
+    python benchmarks/bench_resolver.py [--links 1000] [--concurrency 16] [--latency 0.02]
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+
+async def resolve_pass(resolver, server, links, label):
+    """Resolve `links`, print the counters of the pass and return the resolved URLs."""
+    heads = server.requests["head"]
+    connections = server.connections
+    resolver.stats.clear()
+    start = time.perf_counter()
+    resolved = await resolver.resolve_many(links)
+    seconds = time.perf_counter() - start
+    print(
+        f"{label:<16} {seconds * 1000:>8.0f} ms {len(links) / seconds:>9.0f} links/s "
+        f"{server.requests['head'] - heads:>6} HEADs {server.connections - connections:>5} connections "
+        f"{resolver.stats.get('hits', 0) + resolver.stats.get('store_hits', 0):>6} cached"
+    )
+    return resolved
+
+
+async def unpooled_pass(links, concurrency):
+    """Resolve `links` with a new client per request, as a baseline."""
+    import httpx
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def follow(link):
+        async with slots, httpx.AsyncClient(follow_redirects=True) as client:
+            await client.get(link)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(follow(link) for link in links))
+    seconds = time.perf_counter() - start
+    print(
+        f"{'GET, new client':<16} {seconds * 1000:>8.0f} ms {len(links) / seconds:>9.0f} links/s"
+    )
+
+
+async def report(args, server):
+    """Resolve the links cold, from memory and from the store, checking the results."""
+    from agent.redirects import RedirectResolver, ResolvedUrlStore
+    from agent.sources import make_source
+    from agent.utils import dedupe_sources
+
+    links = [f"{server.url}/grounding-api-redirect/{n}" for n in range(args.links)]
+    expired = [f"{server.url}/expired/{n}" for n in range(10)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = str(Path(directory) / "resolved_urls.sqlite3")
+        resolver = RedirectResolver(
+            timeout_seconds=5.0,
+            max_concurrency=args.concurrency,
+            store=ResolvedUrlStore(path),
+            hosts=None,
+            allowed_hosts=("127.0.0.1",),
+        )
+        resolved = await resolve_pass(resolver, server, links + expired, "cold")
+        assert resolved[links[5]] == f"{server.url}/page/1", resolved[links[5]]
+        assert all(resolved[link] == link for link in expired)
+        assert server.max_in_flight <= args.concurrency, server.max_in_flight
+        print(f"max in flight {server.max_in_flight} (limit {args.concurrency})")
+
+        await resolve_pass(resolver, server, links, "memory LRU")
+        later = RedirectResolver(
+            5.0,
+            args.concurrency,
+            ResolvedUrlStore(path),
+            hosts=None,
+            allowed_hosts=("127.0.0.1",),
+        )
+        await resolve_pass(later, server, links, "persistent store")
+
+    sources = [
+        make_source(
+            label=f"site{n}",
+            short_url=f"https://vertexaisearch.cloud.google.com/id/{n}",
+            value=resolved[link],
+        )
+        for n, link in enumerate(links)
+    ]
+    unique = dedupe_sources(sources)
+    assert len(unique) == len({resolved[link] for link in links})
+    print(f"{len(sources)} sources dedupe to {len(unique)} canonical pages")
+
+    await unpooled_pass(links[: args.unpooled], args.concurrency)
+    print("ok")
+
+
+def main() -> None:
+    """Parse the arguments and run the report against a local server."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument(
+        "--unpooled",
+        type=int,
+        default=200,
+        help="Links followed with a new client each",
+    )
+    args = parser.parse_args()
+
+    from fake_web import FakeWebServer
+
+    with FakeWebServer(latency=args.latency) as server:
+        asyncio.run(report(args, server))
+
+
+if __name__ == "__main__":
+    main()
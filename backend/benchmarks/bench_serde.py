@@ -0,0 +1,187 @@
+"""Serialization throughput and size of graph state and stream payloads by format.
+
+Runs the research graph against a local fake Gemini server and serializes what
+it produces in two ways:
+
+- `checkpoint`: every channel value of the final states, as a checkpointer stores it;
+- `stream`: every `updates` event, as sent to streaming clients.
+
+Each is encoded as JSON (the current stream format), JsonPlus msgpack (the
+default checkpoint format) and msgpack + zstd without and with a dictionary
+trained on the summaries and answers of separate runs. Throughput is in MB of
+JSON per second for every format, so the columns compare like for like. The
+fake server's summaries are random words between citation links, so real
+summaries compress better.
+
+Usage:
+    python benchmarks/bench_serde.py [--runs 8] [--loops 2] [--queries 3] [--dict-size 16384]
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import time
+
+
+def to_json(obj):
+    """Convert `obj` to something `json.dumps` accepts."""
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    return str(obj)
+
+
+async def collect(graph, runs, loops, queries, offset):
+    """Return the `updates` events and final states of `runs` research runs."""
+    from langchain_core.messages import HumanMessage
+
+    updates, states = [], []
+    config = {
+        "configurable": {
+            "max_research_loops": loops,
+            "search_cache_backend": "none",
+            "answer_cache_backend": "none",
+            "min_information_gain": 0.0,
+        }
+    }
+    for i in range(offset, offset + runs):
+        async for mode, chunk in graph.astream(
+            {
+                "messages": [
+                    HumanMessage(
+                        content=f"Research topic {i}: how is the grid changing?"
+                    )
+                ],
+                "initial_search_query_count": queries,
+                "max_research_loops": loops,
+            },
+            config,
+            stream_mode=["updates", "values"],
+        ):
+            if mode == "updates":
+                updates.append(chunk)
+            else:
+                state = chunk
+        states.append(state)
+    return updates, states
+
+
+def training_samples(states):
+    """Collect research summaries and answers to train a dictionary on."""
+    samples = []
+    for state in states:
+        samples.extend(state["web_research_result"])
+        samples.extend(
+            message.content for message in state["messages"] if message.content
+        )
+    return [sample.encode("utf-8") for sample in samples]
+
+
+def measure(values, dumps, loads, repeat):
+    """Return the encoded bytes and the encode and decode seconds per pass."""
+    for value in values:
+        loads(dumps(value))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encoded = [dumps(value) for value in values]
+    encode_seconds = (time.perf_counter() - start) / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in encoded:
+            loads(item)
+    decode_seconds = (time.perf_counter() - start) / repeat
+    return (
+        sum(len(item[1] if isinstance(item, tuple) else item) for item in encoded),
+        encode_seconds,
+        decode_seconds,
+    )
+
+
+def formats(dictionary):
+    """Build the encode and decode functions of each format."""
+    import ormsgpack
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+    from agent.codec import ZstdCodec
+    from agent.serde import CompressedSerializer
+
+    plain, trained = ZstdCodec(), ZstdCodec(dictionary)
+    checkpoint = {
+        "json": (lambda v: json.dumps(v, default=to_json).encode(), json.loads),
+        "msgpack": (JsonPlusSerializer().dumps_typed, JsonPlusSerializer().loads_typed),
+    }
+    stream = {
+        "json": (lambda v: json.dumps(v).encode(), json.loads),
+        "msgpack": (ormsgpack.packb, ormsgpack.unpackb),
+    }
+    for name, codec in (("msgpack+zstd", plain), ("msgpack+zstd+dict", trained)):
+        serde = CompressedSerializer(codec, min_size=0)
+        checkpoint[name] = (serde.dumps_typed, serde.loads_typed)
+        stream[name] = (
+            lambda v, codec=codec: codec.encode_frame("updates", v),
+            lambda b, codec=codec: next(codec.iter_frames([b])),
+        )
+    return {"checkpoint": checkpoint, "stream": stream}
+
+
+async def report(args):
+    """Print the size and speed of each format for checkpoints and stream events."""
+    from agent.codec import train_dictionary
+    from agent.graph import builder
+
+    graph = builder.compile()
+    _, training = await collect(graph, args.runs, args.loops, args.queries, offset=1000)
+    dictionary = train_dictionary(training_samples(training), args.dict_size)
+    updates, states = await collect(
+        graph, args.runs, args.loops, args.queries, offset=0
+    )
+
+    payloads = {
+        "checkpoint": [value for state in states for value in state.values()],
+        # Streaming clients receive the events as JSON
+        "stream": [
+            json.loads(json.dumps(update, default=to_json)) for update in updates
+        ],
+    }
+    print(f"dictionary: {len(dictionary)} bytes trained on {args.runs} separate runs")
+    print(
+        f"{'payload':<11} {'format':<18} {'KiB':>8} {'ratio':>6} {'ser MB/s':>9} {'de MB/s':>8}"
+    )
+    for kind, codecs in formats(dictionary).items():
+        values = payloads[kind]
+        json_bytes = None
+        for name, (dumps, loads) in codecs.items():
+            size, encode_seconds, decode_seconds = measure(
+                values, dumps, loads, args.repeat
+            )
+            json_bytes = json_bytes or size
+            print(
+                f"{kind:<11} {name:<18} {size / 1024:>8.1f} {json_bytes / size:>5.1f}x "
+                f"{json_bytes / encode_seconds / 1e6:>9.1f} {json_bytes / decode_seconds / 1e6:>8.1f}"
+            )
+
+
+def main() -> None:
+    """Parse the arguments and print the report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=8)
+    parser.add_argument("--loops", type=int, default=2)
+    parser.add_argument("--queries", type=int, default=3)
+    parser.add_argument("--dict-size", type=int, default=16 * 1024)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    from fake_gemini import FakeGeminiServer
+
+    with FakeGeminiServer(latency=0.0) as server:
+        os.environ["GEMINI_API_KEY"] = "fake"
+        os.environ["GOOGLE_GEMINI_BASE_URL"] = server.url
+        # One event loop for every run: the pooled Gemini clients are bound to it
+        asyncio.run(report(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""Memory and checkpoint-size benchmark for sources_gathered.
+
+Simulates the sources gathered by a 5-loop run and compares the previous
+dict-per-segment representation with interned `Source` records stored through
+`SourceTableSerializer`.
+
+Usage:
+    python benchmarks/bench_sources.py [--loops 5] [--queries 3]
+"""
+
+import argparse
+import json
+import random
+import tracemalloc
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from agent.serde import SourceTableSerializer
+from agent.sources import make_source
+
+CHUNKS_PER_SEARCH = 10
+SUPPORTS_PER_SEARCH = 25
+
+
+def simulate_segments(loops, queries, seed=0):
+    """Yield, per superstep, the (label, short_url, value) segments it gathers."""
+    rng = random.Random(seed)
+    search_id = 0
+    for _ in range(loops + 1):
+        step = []
+        for _ in range(queries):
+            chunks = [
+                (
+                    f"site{rng.randrange(200)}",
+                    f"https://vertexaisearch.cloud.google.com/id/{search_id}-{idx}",
+                    "https://vertexaisearch.cloud.google.com/grounding-api-redirect/"
+                    + "".join(
+                        rng.choices(
+                            "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdef0123456789_-", k=180
+                        )
+                    ),
+                )
+                for idx in range(CHUNKS_PER_SEARCH)
+            ]
+            for _ in range(SUPPORTS_PER_SEARCH):
+                step.extend(rng.sample(chunks, rng.randint(1, 3)))
+            search_id += 1
+        yield step
+
+
+def build(steps, as_records):
+    """Gather the sources of `steps` as records or as dicts."""
+    gathered = []
+    for step in steps:
+        if as_records:
+            gathered.extend(make_source(*segment) for segment in step)
+        else:
+            gathered.extend(
+                {"label": label, "short_url": short_url, "value": value}
+                for label, short_url, value in step
+            )
+    return gathered
+
+
+def measure_memory(steps, as_records):
+    """Gather the sources of `steps` and return them with the bytes they take."""
+    tracemalloc.start()
+    gathered = build(steps, as_records)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return gathered, current
+
+
+def checkpoint_bytes(steps, dump):
+    """Bytes for the final channel value and summed over every superstep write."""
+    gathered = []
+    total = 0
+    size = 0
+    for step in steps:
+        gathered = gathered + step
+        size = len(dump(gathered))
+        total += size
+    return size, total
+
+
+def main() -> None:
+    """Parse the arguments and print the memory and checkpoint sizes."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loops", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=3)
+    args = parser.parse_args()
+
+    steps = list(simulate_segments(args.loops, args.queries))
+    dicts, dict_memory = measure_memory(steps, as_records=False)
+    records, record_memory = measure_memory(steps, as_records=True)
+
+    record_steps = [[make_source(*segment) for segment in step] for step in steps]
+    dict_steps = [
+        [
+            {"label": label, "short_url": short, "value": value}
+            for label, short, value in step
+        ]
+        for step in steps
+    ]
+    jsonplus = JsonPlusSerializer()
+    table = SourceTableSerializer()
+    rows = [
+        (
+            "json (dicts)",
+            checkpoint_bytes(dict_steps, lambda v: json.dumps(v).encode()),
+        ),
+        (
+            "jsonplus (dicts)",
+            checkpoint_bytes(dict_steps, lambda v: jsonplus.dumps_typed(v)[1]),
+        ),
+        (
+            "jsonplus (records)",
+            checkpoint_bytes(record_steps, lambda v: jsonplus.dumps_typed(v)[1]),
+        ),
+        (
+            "source table (records)",
+            checkpoint_bytes(record_steps, lambda v: table.dumps_typed(v)[1]),
+        ),
+    ]
+
+    print(f"{len(dicts)} sources gathered over {args.loops} loops")
+    print(
+        f"memory: dicts {dict_memory / 1024:.0f} KiB, records {record_memory / 1024:.0f} KiB "
+        f"({record_memory / dict_memory:.0%})"
+    )
+    baseline_final, baseline_total = rows[0][1]
+    print(f"{'format':<24} {'final KiB':>10} {'written KiB':>12} {'vs json':>8}")
+    for name, (final, total) in rows:
+        print(
+            f"{name:<24} {final / 1024:>10.1f} {total / 1024:>12.1f} {final / baseline_final:>8.0%}"
+        )
+    assert table.loads_typed(table.dumps_typed(records)) == records
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,486 @@
+"""Local stand-in for the Gemini API used by the benchmarks.
+
+Serves the `generateContent` and `streamGenerateContent` endpoints that both
+google-genai and langchain-google-genai call, the Batch API
+(`batchGenerateContent` with inlined requests, `batches/{id}`) and context
+caching (`cachedContents`), with canned responses:
+
+- grounded searches (requests with the `googleSearch` tool) return a summary with
+  grounding chunks and supports,
+- structured output requests return a `SearchQueryList` or `Reflection` payload,
+- everything else is treated as the final answer and cites the short urls found
+  in the prompt.
+
+Point the clients at it with `GOOGLE_GEMINI_BASE_URL=<server.url>`.
+"""
+
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+_ROUTE_RE = re.compile(
+    r"^/v1beta/models/([^:/]+):(generateContent|streamGenerateContent|batchGenerateContent)"
+)
+_BATCH_RE = re.compile(r"^/v1beta/batches/([^/?]+)")
+_CACHE_RE = re.compile(r"^/v1beta/cachedContents(?:/([^/?]+))?")
+_SHORT_URL_RE = re.compile(r"https://vertexaisearch\.cloud\.google\.com/id/[\d-]+")
+_NUMBER_QUERIES_RE = re.compile(r"more than (\d+) queries")
+
+DEFAULT_LATENCY = {"search": 0.5, "structured": 0.2, "answer": 0.5}
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(uuid.UUID(int=rng.getrandbits(128)).hex[:10] for _ in range(count))
+
+
+def _prompt_text(body: dict[str, Any]) -> str:
+    return "".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def _usage(prompt: str, output: str, cached: str = "") -> dict[str, int]:
+    prompt_tokens = len(prompt) // 4
+    output_tokens = len(output) // 4
+    usage = {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": output_tokens,
+        "totalTokenCount": prompt_tokens + output_tokens,
+    }
+    if cached:
+        usage["cachedContentTokenCount"] = len(cached) // 4
+    return usage
+
+
+def search_response(prompt: str, rng: random.Random, chunks: int = 5) -> dict[str, Any]:
+    """Build a grounded search response with `chunks` grounding chunks."""
+    sentences = [f"Finding {i} about {_words(rng, 3)}." for i in range(chunks * 2)]
+    text = " ".join(sentences)
+    grounding_chunks = [
+        {
+            "web": {
+                "uri": "https://vertexaisearch.cloud.google.com/grounding-api-redirect/"
+                + uuid.UUID(int=rng.getrandbits(128)).hex,
+                "title": f"source{rng.randrange(1000)}.com",
+            }
+        }
+        for _ in range(chunks)
+    ]
+    supports = []
+    offset = 0
+    for i, sentence in enumerate(sentences):
+        end = offset + len(sentence.encode("utf-8"))
+        supports.append(
+            {
+                "segment": {"startIndex": offset, "endIndex": end, "text": sentence},
+                "groundingChunkIndices": sorted({i % chunks, (i * 7) % chunks}),
+            }
+        )
+        offset = end + 1
+    return {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "groundingMetadata": {
+                    "groundingChunks": grounding_chunks,
+                    "groundingSupports": supports,
+                    "webSearchQueries": [prompt[-80:]],
+                },
+            }
+        ],
+        "usageMetadata": _usage(prompt, text),
+    }
+
+
+def structured_payload(
+    body: dict[str, Any], prompt: str, rng: random.Random
+) -> dict[str, Any]:
+    """Build the JSON payload for a structured output request."""
+    properties = (
+        body["generationConfig"].get("responseJsonSchema", {}).get("properties", {})
+    )
+    if "is_sufficient" in properties:
+        return {
+            "is_sufficient": False,
+            "knowledge_gap": "More detail is needed.",
+            "follow_up_queries": [_words(rng, 3) for _ in range(2)],
+        }
+    match = _NUMBER_QUERIES_RE.search(prompt)
+    count = int(match.group(1)) if match else 3
+    return {
+        "rationale": "Cover the main aspects of the topic.",
+        "query": [_words(rng, 3) for _ in range(count)],
+    }
+
+
+def answer_text(prompt: str) -> str:
+    """Build a final answer citing the short urls that appear in the prompt."""
+    short_urls = list(dict.fromkeys(_SHORT_URL_RE.findall(prompt)))[:10]
+    lines = ["Here is what the research found."]
+    for i, short_url in enumerate(short_urls):
+        lines.append(f"- Point {i} is supported by [source]({short_url}).")
+    return "\n".join(lines)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Hundreds of concurrent runs open connections in bursts
+    request_queue_size = 1024
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients that cancel a straggling request close the connection early
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeGeminiServer:
+    """Threaded HTTP server that answers like the Gemini API.
+
+    Args:
+        latency: Seconds to wait before answering, per request kind ("search",
+            "structured" and "answer"), or one value for every kind.
+        jitter: Relative random variation applied to each latency.
+        error_rate: Share of requests answered with a 429 or 503 error.
+        batch_latency: Seconds before a submitted batch job succeeds.
+        min_cache_tokens: Smallest cached content accepted, in estimated tokens.
+        seed: Seed for the generated queries, summaries and urls.
+    """
+
+    def __init__(
+        self,
+        latency: dict[str, float] | float | None = None,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        batch_latency: float = 1.0,
+        min_cache_tokens: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int = 0,
+    ):
+        """Create the server; it starts listening on `start`."""
+        if latency is None:
+            latency = DEFAULT_LATENCY
+        if not isinstance(latency, dict):
+            latency = {kind: float(latency) for kind in DEFAULT_LATENCY}
+        self.latency = {**DEFAULT_LATENCY, **latency}
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = {kind: 0 for kind in DEFAULT_LATENCY}
+        self.errors = 0
+        self.batch_latency = batch_latency
+        self.batch_jobs: dict[str, dict[str, Any]] = {}
+        self.min_cache_tokens = min_cache_tokens
+        self.cached_contents: dict[str, dict[str, Any]] = {}
+        self.cache_requests = {"create": 0, "update": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        """Return the base URL of the server."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGeminiServer":
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeGeminiServer":
+        """Start the server."""
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        """Stop the server."""
+        self.stop()
+
+    def _sleep(self, kind: str) -> None:
+        with self._lock:
+            self.requests[kind] += 1
+            factor = 1 + self._rng.uniform(-self.jitter, self.jitter)
+        time.sleep(max(0.0, self.latency[kind] * factor))
+
+    def _error_status(self) -> int | None:
+        with self._lock:
+            if self._rng.random() >= self.error_rate:
+                return None
+            self.errors += 1
+            return self._rng.choice((429, 503))
+
+    def _rng_fork(self) -> random.Random:
+        with self._lock:
+            return random.Random(self._rng.getrandbits(64))
+
+    def respond(self, body: dict[str, Any]) -> tuple[str, dict[str, Any]]:
+        """Return the request kind and the response body for a request."""
+        cached = ""
+        if body.get("cachedContent"):
+            # The request continues the cached contents and uses their tools
+            entry = self.cached_contents[body["cachedContent"]]
+            cached = _prompt_text(entry)
+            body = {
+                **body,
+                "contents": entry.get("contents", []) + body.get("contents", []),
+                "tools": entry.get("tools", []),
+            }
+        prompt = _prompt_text(body)
+        rng = self._rng_fork()
+        if any(
+            "googleSearch" in tool or "google_search" in tool
+            for tool in body.get("tools", [])
+        ):
+            response = search_response(prompt, rng)
+            response["usageMetadata"] = _usage(
+                prompt, response["candidates"][0]["content"]["parts"][0]["text"], cached
+            )
+            return "search", response
+        generation_config = body.get("generationConfig", {})
+        if generation_config.get("responseMimeType") == "application/json":
+            text = json.dumps(structured_payload(body, prompt, rng))
+            kind = "structured"
+        else:
+            text = answer_text(prompt)
+            kind = "answer"
+        return kind, {
+            "candidates": [
+                {
+                    "content": {"role": "model", "parts": [{"text": text}]},
+                    "finishReason": "STOP",
+                }
+            ],
+            "usageMetadata": _usage(prompt, text, cached),
+        }
+
+    def cached_content_error(self, body: dict[str, Any]) -> str | None:
+        """Return why a request cannot use its cached content, like the real API does."""
+        name = body.get("cachedContent")
+        if not name:
+            return None
+        entry = self.cached_contents.get(name)
+        if entry is None or entry["expires"] < time.time():
+            return f"Cached content {name} not found or expired"
+        if body.get("tools") or body.get("systemInstruction"):
+            return "CachedContent can not be used with tools or system_instruction set in the request"
+        return None
+
+    def create_cached_content(self, body: dict[str, Any]) -> tuple[int, dict[str, Any]]:
+        """Store a cached content, rejecting ones smaller than `min_cache_tokens`."""
+        tokens = len(_prompt_text(body)) // 4
+        if tokens < self.min_cache_tokens:
+            return 400, {
+                "error": {
+                    "code": 400,
+                    "message": f"Cached content is too small. total_token_count={tokens}, min_total_token_count={self.min_cache_tokens}",
+                    "status": "INVALID_ARGUMENT",
+                }
+            }
+        with self._lock:
+            self.cache_requests["create"] += 1
+            name = f"cachedContents/{len(self.cached_contents) + 1}"
+            entry = self.cached_contents[name] = {
+                **body,
+                "name": name,
+                "expires": time.time() + float(body.get("ttl", "3600s").rstrip("s")),
+                "usageMetadata": {"totalTokenCount": tokens},
+            }
+        return 200, self._cached_content_view(entry)
+
+    def update_cached_content(
+        self, name: str, body: dict[str, Any]
+    ) -> tuple[int, dict[str, Any]]:
+        """Extend the TTL of a cached content."""
+        entry = self.cached_contents.get(name)
+        if entry is None:
+            return 404, {
+                "error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}
+            }
+        with self._lock:
+            self.cache_requests["update"] += 1
+            entry["expires"] = time.time() + float(body.get("ttl", "3600s").rstrip("s"))
+        return 200, self._cached_content_view(entry)
+
+    def _cached_content_view(self, entry: dict[str, Any]) -> dict[str, Any]:
+        expire_time = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(entry["expires"]))
+        return {
+            "name": entry["name"],
+            "model": entry.get("model"),
+            "expireTime": expire_time,
+            "usageMetadata": entry["usageMetadata"],
+        }
+
+    def create_batch(self, model: str, body: dict[str, Any]) -> dict[str, Any]:
+        """Register a batch job with inlined requests and return its pending state."""
+        requests = body["batch"]["inputConfig"]["requests"]["requests"]
+        with self._lock:
+            name = f"batches/{len(self.batch_jobs) + 1}"
+            self.batch_jobs[name] = {
+                "model": model,
+                "requests": requests,
+                "created": time.monotonic(),
+                "output": None,
+            }
+        return {
+            "name": name,
+            "metadata": {"state": "BATCH_STATE_PENDING", "model": f"models/{model}"},
+        }
+
+    def get_batch(self, name: str) -> dict[str, Any] | None:
+        """Return the state of a batch job, answering its requests once it is done."""
+        with self._lock:
+            job = self.batch_jobs.get(name)
+        if job is None:
+            return None
+        metadata: dict[str, Any] = {"model": f"models/{job['model']}"}
+        if time.monotonic() - job["created"] < self.batch_latency:
+            metadata["state"] = "BATCH_STATE_RUNNING"
+            return {"name": name, "metadata": metadata}
+        if job["output"] is None:
+            responses = []
+            for item in job["requests"]:
+                error = self.cached_content_error(item["request"])
+                if error is not None:
+                    responses.append(
+                        {
+                            "error": {"code": 400, "message": error},
+                            "metadata": item.get("metadata"),
+                        }
+                    )
+                    continue
+                kind, response = self.respond(item["request"])
+                with self._lock:
+                    self.requests[kind] += 1
+                responses.append(
+                    {"response": response, "metadata": item.get("metadata")}
+                )
+            job["output"] = {"inlinedResponses": {"inlinedResponses": responses}}
+        metadata.update(state="BATCH_STATE_SUCCEEDED", output=job["output"])
+        return {"name": name, "metadata": metadata, "done": True}
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                match = _ROUTE_RE.match(self.path)
+                length = int(self.headers.get("content-length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if _CACHE_RE.match(self.path):
+                    self._send_json(*server.create_cached_content(body))
+                    return
+                if match is None:
+                    self._send_json(
+                        404, {"error": {"code": 404, "message": "Not found"}}
+                    )
+                    return
+                if match.group(2) == "batchGenerateContent":
+                    self._send_json(200, server.create_batch(match.group(1), body))
+                    return
+                error = server.cached_content_error(body)
+                if error is not None:
+                    self._send_json(
+                        400,
+                        {
+                            "error": {
+                                "code": 400,
+                                "message": error,
+                                "status": "INVALID_ARGUMENT",
+                            }
+                        },
+                    )
+                    return
+                kind, response = server.respond(body)
+                server._sleep(kind)
+                status = server._error_status()
+                if status is not None:
+                    self._send_json(
+                        status,
+                        {
+                            "error": {
+                                "code": status,
+                                "message": "Injected error",
+                                "status": "UNAVAILABLE",
+                            }
+                        },
+                    )
+                    return
+                if match.group(2) == "streamGenerateContent":
+                    self._send_stream(response)
+                else:
+                    self._send_json(200, response)
+
+            def do_PATCH(self) -> None:
+                match = _CACHE_RE.match(self.path)
+                length = int(self.headers.get("content-length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if match is None or match.group(1) is None:
+                    self._send_json(
+                        404, {"error": {"code": 404, "message": "Not found"}}
+                    )
+                    return
+                self._send_json(
+                    *server.update_cached_content(
+                        f"cachedContents/{match.group(1)}", body
+                    )
+                )
+
+            def do_GET(self) -> None:
+                match = _BATCH_RE.match(self.path)
+                job = server.get_batch(f"batches/{match.group(1)}") if match else None
+                if job is None:
+                    self._send_json(
+                        404, {"error": {"code": 404, "message": "Not found"}}
+                    )
+                else:
+                    self._send_json(200, job)
+
+            def _send_json(self, status: int, payload: dict[str, Any]) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _send_stream(self, response: dict[str, Any]) -> None:
+                text = response["candidates"][0]["content"]["parts"][0]["text"]
+                pieces = [text[i : i + 16] for i in range(0, len(text), 16)] or [""]
+                events = []
+                for i, piece in enumerate(pieces):
+                    candidate = {
+                        "content": {"role": "model", "parts": [{"text": piece}]}
+                    }
+                    event = {"candidates": [candidate]}
+                    if i == len(pieces) - 1:
+                        candidate["finishReason"] = "STOP"
+                        event["usageMetadata"] = response["usageMetadata"]
+                    events.append(f"data: {json.dumps(event)}\r\n\r\n".encode())
+                data = b"".join(events)
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
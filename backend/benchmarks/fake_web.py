@@ -0,0 +1,223 @@
+"""Local web server standing in for the publisher pages cited by searches.
+
+Routes:
+
+- `/page/{n}`: an HTML article with navigation, scripts and a footer around it,
+  served with an ETag and answering `If-None-Match` with 304;
+- `/big/{n}`: an HTML page of `big_page_bytes` sent in chunks;
+- `/file/{n}.pdf`: a non-HTML response;
+- `/redirect/{n}`: a 302 to `/page/{n}`;
+- `/grounding-api-redirect/{n}`: a grounding-style redirect link, a 302 to
+  `/redirect/{n // 4}` with a tracking parameter, so four links lead to each page;
+- `/expired/{n}`: a 404, like an expired redirect link.
+
+HEAD requests are answered like GET without the body. It counts requests per
+route, HEAD requests, TCP connections accepted and the most requests handled at
+the same time, to check pooling and concurrency limits.
+"""
+
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+_ROUTE_RE = re.compile(
+    r"^/(page|big|file|redirect|grounding-api-redirect|expired)/(\d+)"
+)
+
+ARTICLE_TEXT = "Grid operators added {n} gigawatts of storage this year."
+
+
+def page_html(n: int) -> bytes:
+    """Build the HTML of `/page/{n}`."""
+    paragraphs = "".join(
+        f"<p>{ARTICLE_TEXT.format(n=n)} Paragraph {i} explains the details.</p>"
+        for i in range(8)
+    )
+    return (
+        "<!doctype html><html><head><title>Article "
+        f"{n}</title><script>var tracking = 'SCRIPT_TEXT';</script></head><body>"
+        "<nav><a href='/'>NAV_TEXT</a></nav>"
+        f"<article><h1>Storage report {n}</h1>{paragraphs}</article>"
+        "<footer>FOOTER_TEXT</footer></body></html>"
+    ).encode()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients stop reading capped pages early and close the connection
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class FakeWebServer:
+    """Threaded HTTP server serving fixture pages.
+
+    Args:
+        latency: Seconds to wait before answering each request.
+        big_page_bytes: Size of the `/big/{n}` pages.
+        version: Part of every ETag; change it to make the pages "modified".
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        big_page_bytes: int = 4_000_000,
+        version: int = 1,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        """Create the server; it starts listening on `start`."""
+        self.latency = latency
+        self.big_page_bytes = big_page_bytes
+        self.version = version
+        self.requests = {
+            "page": 0,
+            "big": 0,
+            "file": 0,
+            "redirect": 0,
+            "grounding-api-redirect": 0,
+            "expired": 0,
+            "not_modified": 0,
+            "head": 0,
+        }
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler_class())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def port(self) -> int:
+        """Return the port the server listens on."""
+        return self._server.server_address[1]
+
+    @property
+    def url(self) -> str:
+        """Return the base URL of the server."""
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "FakeWebServer":
+        """Serve requests on a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeWebServer":
+        """Start the server."""
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        """Stop the server."""
+        self.stop()
+
+    def _enter(self, kind: str) -> None:
+        with self._lock:
+            self.requests[kind] += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _exit(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                with server._lock:
+                    server.connections += 1
+
+            def do_GET(self) -> None:
+                match = _ROUTE_RE.match(self.path)
+                if match is None:
+                    self._send(404, "text/plain", b"Not found")
+                    return
+                kind, n = match.group(1), int(match.group(2))
+                server._enter(kind)
+                try:
+                    time.sleep(server.latency)
+                    getattr(self, "_" + kind.replace("-", "_"))(n)
+                finally:
+                    server._exit()
+
+            def do_HEAD(self) -> None:
+                with server._lock:
+                    server.requests["head"] += 1
+                self.do_GET()
+
+            def _page(self, n: int) -> None:
+                etag = f'"page-{n}-v{server.version}"'
+                if self.headers.get("if-none-match") == etag:
+                    with server._lock:
+                        server.requests["not_modified"] += 1
+                    self._send(304, None, b"", {"etag": etag})
+                    return
+                self._send(
+                    200, "text/html; charset=utf-8", page_html(n), {"etag": etag}
+                )
+
+            def _big(self, n: int) -> None:
+                self.send_response(200)
+                self.send_header("content-type", "text/html")
+                self.send_header("content-length", str(server.big_page_bytes))
+                self.end_headers()
+                if self.command == "HEAD":
+                    return
+                chunk = b"<p>" + b"x" * 16377 + b"</p>"
+                sent = 0
+                while sent < server.big_page_bytes:
+                    data = chunk[: server.big_page_bytes - sent]
+                    self.wfile.write(data)
+                    sent += len(data)
+
+            def _file(self, n: int) -> None:
+                self._send(200, "application/pdf", b"%PDF-1.4" + b"\0" * 100_000)
+
+            def _redirect(self, n: int) -> None:
+                self._send(302, None, b"", {"location": f"/page/{n}"})
+
+            def _grounding_api_redirect(self, n: int) -> None:
+                location = f"/redirect/{n // 4}?utm_source=grounding"
+                self._send(302, None, b"", {"location": location})
+
+            def _expired(self, n: int) -> None:
+                self._send(404, "text/plain", b"Not found")
+
+            def _send(
+                self,
+                status: int,
+                content_type: str | None,
+                data: bytes,
+                headers: dict[str, str] | None = None,
+            ) -> None:
+                self.send_response(status)
+                if content_type:
+                    self.send_header("content-type", content_type)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                if status != 304:
+                    self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
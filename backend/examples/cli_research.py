@@ -1,5 +1,9 @@
 import argparse
+import asyncio
+from uuid import uuid4
+
 from langchain_core.messages import HumanMessage
+
 from agent.graph import graph
 
 
@@ -33,7 +37,9 @@ def main() -> None:
         "reasoning_model": args.reasoning_model,
     }
 
-    result = graph.invoke(state)
+    # The graph nodes are async, so run it through the async API. The run id is
+    # shared by the run's nodes, e.g. for its retry budget
+    result = asyncio.run(graph.ainvoke(state, {"run_id": uuid4()}))
     messages = result.get("messages", [])
     if messages:
         print(messages[-1].content)
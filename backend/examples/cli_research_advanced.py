@@ -1,6 +1,9 @@
 import argparse
 import asyncio
+from uuid import uuid4
+
 from langchain_core.messages import HumanMessage
+
 from agent.graph import graph
 
 
@@ -40,9 +43,11 @@ async def main_advanced() -> None:
     final_messages = None
     
     # Streaming com múltiplos modos
+    # O run_id é compartilhado pelos nós da execução (ex.: orçamento de retries)
     async for stream_mode, chunk in graph.astream(
         state, 
-        stream_mode=["updates", "messages"]
+        {"run_id": uuid4()},
+        stream_mode=["updates", "messages", "custom"]
     ):
         if stream_mode == "updates":
             # Atualização de progresso dos nós
@@ -70,8 +75,21 @@ async def main_advanced() -> None:
                     
                 elif node_name == "finalize_answer":
                     final_messages = node_output.get("messages", [])
-                    print(f"   ✅ Resposta finalizada!")
+                    print("   ✅ Resposta finalizada!")
                     
+        elif stream_mode == "custom":
+            # Eventos emitidos pelos nós via get_stream_writer
+            if chunk.get("event") == "search_cache_hit":
+                print(f"\n   ⚡ Cache: {chunk['search_query']}")  # noqa: T201
+            elif chunk.get("event") == "search_abandoned":
+                print(f"\n   ⌛ Busca cancelada ({chunk['reason']}): {chunk['search_query']}")  # noqa: T201
+            elif chunk.get("event") == "node_metrics":
+                print(  # noqa: T201
+                    f"\n   ⏱️  {chunk['node']}: {chunk['wall_seconds']:.2f}s"
+                    f" (fila {chunk['queue_wait_seconds']:.2f}s),"
+                    f" tokens {chunk['input_tokens']}/{chunk['output_tokens']}"
+                )
+
         elif stream_mode == "messages":
             # Streaming de tokens do LLM
             token, metadata = chunk
@@ -0,0 +1,93 @@
+"""Guards keeping outgoing requests to public internet addresses."""
+
+import asyncio
+import ipaddress
+import socket
+from typing import TYPE_CHECKING, Collection
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    import httpx
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class BlockedAddressError(Exception):
+    """Raised before requesting a URL whose host is not a public internet address."""
+
+
+def is_public_address(address: str) -> bool:
+    """Return whether `address` is a globally routable unicast IP address.
+
+    Private, loopback, link-local (including the cloud metadata address
+    169.254.169.254), shared, reserved, multicast and unspecified addresses are
+    not public, nor are IPv6 addresses mapping one of those IPv4 addresses.
+    """
+    try:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+    except ValueError:
+        return False
+    if isinstance(ip, ipaddress.IPv6Address) and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def check_public_url(url: str, allowed_hosts: Collection[str] = ()) -> None:
+    """Check that `url` is an http(s) URL whose host only resolves to public addresses.
+
+    Call it before requesting `url` and before following each redirect, so links
+    from search results cannot reach the server's own network.
+
+    Args:
+        allowed_hosts: Host names or IP addresses exempt from the check, such as
+            a local server in tests.
+
+    Raises:
+        BlockedAddressError: When the scheme is not http(s) or the host resolves to
+            any address that is not public.
+    """
+    parts = urlsplit(url)
+    host = parts.hostname
+    if parts.scheme.lower() not in _DEFAULT_PORTS or not host:
+        raise BlockedAddressError(f"Not an http(s) URL: {url}")
+    if host in allowed_hosts:
+        return
+    try:
+        ipaddress.ip_address(host.split("%", 1)[0])
+        addresses = [host]
+    except ValueError:
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(
+                host,
+                parts.port or _DEFAULT_PORTS[parts.scheme.lower()],
+                type=socket.SOCK_STREAM,
+            )
+        except socket.gaierror as e:
+            raise BlockedAddressError(f"Cannot resolve {host}: {e}") from e
+        addresses = [info[4][0] for info in infos]
+    for address in addresses:
+        if not is_public_address(address):
+            raise BlockedAddressError(
+                f"{host} resolves to non-public address {address}"
+            )
+
+
+def check_peer_address(
+    response: "httpx.Response", allowed_hosts: Collection[str] = ()
+) -> None:
+    """Check the address `response` actually came from, before its body is read.
+
+    This catches a host whose DNS answer changed to a private address between
+    `check_public_url` and the connection.
+
+    Raises:
+        BlockedAddressError: When the peer address is not public.
+    """
+    stream = response.extensions.get("network_stream")
+    server = stream.get_extra_info("server_addr") if stream is not None else None
+    if not server or server[0] in allowed_hosts or response.url.host in allowed_hosts:
+        return
+    if not is_public_address(server[0]):
+        raise BlockedAddressError(
+            f"{response.url.host} connected to non-public address {server[0]}"
+        )
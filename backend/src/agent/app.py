@@ -1,10 +1,148 @@
 # mypy: disable - error - code = "no-untyped-def,misc"
+import json
 import pathlib
+
 from fastapi import FastAPI, Response
 from fastapi.staticfiles import StaticFiles
 
+from agent.codec import STREAM_MEDIA_TYPE, get_codec
+
+
+class CompressedStreamMiddleware:
+    """Re-encodes event streams for clients that accept the compressed format.
+
+    A client sending `Accept: application/vnd.agent.events+msgpack+zstd` gets each
+    server-sent event as a length-prefixed zstd-compressed msgpack `[event, data]`
+    frame, or `[event, data, id]` for events with an id (see
+    `ZstdCodec.iter_frames`), instead of a JSON `text/event-stream`. The
+    `X-Zstd-Dictionary-Id` response header names the dictionary the frames need,
+    served at `/codec/dictionary`. Other clients, like the frontend, are unchanged.
+    """
+
+    def __init__(self, app):
+        """Wrap the ASGI `app`."""
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        """Handle one ASGI request, encoding its frames when the client accepts them."""
+        if scope["type"] != "http" or not self._accepts_frames(scope):
+            await self.app(scope, receive, send)
+            return
+        try:
+            codec = get_codec()
+        except ImportError:
+            await self.app(scope, receive, send)
+            return
+
+        encoding = False
+        buffer = b""
+
+        async def send_frames(message):
+            nonlocal encoding, buffer
+            if message["type"] == "http.response.start":
+                # A list of pairs, as headers like set-cookie may repeat
+                headers = list(message.get("headers", []))
+                encoding = any(
+                    name.lower() == b"content-type"
+                    and value.startswith(b"text/event-stream")
+                    for name, value in headers
+                )
+                if encoding:
+                    message = {**message, "headers": _frame_headers(headers, codec)}
+                await send(message)
+                return
+            if not encoding or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            buffer += message.get("body", b"").replace(b"\r\n", b"\n")
+            more_body = message.get("more_body", False)
+            *events, buffer = buffer.split(b"\n\n")
+            if not more_body and buffer.strip():
+                events.append(buffer)
+                buffer = b""
+            frames = b"".join(
+                codec.encode_frame(*_parse_event(event))
+                for event in events
+                if event.strip()
+            )
+            await send(
+                {"type": "http.response.body", "body": frames, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_frames)
+
+    @staticmethod
+    def _accepts_frames(scope):
+        for name, value in scope.get("headers", []):
+            if name == b"accept" and STREAM_MEDIA_TYPE.encode() in value:
+                return True
+        return False
+
+
+def _frame_headers(headers, codec):
+    """Rewrite the headers of an event stream response for compressed frames.
+
+    Repeated headers are kept. The length and any content encoding of the original
+    body no longer apply, and caches must key the response on `Accept`.
+    """
+    replaced = {
+        b"content-type",
+        b"content-length",
+        b"content-encoding",
+        b"x-zstd-dictionary-id",
+    }
+    result = [(name, value) for name, value in headers if name.lower() not in replaced]
+    result.append((b"content-type", STREAM_MEDIA_TYPE.encode()))
+    result.append((b"x-zstd-dictionary-id", str(codec.dictionary_id).encode()))
+    varies = {
+        field.strip().lower()
+        for name, value in headers
+        if name.lower() == b"vary"
+        for field in value.split(b",")
+    }
+    if not varies & {b"accept", b"*"}:
+        result.append((b"vary", b"Accept"))
+    return result
+
+
+def _parse_event(raw):
+    """Split one server-sent event into its name, decoded JSON data and id."""
+    event = "message"
+    data = []
+    event_id = None
+    for line in raw.decode("utf-8").split("\n"):
+        field, _, value = line.partition(":")
+        value = value[1:] if value.startswith(" ") else value
+        if field == "event":
+            event = value
+        elif field == "data":
+            data.append(value)
+        elif field == "id" and "\0" not in value:
+            event_id = value
+    text = "\n".join(data)
+    try:
+        return event, json.loads(text), event_id
+    except ValueError:
+        return event, text, event_id
+
+
 # Define the FastAPI app
 app = FastAPI()
+app.add_middleware(CompressedStreamMiddleware)
+
+
+@app.get("/codec/dictionary")
+async def codec_dictionary():
+    """Serve the zstd dictionary compressed event streams are encoded with."""
+    codec = get_codec()
+    if codec.dictionary is None:
+        return Response(status_code=404)
+    return Response(
+        codec.dictionary.as_bytes(),
+        media_type="application/octet-stream",
+        headers={"X-Zstd-Dictionary-Id": str(codec.dictionary_id)},
+    )
 
 
 def create_frontend_router(build_dir="../frontend/dist"):
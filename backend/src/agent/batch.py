@@ -0,0 +1,237 @@
+"""Run many research questions through the graph.
+
+Questions are read from a JSONL file (one object per line with a "question" key
+and optional "id", "initial_search_query_count", "max_research_loops" and
+"reasoning_model" keys) or a CSV file with a header row holding the same
+columns. Results are appended to an output JSONL file as runs finish, so an
+interrupted batch resumes where it stopped when started again with the same
+input and output.
+
+With `--batch-api` the model calls of all runs in flight are grouped into
+Gemini Batch API jobs instead of being sent one by one.
+
+Usage:
+    python -m agent.batch questions.jsonl -o answers.jsonl --concurrency 8
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterable
+from uuid import uuid4
+
+from langchain_core.messages import HumanMessage
+
+from agent.dedup import release_shared_query_index
+
+_STATE_KEYS = ("initial_search_query_count", "max_research_loops", "reasoning_model")
+
+
+def read_questions(path: str | Path) -> list[dict[str, Any]]:
+    """Read the questions of a batch from a JSONL or CSV file.
+
+    Items without an "id" are numbered by their line (or row) starting at 1, so ids
+    stay stable across restarts as long as the file is not edited.
+    """
+    path = Path(path)
+    with path.open(newline="", encoding="utf-8") as file:
+        if path.suffix.lower() == ".csv":
+            rows: Iterable[dict[str, Any]] = list(csv.DictReader(file))
+        else:
+            rows = [json.loads(line) for line in file if line.strip()]
+
+    items = []
+    for number, row in enumerate(rows, start=1):
+        question = (row.get("question") or "").strip()
+        if not question:
+            raise ValueError(f"{path}: item {number} has no question")
+        item = {"id": str(row.get("id") or number), "question": question}
+        for key in _STATE_KEYS:
+            if row.get(key) not in (None, ""):
+                item[key] = row[key] if key == "reasoning_model" else int(row[key])
+        items.append(item)
+    return items
+
+
+def completed_ids(output_path: str | Path) -> set[str]:
+    """Get the ids already answered in an output file.
+
+    Failed runs are not counted, so they are retried on resume. A truncated last
+    line left by a crash is ignored.
+    """
+    path = Path(output_path)
+    if not path.exists():
+        return set()
+    done = set()
+    with path.open(encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == "ok":
+                done.add(str(record["id"]))
+    return done
+
+
+async def run_question(
+    graph: Any, item: dict[str, Any], configurable: dict[str, Any]
+) -> dict[str, Any]:
+    """Run one question through the graph and build its output record."""
+    state = {"messages": [HumanMessage(content=item["question"])]}
+    state.update({key: item[key] for key in _STATE_KEYS if key in item})
+    config = {
+        # Shared by the run's nodes, e.g. for its retry budget
+        "run_id": uuid4(),
+        "configurable": {
+            **configurable,
+            "thread_id": f"{configurable['batch_id']}:{item['id']}",
+        },
+    }
+    start = time.perf_counter()
+    record: dict[str, Any] = {"id": item["id"], "question": item["question"]}
+    try:
+        result = await graph.ainvoke(state, config)
+    except Exception as exc:
+        record.update(status="error", error=f"{type(exc).__name__}: {exc}")
+    else:
+        record.update(
+            status="ok",
+            answer=result["messages"][-1].content,
+            sources=list(
+                dict.fromkeys(
+                    source.value for source in result.get("sources_gathered", [])
+                )
+            ),
+            search_queries=result.get("search_query", []),
+            run_metrics=result.get("run_metrics", {}),
+        )
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+async def run_batch(
+    items: list[dict[str, Any]],
+    output_path: str | Path,
+    concurrency: int = 8,
+    configurable: dict[str, Any] | None = None,
+    resume: bool = True,
+) -> AsyncIterator[dict[str, Any]]:
+    """Run a batch of questions, appending one JSON line per finished run to `output_path`.
+
+    At most `concurrency` runs are in flight. Every run uses the "batch" priority
+    class and shares the batch's search cache and query index.
+
+    Yields:
+        The output record of each run, in completion order.
+    """
+    from agent.graph import graph
+
+    configurable = {
+        "priority": "batch",
+        **(configurable or {}),
+    }
+    configurable.setdefault("batch_id", uuid4().hex)
+    done = completed_ids(output_path) if resume else set()
+    pending = [item for item in items if item["id"] not in done]
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run(item: dict[str, Any]) -> dict[str, Any]:
+        async with semaphore:
+            return await run_question(graph, item, configurable)
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    tasks = [asyncio.ensure_future(run(item)) for item in pending]
+    try:
+        with open(output_path, "a", encoding="utf-8") as output:
+            for next_done in asyncio.as_completed(tasks):
+                record = await next_done
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                os.fsync(output.fileno())
+                yield record
+    finally:
+        for task in tasks:
+            task.cancel()
+        release_shared_query_index(configurable["batch_id"])
+
+
+async def _main(args: argparse.Namespace) -> None:
+    items = read_questions(args.input)
+    configurable = {
+        "search_cache_backend": args.search_cache,
+        "batch_query_threshold": args.query_threshold,
+        "use_batch_api": args.batch_api,
+        **json.loads(args.configurable),
+    }
+    # Resuming with the same batch id keeps the search cache keys meaningful
+    configurable.setdefault("batch_id", Path(args.output).stem)
+
+    total = len(items)
+    finished = len(completed_ids(args.output)) if not args.restart else 0
+    errors = 0
+    async for record in run_batch(
+        items,
+        args.output,
+        concurrency=args.concurrency,
+        configurable=configurable,
+        resume=not args.restart,
+    ):
+        finished += 1
+        errors += record["status"] != "ok"
+        sys.stdout.write(
+            f"[{finished}/{total}] {record['id']} {record['status']} {record['seconds']:.1f}s\n"
+        )
+        sys.stdout.flush()
+    sys.stdout.write(
+        f"Done: {finished}/{total} answered, {errors} failed in this session\n"
+    )
+
+
+def main() -> None:
+    """Run a batch of research questions from the command line."""
+    parser = argparse.ArgumentParser(description="Run a batch of research questions")
+    parser.add_argument("input", help="JSONL or CSV file with a 'question' column")
+    parser.add_argument("-o", "--output", required=True, help="Output JSONL file")
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Maximum number of runs in flight"
+    )
+    parser.add_argument(
+        "--search-cache",
+        default="sqlite",
+        choices=["memory", "sqlite", "redis"],
+        help="Search cache shared by the runs; 'sqlite' survives restarts",
+    )
+    parser.add_argument(
+        "--query-threshold",
+        type=float,
+        default=0.9,
+        help="Similarity at which runs share the search of a near-identical query",
+    )
+    parser.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="Send model calls through the Gemini Batch API (slower, lower cost)",
+    )
+    parser.add_argument(
+        "--configurable",
+        default="{}",
+        help="JSON object merged into the configurable section of every run",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Run every question again instead of skipping answered ones",
+    )
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Gemini Batch API mode: model calls of many runs sent as batch jobs."""
+
+import asyncio
+import weakref
+from typing import TYPE_CHECKING, Any
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from agent.clients import get_genai_client, llm_registry
+from agent.configuration import Configuration
+from agent.instrumentation import record_message_usage
+
+if TYPE_CHECKING:
+    from google.genai.types import GenerateContentResponse
+
+_TERMINAL_STATES = frozenset(
+    {
+        "JOB_STATE_SUCCEEDED",
+        "JOB_STATE_FAILED",
+        "JOB_STATE_CANCELLED",
+        "JOB_STATE_EXPIRED",
+    }
+)
+
+
+def _job_state(job: Any) -> str:
+    return getattr(job.state, "value", job.state)
+
+
+class BatchJobError(RuntimeError):
+    """Raised for requests of a Gemini batch job that failed or returned an error."""
+
+
+class BatchCollector:
+    """Collects Gemini requests from concurrent runs into bulk batch jobs.
+
+    Requests for the same model are held for up to `window_seconds` (or until
+    `max_requests` are pending) and submitted as one job through the Gemini Batch
+    API. Each caller awaits its own response, so the graph run simply resumes when
+    the job finishes. Since runs advance in lockstep, each job naturally holds one
+    stage (all searches, all reflections, ...) of every run in flight.
+    """
+
+    def __init__(self, window_seconds: float, max_requests: int, poll_seconds: float):
+        """Create a collector sending a job every `window_seconds` or `max_requests` requests."""
+        self.window_seconds = window_seconds
+        self.max_requests = max_requests
+        self.poll_seconds = poll_seconds
+        self.jobs_submitted = 0
+        self.requests_submitted = 0
+        self._pending: dict[str, list[tuple[dict[str, Any], asyncio.Future]]] = {}
+        self._timers: dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def generate_content(
+        self, model: str, contents: Any, config: dict[str, Any] | None = None
+    ) -> "GenerateContentResponse":
+        """Queue one `generate_content` request and wait for its batched response."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(model, [])
+        request = {"contents": contents, "config": config or {}}
+        pending.append((request, future))
+        if len(pending) >= self.max_requests:
+            self._flush(model)
+        elif model not in self._timers:
+            self._timers[model] = loop.call_later(
+                self.window_seconds, self._flush, model
+            )
+        return await future
+
+    def _flush(self, model: str) -> None:
+        timer = self._timers.pop(model, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(model, [])
+        # Callers cancelled while waiting do not need a response
+        pending = [
+            (request, future) for request, future in pending if not future.done()
+        ]
+        if not pending:
+            return
+        task = asyncio.ensure_future(self._run_job(model, pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_job(
+        self, model: str, pending: list[tuple[dict[str, Any], asyncio.Future]]
+    ) -> None:
+        futures = {str(i): future for i, (_, future) in enumerate(pending)}
+        try:
+            client = get_genai_client()
+            job = await client.aio.batches.create(
+                model=model,
+                src=[
+                    {**request, "metadata": {"key": key}}
+                    for key, (request, _) in zip(futures, pending)
+                ],
+            )
+            self.jobs_submitted += 1
+            self.requests_submitted += len(pending)
+            while _job_state(job) not in _TERMINAL_STATES:
+                await asyncio.sleep(self.poll_seconds)
+                job = await client.aio.batches.get(name=job.name)
+            if _job_state(job) != "JOB_STATE_SUCCEEDED":
+                raise BatchJobError(
+                    f"Batch job {job.name} ended in state {_job_state(job)}"
+                )
+
+            for item in job.dest.inlined_responses or []:
+                future = futures.pop((item.metadata or {}).get("key"), None)
+                if future is None or future.done():
+                    continue
+                if item.error is not None or item.response is None:
+                    future.set_exception(
+                        BatchJobError(f"Batch request failed: {item.error}")
+                    )
+                else:
+                    future.set_result(item.response)
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(BatchJobError("Missing batch response"))
+        except Exception as exc:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(exc)
+
+
+_collectors: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple, BatchCollector]]" = weakref.WeakKeyDictionary()
+
+
+def get_batch_collector(configurable: Configuration) -> BatchCollector:
+    """Get the batch collector of the running event loop for the configured settings."""
+    key = (
+        configurable.batch_api_window_seconds,
+        configurable.batch_api_max_requests,
+        configurable.batch_api_poll_seconds,
+    )
+    collectors = _collectors.setdefault(asyncio.get_running_loop(), {})
+    collector = collectors.get(key)
+    if collector is None:
+        collector = collectors[key] = BatchCollector(*key)
+    return collector
+
+
+def _usage_metadata(response: "GenerateContentResponse") -> dict[str, Any]:
+    usage = response.usage_metadata
+    input_tokens = (usage.prompt_token_count or 0) if usage else 0
+    output_tokens = (usage.candidates_token_count or 0) if usage else 0
+    cached_tokens = (usage.cached_content_token_count or 0) if usage else 0
+    return {
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "input_token_details": {"cache_read": cached_tokens},
+    }
+
+
+def batch_runnable(
+    configurable: Configuration,
+    model: str,
+    temperature: float,
+    schema: type | None = None,
+    cached_content: str | None = None,
+) -> Runnable:
+    """Get a runnable that sends prompts through the Gemini Batch API.
+
+    It mirrors the runnables of `llm_registry`: without `schema` it returns an
+    `AIMessage`, with a pydantic `schema` it returns the parsed structured output.
+    """
+    collector = get_batch_collector(configurable)
+    config: dict[str, Any] = {"temperature": temperature}
+    if cached_content is not None:
+        config["cached_content"] = cached_content
+    if schema is not None:
+        config["response_mime_type"] = "application/json"
+        config["response_json_schema"] = schema.model_json_schema()
+
+    async def invoke(prompt: str) -> Any:
+        response = await collector.generate_content(model, prompt, config)
+        message = AIMessage(
+            content=response.text or "", usage_metadata=_usage_metadata(response)
+        )
+        if schema is None:
+            return message
+        record_message_usage(model, message)
+        return schema.model_validate_json(message.content)
+
+    return RunnableLambda(invoke, name=f"batch:{model}")
+
+
+def model_runnable(
+    configurable: Configuration,
+    model: str,
+    temperature: float,
+    schema: type | None = None,
+    cached_content: str | None = None,
+) -> Runnable:
+    """Get the runnable for a model call, through the Batch API when `use_batch_api` is set."""
+    if configurable.use_batch_api:
+        return batch_runnable(configurable, model, temperature, schema, cached_content)
+    return llm_registry.get(model, temperature, schema, cached_content)
+
+
+def content_generator(configurable: Configuration) -> Any:
+    """Get the `generate_content` coroutine function for google genai requests."""
+    if configurable.use_batch_api:
+        return get_batch_collector(configurable).generate_content
+    return get_genai_client().aio.models.generate_content
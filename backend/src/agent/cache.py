@@ -0,0 +1,317 @@
+"""Search result and answer caches keyed by normalized queries and topics."""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from agent.configuration import Configuration
+from agent.prompts import get_current_date
+
+# Words that do not change what a search returns. They are dropped from cache
+# keys, so "trends in solar" and "trends solar" share a key. Question words and
+# negations ("when", "where", "not", "without") change the answer, so they are
+# never dropped.
+STOPWORDS = frozenset(
+    "a an and are as at be by for from in is it of on or the to with".split()
+)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query for cache lookups.
+
+    Lowercases the query and drops punctuation and stopwords, so case, whitespace
+    and stopword differences map to the same key. The remaining words keep their
+    order, since it can change the query ("python to rust" and "rust to python").
+    """
+    tokens = _TOKEN_RE.findall(query.lower())
+    content = [token for token in tokens if token not in STOPWORDS]
+    return " ".join(content or tokens)
+
+
+def make_search_cache_key(model: str, query: str) -> str:
+    """Build the cache key for a grounded search made with `model`."""
+    return f"search:{model}:{normalize_query(query)}"
+
+
+def normalize_topic(topic: str) -> str:
+    """Normalize a research topic for answer cache lookups.
+
+    Unlike `normalize_query` stopwords are kept, since they can change the
+    question ("is X better than Y" and "is X better for Y").
+    """
+    return " ".join(_TOKEN_RE.findall(str(topic).lower()))
+
+
+def make_answer_cache_key(topic: str, settings: dict[str, Any]) -> str:
+    """Build the cache key for a whole research run.
+
+    Args:
+        topic: The research topic from `get_research_topic`.
+        settings: The models and effort settings the answer depends on.
+    """
+    digest = hashlib.blake2b(
+        json.dumps([normalize_topic(topic), settings], sort_keys=True).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+    return f"answer:{get_current_date()}:{digest}"
+
+
+class SearchCache:
+    """Base class for web search caches.
+
+    Backends store opaque JSON strings. This class applies the freshness policy:
+    an entry is served only while it is younger than the TTL and was created on
+    the same `get_current_date()`, because the search prompt embeds that date.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        """Create a cache whose entries expire after `ttl_seconds`."""
+        self.ttl_seconds = ttl_seconds
+
+    async def get(self, key: str) -> dict[str, Any] | None:
+        """Return the cached payload for `key`, or None on a miss or stale entry."""
+        entry = await self.get_entry(key)
+        if entry is None or entry[1] > self.ttl_seconds:
+            return None
+        return entry[0]
+
+    async def get_entry(self, key: str) -> tuple[dict[str, Any], float] | None:
+        """Return the cached payload for `key` and its age in seconds, ignoring the TTL."""
+        raw = await self._get(key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if entry["current_date"] != get_current_date():
+            return None
+        return entry["payload"], time.time() - entry["created_at"]
+
+    async def set(self, key: str, payload: dict[str, Any]) -> None:
+        """Store `payload` under `key`."""
+        entry = {
+            "created_at": time.time(),
+            "current_date": get_current_date(),
+            "payload": payload,
+        }
+        await self._set(key, json.dumps(entry))
+
+    async def _get(self, key: str) -> str | None:
+        raise NotImplementedError
+
+    async def _set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+
+class MemorySearchCache(SearchCache):
+    """In-process LRU cache."""
+
+    def __init__(self, ttl_seconds: int, maxsize: int = 1024):
+        """Create an in-process cache holding at most `maxsize` entries."""
+        super().__init__(ttl_seconds)
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def _get(self, key: str) -> str | None:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    async def _set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+class SQLiteSearchCache(SearchCache):
+    """Cache persisted to a SQLite file on local disk."""
+
+    def __init__(self, ttl_seconds: int, path: str):
+        """Open the SQLite cache at `path`, creating it if needed."""
+        super().__init__(ttl_seconds)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _get_sync(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM search_cache WHERE key = ? AND expires_at > ?",
+                (key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set_sync(self, key: str, value: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl_seconds),
+            )
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE expires_at <= ?", (time.time(),)
+            )
+            self._conn.commit()
+
+    async def _get(self, key: str) -> str | None:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def _set(self, key: str, value: str) -> None:
+        await asyncio.to_thread(self._set_sync, key, value)
+
+
+class RedisSearchCache(SearchCache):
+    """Cache shared through Redis, e.g. the instance provisioned by docker-compose."""
+
+    def __init__(self, ttl_seconds: int, uri: str):
+        """Connect to the Redis server at `uri`."""
+        super().__init__(ttl_seconds)
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError(
+                "The redis search cache backend requires the `redis` package. "
+                "Install it with `pip install agent[redis]`."
+            ) from e
+        self._client = redis.from_url(uri)
+
+    async def _get(self, key: str) -> str | None:
+        value = await self._client.get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    async def _set(self, key: str, value: str) -> None:
+        await self._client.set(key, value, ex=self.ttl_seconds)
+
+
+class AnswerCache:
+    """Cache of whole research runs with stale-while-revalidate.
+
+    Answers younger than `ttl_seconds` are fresh. For `stale_seconds` after that
+    they are still served, but the caller is expected to refresh them with
+    `revalidate`, which repeats the run in the background at most once per key.
+    """
+
+    def __init__(self, store: SearchCache, ttl_seconds: int, stale_seconds: int):
+        """Create an answer cache over `store`."""
+        self.store = store
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self._revalidating: dict[str, asyncio.Task] = {}
+
+    async def get(self, key: str) -> tuple[dict[str, Any], bool] | None:
+        """Return the cached run for `key` and whether it is stale, or None on a miss."""
+        entry = await self.store.get_entry(key)
+        if entry is None:
+            return None
+        payload, age = entry
+        if age > self.ttl_seconds + self.stale_seconds:
+            return None
+        return payload, age > self.ttl_seconds
+
+    async def set(self, key: str, payload: dict[str, Any]) -> None:
+        """Store the run `payload` under `key`."""
+        await self.store.set(key, payload)
+
+    def revalidate(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> bool:
+        """Run `refresh` in the background unless `key` is already being refreshed.
+
+        The task starts from an empty context, so it is not traced or streamed as
+        part of the run that served the stale answer.
+
+        Returns:
+            Whether a refresh was started.
+        """
+        if key in self._revalidating:
+            return False
+        task = asyncio.get_running_loop().create_task(
+            refresh(), context=contextvars.Context()
+        )
+        self._revalidating[key] = task
+        task.add_done_callback(lambda _: self._revalidating.pop(key, None))
+        return True
+
+
+_caches: dict[tuple, SearchCache] = {}
+_caches_lock = threading.Lock()
+
+
+def _get_store(configurable: Configuration, backend: str, ttl: int) -> SearchCache:
+    if backend == "memory":
+        key: tuple = (backend, ttl)
+    elif backend == "sqlite":
+        key = (backend, ttl, configurable.search_cache_path)
+    elif backend == "redis":
+        uri = configurable.search_cache_redis_uri or os.getenv("REDIS_URI")
+        if not uri:
+            raise ValueError("REDIS_URI must be set to use the redis search cache")
+        key = (backend, ttl, uri)
+    else:
+        raise ValueError(f"Unknown search cache backend: {backend}")
+
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            if backend == "memory":
+                cache = MemorySearchCache(ttl)
+            elif backend == "sqlite":
+                cache = SQLiteSearchCache(ttl, configurable.search_cache_path)
+            else:
+                cache = RedisSearchCache(ttl, key[2])
+            _caches[key] = cache
+        return cache
+
+
+def get_search_cache(configurable: Configuration) -> SearchCache | None:
+    """Get the process-wide search cache selected by the configuration.
+
+    Returns None when caching is disabled with `search_cache_backend="none"`.
+    """
+    backend = configurable.search_cache_backend
+    if backend == "none":
+        return None
+    return _get_store(configurable, backend, configurable.search_cache_ttl_seconds)
+
+
+_answer_caches: dict[tuple, AnswerCache] = {}
+
+
+def get_answer_cache(configurable: Configuration) -> AnswerCache | None:
+    """Get the process-wide answer cache selected by the configuration.
+
+    It uses the same kinds of backends, SQLite file and Redis instance as the search
+    cache. Returns None when disabled with `answer_cache_backend="none"`, the
+    default.
+    """
+    backend = configurable.answer_cache_backend
+    if backend == "none":
+        return None
+    ttl = configurable.answer_cache_ttl_seconds
+    stale = configurable.answer_cache_stale_seconds
+    # The backend keeps entries for the stale period too
+    store = _get_store(configurable, backend, ttl + stale)
+    with _caches_lock:
+        key = (id(store), ttl, stale)
+        cache = _answer_caches.get(key)
+        if cache is None:
+            cache = _answer_caches[key] = AnswerCache(store, ttl, stale)
+        return cache
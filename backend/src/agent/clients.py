@@ -0,0 +1,171 @@
+"""Pooled Gemini clients shared by the graph nodes."""
+
+import importlib.util
+import os
+import threading
+from collections import OrderedDict
+from functools import cache, partial
+from typing import TYPE_CHECKING, Any, Hashable, Optional
+
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from agent.instrumentation import record_message_usage
+
+# google-genai and langchain-google-genai are only imported when the first client
+# is built, so importing and compiling the graph stays fast and works without
+# credentials.
+if TYPE_CHECKING:
+    from google.genai import Client
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+
+@cache
+def _load_env() -> None:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+
+def get_api_key() -> str:
+    """Get the Gemini API key, loading `.env` on first use."""
+    _load_env()
+    api_key = os.getenv("GEMINI_API_KEY")
+    if api_key is None:
+        raise ValueError("GEMINI_API_KEY is not set")
+    return api_key
+
+
+def get_http_client_args() -> dict[str, Any] | None:
+    """Get the httpx client arguments shared by every Gemini client in this process.
+
+    HTTP/2 is only enabled when the optional `h2` package is installed. google-genai
+    prefers aiohttp for async calls when it is importable and aiohttp does not speak
+    HTTP/2, so in that case the default transport is left untouched.
+    """
+    if importlib.util.find_spec("h2") is None:
+        return None
+    if importlib.util.find_spec("aiohttp") is not None:
+        return None
+    return {"http2": True}
+
+
+def _parse_structured(model: str, output: dict[str, Any]) -> Any:
+    """Record the raw message's token usage and return the parsed structured output."""
+    record_message_usage(model, output["raw"])
+    if output.get("parsing_error") is not None:
+        raise output["parsing_error"]
+    return output["parsed"]
+
+
+class LLMRegistry:
+    """LRU registry of warm chat models and structured-output runnables.
+
+    Entries are keyed by (model, temperature, schema, cached_content). Structured
+    runnables and models reading a cached prompt prefix are derived from the plain
+    chat model for the same (model, temperature), so they all share that model's
+    HTTP connection pool. Structured runnables keep the raw message long enough to
+    record its token usage on the running node.
+    """
+
+    def __init__(self, maxsize: int = 32):
+        """Create a registry keeping at most `maxsize` clients."""
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, Runnable] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        model: str,
+        temperature: float,
+        schema: type | None = None,
+        cached_content: str | None = None,
+    ) -> Runnable:
+        """Return the cached runnable for the key, building it on a miss."""
+        key = (model, temperature, schema, cached_content)
+        with self._lock:
+            runnable = self._entries.get(key)
+            if runnable is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return runnable
+            self.misses += 1
+
+            llm = self._entries.get((model, temperature, None, None))
+            if llm is None:
+                llm = self._build_llm(model, temperature)
+                self._put((model, temperature, None, None), llm)
+            if cached_content is not None:
+                # A shallow copy keeps the client and its connection pool
+                llm = llm.model_copy(update={"cached_content": cached_content})
+            if schema is None:
+                runnable = llm
+            else:
+                runnable = llm.with_structured_output(
+                    schema, include_raw=True
+                ) | RunnableLambda(partial(_parse_structured, model))
+            self._put(key, runnable)
+            return runnable
+
+    def stats(self) -> dict[str, int]:
+        """Return the hit and miss counters and the current number of entries."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+    def clear(self) -> None:
+        """Drop every cached runnable and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _put(self, key: Hashable, runnable: Runnable) -> None:
+        self._entries[key] = runnable
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _build_llm(self, model: str, temperature: float) -> "ChatGoogleGenerativeAI":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=model,
+            temperature=temperature,
+            # Retries are handled by agent.resilience with a per-run budget
+            max_retries=1,
+            api_key=get_api_key(),
+            client_args=get_http_client_args(),
+        )
+
+
+# Process-wide registry used by the graph nodes
+llm_registry = LLMRegistry()
+
+_genai_client: Optional["Client"] = None
+_genai_client_lock = threading.Lock()
+
+
+def get_genai_client() -> "Client":
+    """Get the process-wide google genai client used for Google Search grounding.
+
+    The client is built on first use.
+    """
+    global _genai_client
+    if _genai_client is None:
+        with _genai_client_lock:
+            if _genai_client is None:
+                from google.genai import Client
+
+                _genai_client = Client(
+                    api_key=get_api_key(),
+                    http_options={
+                        "client_args": get_http_client_args(),
+                        "async_client_args": get_http_client_args(),
+                    },
+                )
+    return _genai_client
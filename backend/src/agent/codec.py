@@ -0,0 +1,168 @@
+"""msgpack + zstd encoding for checkpoints and streamed run events.
+
+Research summaries and answers repeat the same markdown and citation links, so
+they compress well, and a zstd dictionary trained on typical summaries also
+compresses the small per-event payloads. Train one from JSONL files holding
+summaries or answers (e.g. the output of `agent.batch`):
+
+    python -m agent.codec train answers.jsonl -o summaries.zdict
+
+and point `AGENT_ZSTD_DICTIONARY` at it. Every process reading the data needs
+the same dictionary. Requires the `zstandard` package (`pip install agent[zstd]`).
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+from functools import cache
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import ormsgpack
+
+# Media type of the compressed event stream; clients opt in through `Accept`
+STREAM_MEDIA_TYPE = "application/vnd.agent.events+msgpack+zstd"
+
+_FRAME_HEADER = struct.Struct(">I")
+
+
+def _zstd() -> Any:
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "zstd compression requires the `zstandard` package. "
+            "Install it with `pip install agent[zstd]`."
+        ) from e
+    return zstandard
+
+
+def collect_samples(paths: Iterable[str | Path], min_length: int = 64) -> list[bytes]:
+    """Collect every string of at least `min_length` characters from JSONL files."""
+    samples = []
+
+    def visit(value: Any) -> None:
+        if isinstance(value, str):
+            if len(value) >= min_length:
+                samples.append(value.encode("utf-8"))
+        elif isinstance(value, list):
+            for item in value:
+                visit(item)
+        elif isinstance(value, dict):
+            for item in value.values():
+                visit(item)
+
+    for path in paths:
+        with open(path, encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    visit(json.loads(line))
+    return samples
+
+
+def train_dictionary(samples: list[bytes], size: int = 32 * 1024) -> bytes:
+    """Train a zstd dictionary of `size` bytes on sample summaries."""
+    return _zstd().train_dictionary(size, samples).as_bytes()
+
+
+class ZstdCodec:
+    """zstd compression of msgpack payloads, with an optional shared dictionary."""
+
+    def __init__(self, dictionary: bytes | None = None, level: int = 3):
+        """Create a codec, with a trained zstd `dictionary` if given."""
+        zstandard = _zstd()
+        self.dictionary = (
+            zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+        )
+        self.dictionary_id = self.dictionary.dict_id() if self.dictionary else 0
+        self.level = level
+        self._zstandard = zstandard
+        # Compressor objects are not thread-safe, and building one loads the
+        # dictionary, so each thread keeps its own
+        self._local = threading.local()
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress `data` with this thread's compressor."""
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = self._zstandard.ZstdCompressor(
+                level=self.level, dict_data=self.dictionary
+            )
+        return compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        """Decompress `data` with this thread's decompressor."""
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = self._zstandard.ZstdDecompressor(
+                dict_data=self.dictionary
+            )
+        return decompressor.decompress(data)
+
+    def encode_frame(self, event: str, data: Any, event_id: str | None = None) -> bytes:
+        """Encode one stream event as a length-prefixed compressed msgpack frame.
+
+        The frame holds `[event, data]`, or `[event, data, event_id]` for events with
+        an id, which clients send back as `Last-Event-ID` to resume the stream.
+        """
+        item = [event, data] if event_id is None else [event, data, event_id]
+        frame = self.compress(ormsgpack.packb(item))
+        return _FRAME_HEADER.pack(len(frame)) + frame
+
+    def iter_frames(
+        self, chunks: Iterable[bytes]
+    ) -> Iterator[tuple[str, Any, str | None]]:
+        """Decode `(event, data, event_id)` from the raw chunks of a compressed stream.
+
+        `event_id` is None for events without an id.
+        """
+        buffer = b""
+        for chunk in chunks:
+            buffer += chunk
+            while len(buffer) >= _FRAME_HEADER.size:
+                (length,) = _FRAME_HEADER.unpack_from(buffer)
+                end = _FRAME_HEADER.size + length
+                if len(buffer) < end:
+                    break
+                event, data, *event_id = ormsgpack.unpackb(
+                    self.decompress(buffer[_FRAME_HEADER.size : end])
+                )
+                buffer = buffer[end:]
+                yield event, data, event_id[0] if event_id else None
+
+
+@cache
+def get_codec() -> ZstdCodec:
+    """Get the process-wide codec, using the dictionary at `AGENT_ZSTD_DICTIONARY` if set."""
+    path = os.getenv("AGENT_ZSTD_DICTIONARY")
+    dictionary = Path(path).read_bytes() if path else None
+    return ZstdCodec(dictionary, level=int(os.getenv("AGENT_ZSTD_LEVEL", "3")))
+
+
+def main() -> None:
+    """Train a zstd dictionary from the command line."""
+    parser = argparse.ArgumentParser(description="msgpack + zstd codec tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    train = commands.add_parser("train", help="Train a dictionary on JSONL files")
+    train.add_argument(
+        "inputs", nargs="+", help="JSONL files holding summaries or answers"
+    )
+    train.add_argument("-o", "--output", required=True, help="Dictionary file to write")
+    train.add_argument(
+        "--size", type=int, default=32 * 1024, help="Dictionary size in bytes"
+    )
+    args = parser.parse_args()
+
+    samples = collect_samples(args.inputs)
+    dictionary = train_dictionary(samples, args.size)
+    Path(args.output).write_bytes(dictionary)
+    sys.stdout.write(
+        f"Trained a {len(dictionary)} byte dictionary on {len(samples)} samples\n"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""Concurrency limits and quorum cancellation for web search branches."""
+
+import asyncio
+import math
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.runtime import get_runtime
+
+from agent.configuration import Configuration
+from agent.instrumentation import record_queue_wait
+
+# One process-wide semaphore per event loop. asyncio primitives are bound to the
+# loop that first waits on them, so CLI scripts that call `asyncio.run` several
+# times get a fresh semaphore for every loop.
+_process_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, tuple[int, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+
+T = TypeVar("T")
+
+# Per-run semaphores only live while at least one search of the run holds them.
+_run_semaphores: "weakref.WeakValueDictionary[tuple[int, str, int], asyncio.Semaphore]" = weakref.WeakValueDictionary()
+
+
+def get_run_id(config: RunnableConfig | None) -> str | None:
+    """Get the id of the current graph invocation.
+
+    The LangGraph API server injects `run_id` into the configurable section.
+    Local callers pass it at the top level of the config instead
+    (`graph.ainvoke(state, {"run_id": uuid4(), ...})`), which LangGraph exposes
+    to every node of the invocation through the runtime's execution info.
+    """
+    run_id = (config or {}).get("configurable", {}).get("run_id")
+    if run_id is None:
+        try:
+            run_id = get_runtime().execution_info.run_id
+        except (RuntimeError, AttributeError):
+            # Called outside a graph run
+            run_id = None
+    return str(run_id) if run_id is not None else None
+
+
+def get_run_key(config: RunnableConfig | None) -> str | None:
+    """Get a key identifying the current graph run.
+
+    This is the run id from `get_run_id`, or else the `thread_id`. Local
+    invocations without either fall back to the process-wide limit only.
+    """
+    run_key = get_run_id(config) or (config or {}).get("configurable", {}).get(
+        "thread_id"
+    )
+    return str(run_key) if run_key is not None else None
+
+
+def _process_semaphore(limit: int) -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    entry = _process_semaphores.get(loop)
+    if entry is None or entry[0] != limit:
+        entry = (limit, asyncio.Semaphore(limit))
+        _process_semaphores[loop] = entry
+    return entry[1]
+
+
+def _run_semaphore(run_key: str, limit: int) -> asyncio.Semaphore:
+    key = (id(asyncio.get_running_loop()), run_key, limit)
+    semaphore = _run_semaphores.get(key)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(limit)
+        _run_semaphores[key] = semaphore
+    return semaphore
+
+
+@asynccontextmanager
+async def search_slot(config: RunnableConfig | None) -> AsyncIterator[None]:
+    """Hold one in-flight search slot for the duration of the block.
+
+    The per-run slot is acquired first so a run that is already at its own limit
+    does not hold process-wide slots that other runs could use. Time spent waiting
+    for the slots is recorded as queue wait on the running node.
+    """
+    waiting_since = time.perf_counter()
+    configurable = Configuration.from_runnable_config(config)
+    if configurable.use_batch_api:
+        # Searches wait in a batch job, not on a connection
+        yield
+        return
+    process_semaphore = _process_semaphore(max(1, configurable.max_concurrent_searches))
+    run_key = get_run_key(config)
+    if run_key is None:
+        async with process_semaphore:
+            record_queue_wait(time.perf_counter() - waiting_since)
+            yield
+        return
+
+    run_semaphore = _run_semaphore(
+        run_key, max(1, configurable.max_concurrent_searches_per_run)
+    )
+    async with run_semaphore, process_semaphore:
+        record_queue_wait(time.perf_counter() - waiting_since)
+        yield
+
+
+class BranchAbandoned(asyncio.TimeoutError):
+    """Raised when a web research branch is cancelled as a straggler."""
+
+    def __init__(self, reason: str, waited_seconds: float):
+        """Record why the search was abandoned and how long it had waited."""
+        super().__init__(f"search abandoned ({reason}) after {waited_seconds:.2f}s")
+        self.reason = reason
+        self.waited_seconds = waited_seconds
+
+
+class BranchGroup:
+    """Tracks the parallel web research branches of one fan-out.
+
+    Once `quorum` branches have finished, the remaining ones get `grace_seconds`
+    more before they are cancelled, so one slow grounded search does not hold up
+    reflection. Each branch can also be bounded by an absolute deadline.
+    """
+
+    def __init__(
+        self, size: int, quorum: int, on_done: Callable[[], None] | None = None
+    ):
+        """Create a group of `size` branches with the given `quorum`.
+
+        `on_done` is called once all `size` branches have finished.
+        """
+        self.size = size
+        self.quorum = quorum
+        self.finished = 0
+        self.quorum_reached = asyncio.Event()
+        self._on_done = on_done
+
+    def finish(self) -> None:
+        """Mark one branch as finished."""
+        self.finished += 1
+        if self.finished >= self.quorum:
+            self.quorum_reached.set()
+        if self.finished == self.size and self._on_done is not None:
+            self._on_done()
+
+    async def run(
+        self,
+        awaitable: Awaitable[T],
+        grace_seconds: float,
+        deadline_seconds: float | None = None,
+    ) -> T:
+        """Await a branch's search under the quorum and deadline rules.
+
+        Raises:
+            BranchAbandoned: If the search was cancelled as a straggler.
+        """
+        if self.quorum >= self.size and deadline_seconds is None:
+            try:
+                return await awaitable
+            finally:
+                self.finish()
+
+        start = time.perf_counter()
+        task = asyncio.ensure_future(awaitable)
+        quorum_wait = asyncio.ensure_future(self.quorum_reached.wait())
+        try:
+            await asyncio.wait(
+                {task, quorum_wait},
+                timeout=deadline_seconds,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            reason = "deadline"
+            if not task.done() and quorum_wait.done():
+                reason = "quorum"
+                timeout = grace_seconds
+                if deadline_seconds is not None:
+                    elapsed = time.perf_counter() - start
+                    timeout = min(timeout, max(0.0, deadline_seconds - elapsed))
+                await asyncio.wait({task}, timeout=timeout)
+            if not task.done():
+                task.cancel()
+                raise BranchAbandoned(reason, time.perf_counter() - start)
+            return task.result()
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            quorum_wait.cancel()
+            self.finish()
+
+
+# The branch groups of each event loop by run and fan-out. A group is held until
+# all of its branches have finished, however late the last ones start; groups of
+# runs that failed midway are dropped with their loop.
+_branch_groups: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[tuple[str | None, str], BranchGroup]]" = weakref.WeakKeyDictionary()
+
+
+def get_branch_group(
+    state: dict[str, Any], config: RunnableConfig | None, quorum_fraction: float
+) -> BranchGroup:
+    """Get the group shared by the branches of the fan-out that sent `state`.
+
+    Branches carry `branch_group` and `branch_count` in their `Send` payload. A
+    branch without them forms a group of its own.
+    """
+    size = max(1, state.get("branch_count") or 1)
+    quorum = min(size, max(1, math.ceil(quorum_fraction * size)))
+    group_id = state.get("branch_group")
+    if group_id is None:
+        return BranchGroup(size, quorum)
+    groups = _branch_groups.setdefault(asyncio.get_running_loop(), {})
+    key = (get_run_key(config), group_id)
+    group = groups.get(key)
+    if group is None:
+        group = groups[key] = BranchGroup(
+            size, quorum, on_done=lambda: groups.pop(key, None)
+        )
+    return group
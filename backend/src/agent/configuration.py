@@ -1,8 +1,8 @@
 import os
-from pydantic import BaseModel, Field
-from typing import Any, Optional
+from typing import Any
 
 from langchain_core.runnables import RunnableConfig
+from pydantic import BaseModel, Field
 
 
 class Configuration(BaseModel):
@@ -39,9 +39,350 @@ class Configuration(BaseModel):
         metadata={"description": "The maximum number of research loops to perform."},
     )
 
+    max_concurrent_searches_per_run: int = Field(
+        default=5,
+        metadata={
+            "description": "The maximum number of web searches a single run may have in flight."
+        },
+    )
+
+    max_concurrent_searches: int = Field(
+        default=64,
+        metadata={
+            "description": "The maximum number of web searches in flight across all runs in this process."
+        },
+    )
+
+    search_timeout_seconds: float | None = Field(
+        default=60.0,
+        metadata={
+            "description": "Deadline in seconds for each grounded search attempt."
+        },
+    )
+
+    llm_timeout_seconds: float | None = Field(
+        default=120.0,
+        metadata={
+            "description": "Deadline in seconds for each query generation, reflection and answer model call."
+        },
+    )
+
+    hedge_searches: bool = Field(
+        default=True,
+        metadata={
+            "description": "Whether to send a duplicate grounded search when an attempt is slower than the recent p95 search latency."
+        },
+    )
+
+    max_attempts: int = Field(
+        default=3,
+        metadata={
+            "description": "Maximum number of attempts per model call on timeouts, 429 and 5xx errors."
+        },
+    )
+
+    retry_budget_per_run: int = Field(
+        default=10,
+        metadata={
+            "description": "Maximum number of retries and hedged requests across a whole run."
+        },
+    )
+
+    rate_limit_backend: str = Field(
+        default="memory",
+        metadata={
+            "description": "Where the Gemini quota buckets live: 'none', 'memory' (this process) or 'redis' (every process of the deployment)."
+        },
+    )
+
+    model_rate_limits: dict[str, dict[str, int]] = Field(
+        default_factory=dict,
+        metadata={
+            "description": "Per-model quotas as {model: {'rpm': requests per minute, 'tpm': tokens per minute}}. The 'default' entry applies to models without their own entry. Models without limits are not throttled."
+        },
+    )
+
+    rate_limit_redis_uri: str | None = Field(
+        default=None,
+        metadata={
+            "description": "The Redis URI used by the 'redis' rate limiter backend. Defaults to REDIS_URI."
+        },
+    )
+
+    priority: str = Field(
+        default="interactive",
+        metadata={
+            "description": "Priority class of the run's Gemini calls in the rate limiter: 'interactive' or 'batch'."
+        },
+    )
+
+    search_quorum: float = Field(
+        default=1.0,
+        metadata={
+            "description": "Fraction of the parallel web searches of a loop that must finish before the remaining ones get only straggler_grace_seconds more (e.g. 0.67 for 2 of 3). 1.0 waits for every search."
+        },
+    )
+
+    straggler_grace_seconds: float = Field(
+        default=2.0,
+        metadata={
+            "description": "Seconds a web search may keep running once the quorum of its loop has finished before it is cancelled."
+        },
+    )
+
+    search_deadline_seconds: float | None = Field(
+        default=None,
+        metadata={
+            "description": "Absolute deadline in seconds for each web search, including time spent waiting for a slot. Unset means no deadline."
+        },
+    )
+
+    query_dedup_threshold: float = Field(
+        default=0.85,
+        metadata={
+            "description": "Cosine similarity at which a generated query counts as a near-duplicate of an earlier one and is dropped. Values above 1 disable deduplication."
+        },
+    )
+
+    min_information_gain: float = Field(
+        default=0.1,
+        metadata={
+            "description": "Information gain score in [0, 1] below which a research loop ends without calling the reflection model. 0 disables the early exit."
+        },
+    )
+
+    stream_final_answer: bool = Field(
+        default=True,
+        metadata={
+            "description": "Whether finalize_answer streams tokens to the messages stream mode as they arrive."
+        },
+    )
+
+    context_token_budgets: dict[str, int] = Field(
+        default_factory=lambda: {"default": 32000},
+        metadata={
+            "description": "Per-model token budget for the research summaries sent to reflection and finalize_answer. The 'default' entry applies to models without their own entry."
+        },
+    )
+
+    use_batch_api: bool = Field(
+        default=False,
+        metadata={
+            "description": "Send every model call through the Gemini Batch API, collected across concurrent runs, instead of the interactive API. For non-interactive workloads."
+        },
+    )
+
+    batch_api_window_seconds: float = Field(
+        default=5.0,
+        metadata={
+            "description": "Seconds requests are collected before they are submitted as one batch job."
+        },
+    )
+
+    batch_api_max_requests: int = Field(
+        default=1000,
+        metadata={
+            "description": "Number of pending requests that submits a batch job before the window ends."
+        },
+    )
+
+    batch_api_poll_seconds: float = Field(
+        default=30.0,
+        metadata={
+            "description": "Seconds between status checks of a submitted batch job."
+        },
+    )
+
+    batch_id: str | None = Field(
+        default=None,
+        metadata={
+            "description": "Identifier of the batch the run belongs to. Runs of one batch share search results for identical and near-identical queries."
+        },
+    )
+
+    batch_query_threshold: float = Field(
+        default=0.9,
+        metadata={
+            "description": "Cosine similarity at which a query reuses the search result of a near-identical query from another run of the same batch."
+        },
+    )
+
+    search_cache_backend: str = Field(
+        default="memory",
+        metadata={
+            "description": "Where web search results are cached: 'none', 'memory', 'sqlite' or 'redis'."
+        },
+    )
+
+    search_cache_ttl_seconds: int = Field(
+        default=3600,
+        metadata={
+            "description": "How long a cached web search result may be served. Entries also expire when the date changes."
+        },
+    )
+
+    search_cache_path: str = Field(
+        default=".cache/search_cache.sqlite3",
+        metadata={
+            "description": "The SQLite file used by the 'sqlite' search cache backend."
+        },
+    )
+
+    search_cache_redis_uri: str | None = Field(
+        default=None,
+        metadata={
+            "description": "The Redis URI used by the 'redis' search cache backend. Defaults to REDIS_URI."
+        },
+    )
+
+    use_prompt_cache: bool = Field(
+        default=False,
+        metadata={
+            "description": "Send the static instruction prefix of each prompt as a Gemini cached content instead of inline."
+        },
+    )
+
+    prompt_cache_ttl_seconds: int = Field(
+        default=3600,
+        metadata={
+            "description": "TTL of the cached prompt prefixes. They are extended while in use."
+        },
+    )
+
+    prompt_cache_min_tokens: dict[str, int] = Field(
+        default_factory=lambda: {
+            "gemini-2.5-flash": 1024,
+            "gemini-2.5-pro": 2048,
+            "default": 4096,
+        },
+        metadata={
+            "description": "Per-model minimum size of a cached prompt prefix. Prefixes with fewer estimated tokens are sent inline, since Gemini rejects smaller cached contents. The 'default' entry applies to models without their own entry."
+        },
+    )
+
+    answer_cache_backend: str = Field(
+        default="none",
+        metadata={
+            "description": "Where whole research runs are cached by question, models and effort settings: 'none', 'memory', 'sqlite' or 'redis'. A cached answer is replayed to anyone asking the same question, so caching is off unless set. Entries expire when the date changes."
+        },
+    )
+
+    answer_cache_ttl_seconds: int = Field(
+        default=3600,
+        metadata={"description": "How long a cached answer is served as fresh."},
+    )
+
+    answer_cache_stale_seconds: int = Field(
+        default=3600,
+        metadata={
+            "description": "How long after its TTL a cached answer is still served while the run is repeated in the background to refresh it."
+        },
+    )
+
+    refresh_answer_cache: bool = Field(
+        default=False,
+        metadata={
+            "description": "Run the full research and overwrite the cached answer instead of serving it."
+        },
+    )
+
+    enrich_sources_top_n: int = Field(
+        default=0,
+        metadata={
+            "description": "Number of most cited sources of each web search whose pages are fetched and their main text stored in source_pages. 0 disables enrichment."
+        },
+    )
+
+    enrich_timeout_seconds: float = Field(
+        default=10.0,
+        metadata={
+            "description": "Deadline in seconds for fetching one source page, redirects included."
+        },
+    )
+
+    enrich_max_bytes: int = Field(
+        default=1_000_000,
+        metadata={
+            "description": "Bytes of a source page read at most; the rest is not downloaded."
+        },
+    )
+
+    enrich_max_chars: int = Field(
+        default=8000,
+        metadata={"description": "Characters of extracted text kept per source page."},
+    )
+
+    enrich_connections_per_host: int = Field(
+        default=4,
+        metadata={
+            "description": "Maximum number of source page requests in flight to one host."
+        },
+    )
+
+    enrich_cache_path: str = Field(
+        default=".cache/source_pages.sqlite3",
+        metadata={
+            "description": "The SQLite file caching fetched source pages with their ETags. Empty disables the cache."
+        },
+    )
+
+    enrich_cache_ttl_seconds: int = Field(
+        default=86400,
+        metadata={
+            "description": "How long a cached source page is used without asking the server whether it changed."
+        },
+    )
+
+    resolve_source_urls: bool = Field(
+        default=False,
+        metadata={
+            "description": "Resolve the grounding redirect links of sources to the canonical publisher URLs, so sources found by several searches are listed once."
+        },
+    )
+
+    url_resolver_timeout_seconds: float = Field(
+        default=5.0,
+        metadata={
+            "description": "Timeout in seconds for each request made while resolving a redirect link."
+        },
+    )
+
+    url_resolver_max_concurrency: int = Field(
+        default=16,
+        metadata={
+            "description": "Maximum number of redirect resolution requests in flight in this process."
+        },
+    )
+
+    url_resolver_cache_path: str = Field(
+        default=".cache/resolved_urls.sqlite3",
+        metadata={
+            "description": "The SQLite file storing resolved redirect links across runs. Empty keeps them in memory only."
+        },
+    )
+
+    rank_sources_top_k: int = Field(
+        default=0,
+        metadata={
+            "description": "Number of sources finalize_answer keeps, ranked by citations, corroborating searches, sole support of cited segments, domain authority and recency. Summaries citing none of them are dropped and links to the others removed. 0 disables ranking."
+        },
+    )
+
+    def context_token_budget(self, model: str) -> int:
+        """Get the summary token budget for `model`."""
+        return self.context_token_budgets.get(
+            model, self.context_token_budgets.get("default", 32000)
+        )
+
+    def prompt_cache_min_tokens_for(self, model: str) -> int:
+        """Get the smallest prompt prefix cached for `model`."""
+        return self.prompt_cache_min_tokens.get(
+            model, self.prompt_cache_min_tokens.get("default", 4096)
+        )
+
     @classmethod
     def from_runnable_config(
-        cls, config: Optional[RunnableConfig] = None
+        cls, config: RunnableConfig | None = None
     ) -> "Configuration":
         """Create a Configuration instance from a RunnableConfig."""
         configurable = (
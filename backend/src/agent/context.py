@@ -0,0 +1,107 @@
+"""Token counting and budgeting of research summaries."""
+
+import re
+from typing import Any
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+_CITATION_RE = re.compile(r"\s*\[[^\]]*\]\([^)]*\)")
+
+
+def count_tokens(text: str) -> int:
+    """Estimate the number of tokens in `text` without calling the API.
+
+    Approximates Gemini's SentencePiece tokenizer: one token per started group of
+    four word characters and one per punctuation mark.
+    """
+    return sum((len(token) + 3) // 4 for token in _TOKEN_RE.findall(text))
+
+
+def strip_citations(text: str) -> str:
+    """Remove markdown citation links such as ` [site](https://...)` from `text`."""
+    return _CITATION_RE.sub("", text)
+
+
+def _sentence_key(sentence: str) -> str:
+    """Normalize a sentence for dedup, ignoring citation links, case and spacing."""
+    return " ".join(_TOKEN_RE.findall(strip_citations(sentence).lower()))
+
+
+def dedup_sentences(summaries: list[str]) -> tuple[list[str], int]:
+    """Drop sentences that already appeared in an earlier summary or line.
+
+    Line structure is kept so markdown lists and headings survive. Sentences are
+    compared without their citation links.
+
+    Returns:
+        The deduplicated summaries (empty ones removed) and the number of
+        sentences dropped.
+    """
+    seen: set[str] = set()
+    dropped = 0
+    result = []
+    for summary in summaries:
+        lines = []
+        for line in summary.split("\n"):
+            if not line.strip():
+                lines.append(line)
+                continue
+            kept = []
+            for sentence in _SENTENCE_END_RE.split(line):
+                key = _sentence_key(sentence)
+                if key and key in seen:
+                    dropped += 1
+                    continue
+                seen.add(key)
+                kept.append(sentence)
+            if kept:
+                lines.append(" ".join(kept))
+        text = "\n".join(lines).strip()
+        if text:
+            result.append(text)
+    return result, dropped
+
+
+def fit_summaries_to_budget(
+    summaries: list[str], budget: int
+) -> tuple[list[str], dict[str, Any]]:
+    """Shrink research summaries until they fit in `budget` tokens.
+
+    Redundant sentences are removed first. If the summaries are still over budget,
+    the oldest summaries are pruned, and as a last resort the newest one is cut at
+    a sentence boundary. At least part of the newest summary is always kept.
+
+    Returns:
+        The summaries to put in the prompt and a metrics dictionary with the token
+        counts before and after the stage.
+    """
+    tokens_before = sum(count_tokens(summary) for summary in summaries)
+    kept, dropped_sentences = dedup_sentences(summaries)
+    counts = [count_tokens(summary) for summary in kept]
+
+    dropped_summaries = len(summaries) - len(kept)
+    while len(kept) > 1 and sum(counts) > budget:
+        kept.pop(0)
+        counts.pop(0)
+        dropped_summaries += 1
+
+    if kept and counts[0] > budget:
+        sentences = []
+        used = 0
+        for sentence in _SENTENCE_END_RE.split(kept[0]):
+            cost = count_tokens(sentence)
+            if used + cost > budget:
+                break
+            sentences.append(sentence)
+            used += cost
+        # A single sentence longer than the budget is cut at ~4 characters per token
+        kept = [" ".join(sentences) if sentences else kept[0][: budget * 4]]
+
+    metrics = {
+        "tokens_before": tokens_before,
+        "tokens_after": sum(count_tokens(summary) for summary in kept),
+        "budget": budget,
+        "dropped_sentences": dropped_sentences,
+        "dropped_summaries": dropped_summaries,
+    }
+    return kept, metrics
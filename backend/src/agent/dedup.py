@@ -0,0 +1,194 @@
+"""Near-duplicate detection of search queries."""
+
+import asyncio
+import threading
+import weakref
+import zlib
+from typing import TYPE_CHECKING, Any
+
+from agent.cache import normalize_query
+from agent.configuration import Configuration
+
+# numpy is imported on first use to keep `import agent.graph` fast
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def _char_ngrams(text: str, n: int) -> list[str]:
+    padded = f" {text} "
+    return [padded[i : i + n] for i in range(max(1, len(padded) - n + 1))]
+
+
+def _word_bigrams(text: str) -> list[str]:
+    # Prefixed so they never share a hash bucket key with a character n-gram
+    words = text.split()
+    return [f"\x1f{left} {right}" for left, right in zip(words, words[1:])]
+
+
+def ngram_tfidf_matrix(
+    texts: list[str], n: int = 3, dims: int = 1 << 12
+) -> "np.ndarray":
+    """Build L2-normalized character n-gram TF-IDF vectors for `texts`.
+
+    Texts are normalized with `normalize_query` first, so case and stopwords do
+    not count as differences. Word bigrams are added to the character n-grams,
+    so swapping words ("python to rust", "rust to python") does. N-grams are
+    hashed into `dims` buckets.
+    """
+    import numpy as np
+
+    counts = np.zeros((len(texts), dims), dtype=np.float32)
+    for row, text in enumerate(texts):
+        normalized = normalize_query(text)
+        buckets = [
+            zlib.crc32(gram.encode()) % dims
+            for gram in _char_ngrams(normalized, n) + _word_bigrams(normalized)
+        ]
+        np.add.at(counts[row], buckets, 1.0)
+
+    document_frequency = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1.0
+    vectors = counts * idf
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def suppress_near_duplicates(
+    candidates: list[str], existing: list[str], threshold: float
+) -> tuple[list[str], list[dict[str, Any]]]:
+    """Drop candidate queries that are near-duplicates of earlier queries.
+
+    Each candidate is compared with the existing queries and with the candidates
+    kept before it. Candidates whose cosine similarity to any of them reaches
+    `threshold` are dropped. Exact repeats are always dropped, because the
+    `search_query` channel only keeps unique queries.
+
+    Args:
+        candidates: Newly generated queries, in order.
+        existing: Queries that already ran in this thread.
+        threshold: Cosine similarity in [0, 1] at which a candidate is a duplicate.
+
+    Returns:
+        A tuple of the kept candidates and a list of dropped-query records with
+        "query", "duplicate_of" and "similarity" keys.
+    """
+    if not candidates:
+        return [], []
+
+    import numpy as np
+
+    texts = list(dict.fromkeys(existing)) + list(candidates)
+    offset = len(texts) - len(candidates)
+    vectors = ngram_tfidf_matrix(texts)
+    similarities = vectors[offset:] @ vectors.T
+
+    seen = list(range(offset))
+    seen_texts = set(texts[:offset])
+    kept: list[str] = []
+    dropped: list[dict[str, Any]] = []
+    for i, candidate in enumerate(candidates):
+        if candidate in seen_texts:
+            dropped.append(
+                {"query": candidate, "duplicate_of": candidate, "similarity": 1.0}
+            )
+            continue
+        if seen:
+            scores = similarities[i, seen]
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                dropped.append(
+                    {
+                        "query": candidate,
+                        "duplicate_of": texts[seen[best]],
+                        "similarity": round(float(scores[best]), 4),
+                    }
+                )
+                continue
+        kept.append(candidate)
+        seen.append(offset + i)
+        seen_texts.add(candidate)
+    return kept, dropped
+
+
+class SharedQueryIndex:
+    """Queries searched by the runs of one batch.
+
+    `canonical` maps a query to an earlier, near-identical query of the batch so
+    both share one cached search result. Vectors are plain n-gram frequencies
+    (no IDF), so they stay comparable as the index grows.
+    """
+
+    def __init__(self, threshold: float):
+        """Create an empty index with the given similarity `threshold`."""
+        self.threshold = threshold
+        self._queries: list[str] = []
+        self._by_text: dict[str, str] = {}
+        self._vectors: np.ndarray | None = None
+        self._lock = threading.Lock()
+        self._search_locks: weakref.WeakValueDictionary[
+            tuple[int, str], asyncio.Lock
+        ] = weakref.WeakValueDictionary()
+
+    def __len__(self) -> int:
+        """Return the number of queries in the index."""
+        return len(self._queries)
+
+    def canonical(self, query: str) -> str:
+        """Get the earliest indexed query near-identical to `query`, indexing it if new."""
+        import numpy as np
+
+        with self._lock:
+            known = self._by_text.get(query)
+            if known is not None:
+                return known
+            vector = ngram_tfidf_matrix([query])[0]
+            count = len(self._queries)
+            if count:
+                similarities = self._vectors[:count] @ vector
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.threshold:
+                    self._by_text[query] = self._queries[best]
+                    return self._queries[best]
+            if self._vectors is None or count == len(self._vectors):
+                grown = np.zeros(
+                    (max(64, 2 * count), vector.shape[0]), dtype=vector.dtype
+                )
+                if self._vectors is not None:
+                    grown[:count] = self._vectors
+                self._vectors = grown
+            self._vectors[count] = vector
+            self._queries.append(query)
+            self._by_text[query] = query
+            return query
+
+    def lock(self, key: str) -> asyncio.Lock:
+        """Get the lock serializing searches for one cache key across the batch."""
+        lock_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            lock = self._search_locks.get(lock_key)
+            if lock is None:
+                lock = asyncio.Lock()
+                self._search_locks[lock_key] = lock
+            return lock
+
+
+_shared_indexes: dict[str, SharedQueryIndex] = {}
+_shared_indexes_lock = threading.Lock()
+
+
+def get_shared_query_index(configurable: Configuration) -> SharedQueryIndex | None:
+    """Get the query index of the run's batch, or None outside of a batch."""
+    if not configurable.batch_id:
+        return None
+    with _shared_indexes_lock:
+        index = _shared_indexes.get(configurable.batch_id)
+        if index is None:
+            index = SharedQueryIndex(configurable.batch_query_threshold)
+            _shared_indexes[configurable.batch_id] = index
+        return index
+
+
+def release_shared_query_index(batch_id: str) -> None:
+    """Drop the query index of a finished batch."""
+    with _shared_indexes_lock:
+        _shared_indexes.pop(batch_id, None)
@@ -0,0 +1,373 @@
+"""Fetching and text extraction of the pages cited by searches."""
+
+import asyncio
+import codecs
+import importlib.util
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, defaultdict
+from html.parser import HTMLParser
+from typing import TYPE_CHECKING, Any, Collection
+from urllib.parse import urljoin, urlsplit
+
+from agent.addresses import BlockedAddressError, check_peer_address, check_public_url
+from agent.configuration import Configuration
+from agent.sources import Source
+
+if TYPE_CHECKING:
+    import httpx
+
+# Media types whose text is extracted; other responses are skipped unread
+TEXT_CONTENT_TYPES = frozenset({"text/html", "application/xhtml+xml", "text/plain"})
+
+_MAX_REDIRECTS = 5
+
+# Elements whose text is never page content
+_SKIPPED_TAGS = frozenset(
+    "script style noscript template svg nav header footer aside form iframe button select".split()
+)
+# Elements holding the main content when a page marks it up
+_MAIN_TAGS = frozenset({"article", "main"})
+_BLOCK_TAGS = (
+    frozenset(
+        "p div br li ul ol h1 h2 h3 h4 h5 h6 tr td th section blockquote pre dd dt".split()
+    )
+    | _MAIN_TAGS
+)
+# Main content shorter than this is probably a teaser, so the whole body is used
+_MIN_MAIN_CHARS = 200
+
+_SPACES_RE = re.compile(r"[ \t\r\f\v]+")
+
+
+class TextExtractor(HTMLParser):
+    """Incremental HTML parser collecting the readable text of a page.
+
+    Feed it chunks as they arrive. Text inside scripts, navigation, headers,
+    footers and forms is dropped, and when the page has `<article>` or `<main>`
+    elements with enough text only their text is kept.
+    """
+
+    def __init__(self) -> None:
+        """Create an extractor with no text yet."""
+        super().__init__(convert_charrefs=True)
+        self.title = ""
+        self._skipped = 0
+        self._main = 0
+        self._in_title = False
+        self._body: list[str] = []
+        self._main_parts: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        """Open a skipped, title, block or main element."""
+        if tag in _SKIPPED_TAGS:
+            self._skipped += 1
+        elif tag == "title":
+            self._in_title = True
+        if tag in _BLOCK_TAGS:
+            self._break()
+        if tag in _MAIN_TAGS:
+            self._main += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        """Close an element opened in `handle_starttag`."""
+        if tag in _SKIPPED_TAGS:
+            self._skipped = max(0, self._skipped - 1)
+        elif tag == "title":
+            self._in_title = False
+        if tag in _MAIN_TAGS:
+            self._main = max(0, self._main - 1)
+        if tag in _BLOCK_TAGS:
+            self._break()
+
+    def handle_data(self, data: str) -> None:
+        """Collect text that is not inside a skipped element."""
+        if self._skipped:
+            return
+        if self._in_title:
+            self.title += data
+            return
+        self._body.append(data)
+        if self._main:
+            self._main_parts.append(data)
+
+    def _break(self) -> None:
+        self._body.append("\n")
+        if self._main:
+            self._main_parts.append("\n")
+
+    def text(self) -> str:
+        """Return the extracted text, one block per line."""
+        main = _normalize("".join(self._main_parts))
+        if len(main) >= _MIN_MAIN_CHARS:
+            return main
+        return _normalize("".join(self._body))
+
+
+def _normalize(text: str) -> str:
+    lines = (_SPACES_RE.sub(" ", line).strip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+class PageCache:
+    """SQLite cache of fetched pages with the ETag to revalidate them.
+
+    Pages that were skipped (wrong content type, error status) are cached as
+    None so they are not requested again within the TTL.
+    """
+
+    def __init__(self, path: str):
+        """Open the SQLite page cache at `path`, creating it if needed."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS source_pages ("
+                "url TEXT PRIMARY KEY, page TEXT, etag TEXT, fetched_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _get_sync(self, url: str) -> tuple[dict | None, str | None, float] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT page, etag, fetched_at FROM source_pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], time.time() - row[2]
+
+    def _set_sync(self, url: str, page: dict | None, etag: str | None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO source_pages (url, page, etag, fetched_at) VALUES (?, ?, ?, ?)",
+                (url, json.dumps(page), etag, time.time()),
+            )
+            self._conn.commit()
+
+    async def get(self, url: str) -> tuple[dict | None, str | None, float] | None:
+        """Return the cached page for `url`, its ETag and its age in seconds, or None."""
+        return await asyncio.to_thread(self._get_sync, url)
+
+    async def set(self, url: str, page: dict | None, etag: str | None) -> None:
+        """Store the page fetched from `url`, or None for a skipped page."""
+        await asyncio.to_thread(self._set_sync, url, page, etag)
+
+
+class PageFetcher:
+    """Fetches source pages and extracts their main text.
+
+    Requests go through one pooled httpx client per event loop, with HTTP/2 when
+    the optional `h2` package is installed, and at most `connections_per_host`
+    requests in flight to each host. Redirects are followed hop by hop so each hop
+    counts against its own host. Only `TEXT_CONTENT_TYPES` responses are read, up
+    to `max_bytes`, and parsed while they stream in.
+
+    Source URLs come from search results, so before each hop the host must
+    resolve to public addresses only: private, loopback and link-local targets
+    are never requested unless listed in `allowed_hosts`.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float,
+        max_bytes: int,
+        max_chars: int,
+        connections_per_host: int,
+        cache: PageCache | None = None,
+        cache_ttl_seconds: int = 0,
+        allowed_hosts: Collection[str] = (),
+    ):
+        """Create a fetcher with the given limits and optional page cache."""
+        self.timeout_seconds = timeout_seconds
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.connections_per_host = connections_per_host
+        self.cache = cache
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.allowed_hosts = frozenset(allowed_hosts)
+        self.stats = Counter()
+        self._clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop,
+            tuple[httpx.AsyncClient, defaultdict[str, asyncio.Semaphore]],
+        ] = weakref.WeakKeyDictionary()
+
+    def _client(
+        self,
+    ) -> "tuple[httpx.AsyncClient, defaultdict[str, asyncio.Semaphore]]":
+        loop = asyncio.get_running_loop()
+        entry = self._clients.get(loop)
+        if entry is None:
+            import httpx
+
+            client = httpx.AsyncClient(
+                http2=importlib.util.find_spec("h2") is not None,
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=64),
+                timeout=self.timeout_seconds,
+                headers={"accept": "text/html,application/xhtml+xml,text/plain;q=0.9"},
+            )
+            slots: defaultdict[str, asyncio.Semaphore] = defaultdict(
+                lambda: asyncio.Semaphore(self.connections_per_host)
+            )
+            entry = self._clients[loop] = (client, slots)
+        return entry
+
+    async def fetch(self, url: str) -> dict[str, Any] | None:
+        """Fetch the page at `url`.
+
+        Returns:
+            A dict with the final `url`, the page `title`, the extracted `text` and
+            whether the body was `truncated`, or None when the page was skipped or
+            could not be fetched.
+        """
+        cached = await self.cache.get(url) if self.cache else None
+        if cached is not None and cached[2] < self.cache_ttl_seconds:
+            self.stats["cache_hits"] += 1
+            return cached[0]
+        etag = cached[1] if cached is not None else None
+        try:
+            async with asyncio.timeout(self.timeout_seconds):
+                page, etag, not_modified = await self._get(url, etag)
+        except BlockedAddressError:
+            self.stats["blocked"] += 1
+            return None
+        except Exception:
+            self.stats["errors"] += 1
+            return None
+        if not_modified:
+            self.stats["not_modified"] += 1
+            page = cached[0]
+        if self.cache:
+            await self.cache.set(url, page, etag)
+        return page
+
+    async def _get(
+        self, url: str, etag: str | None
+    ) -> tuple[dict[str, Any] | None, str | None, bool]:
+        client, slots = self._client()
+        headers = {"if-none-match": etag} if etag else {}
+        for _ in range(_MAX_REDIRECTS + 1):
+            await check_public_url(url, self.allowed_hosts)
+            async with slots[urlsplit(url).netloc]:
+                async with client.stream("GET", url, headers=headers) as response:
+                    self.stats["requests"] += 1
+                    check_peer_address(response, self.allowed_hosts)
+                    location = response.headers.get("location")
+                    if response.is_redirect and location:
+                        # Reading the empty body keeps the connection in the pool
+                        await response.aread()
+                        url = urljoin(url, location)
+                        continue
+                    if response.status_code == 304 and etag:
+                        await response.aread()
+                        return None, etag, True
+                    if response.status_code != 200:
+                        self.stats["skipped"] += 1
+                        return None, None, False
+                    media_type, _, params = response.headers.get(
+                        "content-type", ""
+                    ).partition(";")
+                    if media_type.strip().lower() not in TEXT_CONTENT_TYPES:
+                        self.stats["skipped"] += 1
+                        return None, None, False
+                    page = await self._read(
+                        response, url, media_type.strip().lower(), params
+                    )
+                    return page, response.headers.get("etag"), False
+        raise RuntimeError(f"Too many redirects fetching {url}")
+
+    async def _read(
+        self, response: "httpx.Response", url: str, media_type: str, params: str
+    ) -> dict[str, Any]:
+        match = re.search(r"charset=\"?([\w-]+)", params, re.IGNORECASE)
+        try:
+            decoder = codecs.getincrementaldecoder(
+                match.group(1) if match else "utf-8"
+            )(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        extractor = TextExtractor() if media_type != "text/plain" else None
+        plain: list[str] = []
+        received = 0
+        truncated = False
+        async for chunk in response.aiter_bytes():
+            if received + len(chunk) > self.max_bytes:
+                chunk = chunk[: self.max_bytes - received]
+                truncated = True
+            received += len(chunk)
+            text = decoder.decode(chunk)
+            if extractor is not None:
+                extractor.feed(text)
+            else:
+                plain.append(text)
+            if truncated:
+                break
+        self.stats["bytes"] += received
+        if extractor is not None:
+            extractor.close()
+            title, text = _normalize(extractor.title), extractor.text()
+        else:
+            title, text = "", _normalize("".join(plain))
+        return {
+            "url": url,
+            "title": title,
+            "text": text[: self.max_chars],
+            "truncated": truncated or len(text) > self.max_chars,
+        }
+
+    async def fetch_many(self, urls: list[str]) -> dict[str, dict[str, Any]]:
+        """Fetch `urls` concurrently and return the pages that could be fetched by URL."""
+        pages = await asyncio.gather(*(self.fetch(url) for url in urls))
+        return {url: page for url, page in zip(urls, pages) if page is not None}
+
+
+_fetchers: dict[tuple, PageFetcher] = {}
+_fetchers_lock = threading.Lock()
+
+
+def get_page_fetcher(configurable: Configuration) -> PageFetcher:
+    """Get the process-wide page fetcher for the configured limits and cache."""
+    key = (
+        configurable.enrich_timeout_seconds,
+        configurable.enrich_max_bytes,
+        configurable.enrich_max_chars,
+        configurable.enrich_connections_per_host,
+        configurable.enrich_cache_path,
+        configurable.enrich_cache_ttl_seconds,
+    )
+    with _fetchers_lock:
+        fetcher = _fetchers.get(key)
+        if fetcher is None:
+            cache = (
+                PageCache(configurable.enrich_cache_path)
+                if configurable.enrich_cache_path
+                else None
+            )
+            fetcher = _fetchers[key] = PageFetcher(*key[:4], cache, key[5])
+        return fetcher
+
+
+async def enrich_sources(
+    configurable: Configuration, sources: list[Source]
+) -> dict[str, dict[str, Any]]:
+    """Fetch the pages of the most cited sources of one search.
+
+    Args:
+        sources: The sources of the search's citations, one entry per citation.
+
+    Returns:
+        The fetched pages keyed by source URL (`Source.value`). Empty when
+        `enrich_sources_top_n` is 0.
+    """
+    if configurable.enrich_sources_top_n <= 0 or not sources:
+        return {}
+    counts = Counter(source.value for source in sources)
+    urls = [url for url, _ in counts.most_common(configurable.enrich_sources_top_n)]
+    return await get_page_fetcher(configurable).fetch_many(urls)
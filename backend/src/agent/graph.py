@@ -1,47 +1,133 @@
-import os
+from contextlib import nullcontext
+from uuid import uuid4
 
-from agent.tools_and_schemas import SearchQueryList, Reflection
-from dotenv import load_dotenv
-from langchain_core.messages import AIMessage
-from langgraph.types import Send
-from langgraph.graph import StateGraph
-from langgraph.graph import START, END
+from langchain_core.messages import AIMessage, AIMessageChunk
 from langchain_core.runnables import RunnableConfig
-from google.genai import Client
+from langgraph.config import get_stream_writer
+from langgraph.constants import CONFIG_KEY_CHECKPOINTER, TAG_NOSTREAM
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import push_message
+from langgraph.types import Send
 
+from agent.batch_api import content_generator, model_runnable
+from agent.cache import (
+    get_answer_cache,
+    get_search_cache,
+    make_answer_cache_key,
+    make_search_cache_key,
+)
+from agent.concurrency import BranchAbandoned, get_branch_group, search_slot
+from agent.configuration import Configuration
+from agent.context import count_tokens, fit_summaries_to_budget
+from agent.dedup import get_shared_query_index, suppress_near_duplicates
+from agent.enrichment import enrich_sources
+from agent.instrumentation import (
+    instrument_node,
+    record_message_usage,
+    record_search_response,
+)
+from agent.novelty import information_gain
+from agent.prompt_cache import split_prompt
+from agent.prompts import (
+    answer_prefix,
+    answer_suffix,
+    get_current_date,
+    query_writer_prefix,
+    query_writer_suffix,
+    reflection_prefix,
+    reflection_suffix,
+    web_searcher_prefix,
+    web_searcher_suffix,
+)
+from agent.ranking import rank_sources
+from agent.redirects import get_redirect_resolver
+from agent.resilience import (
+    call_with_retries,
+    report_node_error,
+    wait_for_quota,
+)
+from agent.sources import make_source
 from agent.state import (
     OverallState,
     QueryGenerationState,
     ReflectionState,
     WebSearchState,
 )
-from agent.configuration import Configuration
-from agent.prompts import (
-    get_current_date,
-    query_writer_instructions,
-    web_searcher_instructions,
-    reflection_instructions,
-    answer_instructions,
-)
-from langchain_google_genai import ChatGoogleGenerativeAI
+from agent.streaming import ShortUrlRewriter
+from agent.tools_and_schemas import Reflection, SearchQueryList
 from agent.utils import (
+    dedupe_sources,
     get_citations,
     get_research_topic,
     insert_citation_markers,
+    message_text,
+    replace_short_urls,
     resolve_urls,
 )
 
-load_dotenv()
+_RUN_SETTINGS = ("initial_search_query_count", "max_research_loops", "reasoning_model")
 
-if os.getenv("GEMINI_API_KEY") is None:
-    raise ValueError("GEMINI_API_KEY is not set")
 
-# Used for Google Search API
-genai_client = Client(api_key=os.getenv("GEMINI_API_KEY"))
+def _answer_cache_key(state: OverallState, configurable: Configuration) -> str:
+    """Build the answer cache key from the question and the settings that shape the answer."""
+    settings = {
+        "query_generator_model": configurable.query_generator_model,
+        "reflection_model": configurable.reflection_model,
+        "answer_model": configurable.answer_model,
+        "initial_search_query_count": state.get("initial_search_query_count")
+        or configurable.number_of_initial_queries,
+        "max_research_loops": state.get("max_research_loops")
+        or configurable.max_research_loops,
+        "reasoning_model": state.get("reasoning_model"),
+    }
+    return make_answer_cache_key(get_research_topic(state["messages"]), settings)
+
+
+async def _refresh_cached_run(state: OverallState, config: RunnableConfig, key: str):
+    """Run the research again in the background to refresh a stale cached answer.
+
+    The refresh is a run of its own, with a new run id, at batch priority and on a
+    new thread, checkpointed by the checkpointer of the run that served the stale
+    answer. A new thread keeps earlier refreshes' queries from counting as already
+    searched.
+    """
+    parent = (config or {}).get("configurable", {})
+    configurable = {
+        name: value
+        for name, value in parent.items()
+        if name in Configuration.model_fields
+    }
+    refresh_graph = graph
+    checkpointer = parent.get(CONFIG_KEY_CHECKPOINTER)
+    if checkpointer is not None:
+        refresh_graph = graph.copy(update={"checkpointer": checkpointer})
+    run_id = uuid4()
+    await refresh_graph.ainvoke(
+        {
+            "messages": state["messages"],
+            **{
+                name: state[name]
+                for name in _RUN_SETTINGS
+                if state.get(name) is not None
+            },
+        },
+        {
+            "run_id": run_id,
+            "configurable": {
+                **configurable,
+                "refresh_answer_cache": True,
+                "priority": "batch",
+                "thread_id": f"refresh:{key}:{run_id}",
+            },
+        },
+    )
 
 
 # Nodes
-def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerationState:
+@instrument_node
+async def generate_query(
+    state: OverallState, config: RunnableConfig
+) -> QueryGenerationState:
     """LangGraph node that generates search queries based on the User's question.
 
     Uses Gemini 2.0 Flash to create an optimized search queries for web research based on
@@ -60,88 +146,274 @@ def generate_query(state: OverallState, config: RunnableConfig) -> QueryGenerati
     if state.get("initial_search_query_count") is None:
         state["initial_search_query_count"] = configurable.number_of_initial_queries
 
-    # init Gemini 2.0 Flash
-    llm = ChatGoogleGenerativeAI(
-        model=configurable.query_generator_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
-    )
-    structured_llm = llm.with_structured_output(SearchQueryList)
-
-    # Format the prompt
+    # Serve the whole run from the answer cache. The cached research is replayed
+    # through the other nodes so clients still receive every node's update.
+    answer_cache = get_answer_cache(configurable)
+    if answer_cache and not configurable.refresh_answer_cache:
+        cache_key = _answer_cache_key(state, configurable)
+        hit = await answer_cache.get(cache_key)
+        if hit is not None:
+            cached_run, stale = hit
+            if stale:
+                answer_cache.revalidate(
+                    cache_key, lambda: _refresh_cached_run(state, config, cache_key)
+                )
+            get_stream_writer()({"event": "answer_cache_hit", "stale": stale})
+            return {
+                "search_query": cached_run["search_query"],
+                "pending_queries": cached_run["search_query"],
+                "cached_run": cached_run,
+            }
+
+    # Format the prompt, referencing the cached instructions when enabled
     current_date = get_current_date()
-    formatted_prompt = query_writer_instructions.format(
+    cached_content, formatted_prompt = await split_prompt(
+        configurable,
+        configurable.query_generator_model,
+        query_writer_prefix,
+        query_writer_suffix,
         current_date=current_date,
         research_topic=get_research_topic(state["messages"]),
         number_queries=state["initial_search_query_count"],
     )
+    # Gemini 2.0 Flash with structured output, reused across invocations
+    structured_llm = model_runnable(
+        configurable,
+        configurable.query_generator_model,
+        1.0,
+        SearchQueryList,
+        cached_content,
+    )
     # Generate the search queries
-    result = structured_llm.invoke(formatted_prompt)
-    return {"search_query": result.query}
+    node_errors = []
+    try:
+        result = await call_with_retries(
+            lambda: structured_llm.ainvoke(formatted_prompt),
+            config,
+            configurable.query_generator_model,
+            "llm",
+            configurable.llm_timeout_seconds,
+            tokens=count_tokens(formatted_prompt),
+        )
+        candidates = result.query
+    except Exception as exc:
+        # Search for the research topic itself rather than failing the run
+        candidates = [get_research_topic(state["messages"])]
+        node_errors.append(
+            report_node_error("generate_query", exc, "searched the research topic")
+        )
+
+    # Drop paraphrases of queries that already ran in this thread
+    queries, dropped_queries = suppress_near_duplicates(
+        candidates,
+        state.get("search_query") or [],
+        configurable.query_dedup_threshold,
+    )
+    return {
+        "search_query": queries,
+        "pending_queries": queries,
+        "dropped_queries": dropped_queries,
+        "node_errors": node_errors,
+        # Clear a cached run served earlier in this thread
+        "cached_run": {},
+    }
 
 
 def continue_to_web_research(state: QueryGenerationState):
     """LangGraph node that sends the search queries to the web research node.
 
-    This is used to spawn n number of web research nodes, one for each search query.
+    This is used to spawn n number of web research nodes, one for each query
+    generate_query kept in this turn; queries searched in earlier turns of the
+    thread are not sent again. When every query repeated an earlier one, the
+    research already gathered is answered from directly. A run served from the
+    answer cache replays its research as a single branch.
     """
+    queries = state.get("pending_queries") or []
+    if state.get("cached_run"):
+        return [
+            Send(
+                "web_research",
+                {
+                    "search_query": ", ".join(queries),
+                    "id": state.get("next_search_id") or 0,
+                    "cached_run": state["cached_run"],
+                },
+            )
+        ]
+    if not queries:
+        return "finalize_answer"
+    branch_group = uuid4().hex
+    first_id = state.get("next_search_id") or 0
     return [
-        Send("web_research", {"search_query": search_query, "id": int(idx)})
-        for idx, search_query in enumerate(state["search_query"])
+        Send(
+            "web_research",
+            {
+                "search_query": search_query,
+                "id": first_id + int(idx),
+                "branch_group": branch_group,
+                "branch_count": len(queries),
+            },
+        )
+        for idx, search_query in enumerate(queries)
     ]
 
 
-def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
+@instrument_node
+async def web_research(state: WebSearchState, config: RunnableConfig) -> OverallState:
     """LangGraph node that performs web research using the native Google Search API tool.
 
     Executes a web search using the native Google Search API tool in combination with Gemini 2.0 Flash.
+    Searches still running after the loop's quorum and grace period, or past their
+    deadline, are cancelled and recorded in incomplete_searches.
 
     Args:
         state: Current graph state containing the search query and research loop count
         config: Configuration for the runnable, including search API settings
 
     Returns:
-        Dictionary with state update, including sources_gathered, research_loop_count, and web_research_results
+        Dictionary with state update, including sources_gathered, research_loop_count, web_research_results
+        and, when enrichment is enabled, the text of the most cited source pages in source_pages
     """
+    if state.get("cached_run"):
+        cached_run = state["cached_run"]
+        return {
+            "sources_gathered": [make_source(*row) for row in cached_run["sources"]],
+            "search_query": cached_run["search_query"],
+            "web_research_result": cached_run["web_research_result"],
+            "next_search_id": 1,
+        }
+
     # Configure
     configurable = Configuration.from_runnable_config(config)
-    formatted_prompt = web_searcher_instructions.format(
-        current_date=get_current_date(),
-        research_topic=state["search_query"],
-    )
-
-    # Uses the google genai client as the langchain client doesn't return grounding metadata
-    response = genai_client.models.generate_content(
-        model=configurable.query_generator_model,
-        contents=formatted_prompt,
-        config={
-            "tools": [{"google_search": {}}],
-            "temperature": 0,
-        },
+    search_tools = [{"google_search": {}}]
+
+    # Serve repeated searches from the cache, grounding metadata included. Runs of
+    # one batch also share results for near-identical queries, and only one of
+    # them searches a given query at a time.
+    search_cache = get_search_cache(configurable)
+    shared_index = get_shared_query_index(configurable)
+    lookup_query = (
+        shared_index.canonical(state["search_query"])
+        if shared_index
+        else state["search_query"]
     )
+    cache_key = make_search_cache_key(configurable.query_generator_model, lookup_query)
+    search_lock = shared_index.lock(cache_key) if shared_index else nullcontext()
+    async with search_lock:
+        cached = await search_cache.get(cache_key) if search_cache else None
+        branch_group = get_branch_group(state, config, configurable.search_quorum)
+        if cached is not None:
+            from google.genai.types import GenerateContentResponse
+
+            branch_group.finish()
+            response = GenerateContentResponse.model_validate(cached)
+            get_stream_writer()(
+                {
+                    "event": "search_cache_hit",
+                    "search_query": state["search_query"],
+                    "id": state["id"],
+                }
+            )
+        else:
+
+            async def search():
+                # A cached prompt prefix carries the search tool itself
+                cached_content, formatted_prompt = await split_prompt(
+                    configurable,
+                    configurable.query_generator_model,
+                    web_searcher_prefix,
+                    web_searcher_suffix,
+                    tools=search_tools,
+                    current_date=get_current_date(),
+                    research_topic=state["search_query"],
+                )
+                search_config = (
+                    {"cached_content": cached_content, "temperature": 0}
+                    if cached_content
+                    else {"tools": search_tools, "temperature": 0}
+                )
+                # Uses the google genai client as the langchain client doesn't return grounding metadata
+                async with search_slot(config):
+                    return await call_with_retries(
+                        lambda: content_generator(configurable)(
+                            model=configurable.query_generator_model,
+                            contents=formatted_prompt,
+                            config=search_config,
+                        ),
+                        config,
+                        configurable.query_generator_model,
+                        "search",
+                        configurable.search_timeout_seconds,
+                        tokens=count_tokens(formatted_prompt),
+                        hedge=configurable.hedge_searches,
+                    )
+
+            try:
+                response = await branch_group.run(
+                    search(),
+                    configurable.straggler_grace_seconds,
+                    configurable.search_deadline_seconds,
+                )
+            except BranchAbandoned as exc:
+                # Cut the tail: reflection goes ahead with the searches that finished
+                incomplete = {
+                    "search_query": state["search_query"],
+                    "id": state["id"],
+                    "reason": exc.reason,
+                    "waited_seconds": round(exc.waited_seconds, 3),
+                }
+                get_stream_writer()({"event": "search_abandoned", **incomplete})
+                # The id still counts as issued, so later searches never reuse it
+                return {"incomplete_searches": [incomplete], "next_search_id": 1}
+            except Exception as exc:
+                # A failed search leaves the loop with one summary less
+                incomplete = {
+                    "search_query": state["search_query"],
+                    "id": state["id"],
+                    "reason": "error",
+                    "error": f"{type(exc).__name__}: {exc}",
+                }
+                get_stream_writer()({"event": "search_abandoned", **incomplete})
+                return {"incomplete_searches": [incomplete], "next_search_id": 1}
+            record_search_response(configurable.query_generator_model, response)
+            if search_cache:
+                await search_cache.set(
+                    cache_key, response.model_dump(mode="json", exclude_none=True)
+                )
+    grounding_chunks = response.candidates[0].grounding_metadata.grounding_chunks
     # resolve the urls to short urls for saving tokens and time
-    resolved_urls = resolve_urls(
-        response.candidates[0].grounding_metadata.grounding_chunks, state["id"]
+    resolved_urls = resolve_urls(grounding_chunks, state["id"])
+    # Optionally store the canonical publisher urls the redirect links lead to
+    resolver = get_redirect_resolver(configurable)
+    canonical_urls = (
+        await resolver.resolve_many(chunk.web.uri for chunk in grounding_chunks)
+        if resolver
+        else None
     )
     # Gets the citations and adds them to the generated text
-    citations = get_citations(response, resolved_urls)
+    citations = get_citations(response, resolved_urls, canonical_urls)
     modified_text = insert_citation_markers(response.text, citations)
-    sources_gathered = [item for citation in citations for item in citation["segments"]]
+    sources_gathered = [item for citation in citations for item in citation.segments]
+    # Optionally fetch the text of the most cited pages, keyed by source URL
+    source_pages = await enrich_sources(configurable, sources_gathered)
 
     return {
         "sources_gathered": sources_gathered,
         "search_query": [state["search_query"]],
         "web_research_result": [modified_text],
+        "source_pages": source_pages,
+        "next_search_id": 1,
     }
 
 
-def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
+@instrument_node
+async def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
     """LangGraph node that identifies knowledge gaps and generates potential follow-up queries.
 
     Analyzes the current summary to identify areas for further research and generates
     potential follow-up queries. Uses structured output to extract
-    the follow-up query in JSON format.
+    the follow-up query in JSON format. A loop whose information gain is below
+    `min_information_gain` ends the research without calling the model.
 
     Args:
         state: Current graph state containing the running summary and research topic
@@ -153,28 +425,107 @@ def reflection(state: OverallState, config: RunnableConfig) -> ReflectionState:
     configurable = Configuration.from_runnable_config(config)
     # Increment the research loop count and get the reasoning model
     state["research_loop_count"] = state.get("research_loop_count", 0) + 1
+    if state.get("cached_run"):
+        return {
+            "is_sufficient": True,
+            "knowledge_gap": "",
+            "follow_up_queries": [],
+            "research_loop_count": state["research_loop_count"],
+            "number_of_ran_queries": len(state["search_query"]),
+        }
     reasoning_model = state.get("reasoning_model", configurable.reflection_model)
 
-    # Format the prompt
+    # Measure what this loop added; a loop that added almost nothing ends the research
+    results = state["web_research_result"]
+    sources = state["sources_gathered"]
+    history = state.get("research_gain") or []
+    previous = history[-1] if history else {"result_count": 0, "source_count": 0}
+    gain = information_gain(
+        results[previous["result_count"] :],
+        results[: previous["result_count"]],
+        sources[previous["source_count"] :],
+        sources[: previous["source_count"]],
+    )
+    early_exit = bool(history) and gain["score"] < configurable.min_information_gain
+    gain_record = {
+        "loop": state["research_loop_count"],
+        "result_count": len(results),
+        "source_count": len(sources),
+        **gain,
+        "early_exit": early_exit,
+    }
+    get_stream_writer()({"event": "information_gain", **gain_record})
+    if early_exit:
+        # No follow-up queries routes straight to finalize_answer
+        return {
+            "is_sufficient": False,
+            "knowledge_gap": "",
+            "follow_up_queries": [],
+            "research_gain": [gain_record],
+            "research_loop_count": state["research_loop_count"],
+            "number_of_ran_queries": len(state["search_query"]),
+        }
+
+    # Keep the summaries within the model's context budget
+    summaries, context_metrics = fit_summaries_to_budget(
+        state["web_research_result"],
+        configurable.context_token_budget(reasoning_model),
+    )
+    get_stream_writer()(
+        {"event": "context_budget", "node": "reflection", **context_metrics}
+    )
+
+    # Format the prompt, referencing the cached instructions when enabled
     current_date = get_current_date()
-    formatted_prompt = reflection_instructions.format(
+    cached_content, formatted_prompt = await split_prompt(
+        configurable,
+        reasoning_model,
+        reflection_prefix,
+        reflection_suffix,
         current_date=current_date,
         research_topic=get_research_topic(state["messages"]),
-        summaries="\n\n---\n\n".join(state["web_research_result"]),
+        summaries="\n\n---\n\n".join(summaries),
     )
-    # init Reasoning Model
-    llm = ChatGoogleGenerativeAI(
-        model=reasoning_model,
-        temperature=1.0,
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
+    # Reasoning Model with structured output, reused across invocations
+    structured_llm = model_runnable(
+        configurable, reasoning_model, 1.0, Reflection, cached_content
+    )
+    try:
+        result = await call_with_retries(
+            lambda: structured_llm.ainvoke(formatted_prompt),
+            config,
+            reasoning_model,
+            "llm",
+            configurable.llm_timeout_seconds,
+            tokens=count_tokens(formatted_prompt),
+        )
+    except Exception as exc:
+        # Answer with the research gathered so far rather than failing the run
+        return {
+            "is_sufficient": False,
+            "knowledge_gap": "",
+            "follow_up_queries": [],
+            "research_gain": [gain_record],
+            "node_errors": [
+                report_node_error("reflection", exc, "finalized without follow-ups")
+            ],
+            "research_loop_count": state["research_loop_count"],
+            "number_of_ran_queries": len(state["search_query"]),
+        }
+
+    # Drop follow-up queries that paraphrase queries we already searched
+    follow_up_queries, dropped_queries = suppress_near_duplicates(
+        result.follow_up_queries,
+        state["search_query"],
+        configurable.query_dedup_threshold,
     )
-    result = llm.with_structured_output(Reflection).invoke(formatted_prompt)
 
     return {
         "is_sufficient": result.is_sufficient,
         "knowledge_gap": result.knowledge_gap,
-        "follow_up_queries": result.follow_up_queries,
+        "follow_up_queries": follow_up_queries,
+        "dropped_queries": dropped_queries,
+        "research_gain": [gain_record],
         "research_loop_count": state["research_loop_count"],
         "number_of_ran_queries": len(state["search_query"]),
     }
@@ -202,22 +553,30 @@ def evaluate_research(
         if state.get("max_research_loops") is not None
         else configurable.max_research_loops
     )
-    if state["is_sufficient"] or state["research_loop_count"] >= max_research_loops:
+    if (
+        state["is_sufficient"]
+        or state["research_loop_count"] >= max_research_loops
+        or not state["follow_up_queries"]
+    ):
         return "finalize_answer"
     else:
+        branch_group = uuid4().hex
         return [
             Send(
                 "web_research",
                 {
                     "search_query": follow_up_query,
-                    "id": state["number_of_ran_queries"] + int(idx),
+                    "id": state["next_search_id"] + int(idx),
+                    "branch_group": branch_group,
+                    "branch_count": len(state["follow_up_queries"]),
                 },
             )
             for idx, follow_up_query in enumerate(state["follow_up_queries"])
         ]
 
 
-def finalize_answer(state: OverallState, config: RunnableConfig):
+@instrument_node
+async def finalize_answer(state: OverallState, config: RunnableConfig):
     """LangGraph node that finalizes the research summary.
 
     Prepares the final output by deduplicating and formatting sources, then
@@ -232,36 +591,144 @@ def finalize_answer(state: OverallState, config: RunnableConfig):
     """
     configurable = Configuration.from_runnable_config(config)
     reasoning_model = state.get("reasoning_model") or configurable.answer_model
+    message_id = str(uuid4())
+
+    cached_run = state.get("cached_run")
+    if cached_run:
+        content = cached_run["answer"]
+        if configurable.stream_final_answer and not configurable.use_batch_api:
+            push_message(AIMessageChunk(content=content, id=message_id), state_key=None)
+        return {
+            "messages": [AIMessage(content=content, id=message_id)],
+            "sources_gathered": [
+                make_source(*row) for row in cached_run["answer_sources"]
+            ],
+        }
+
+    # Optionally answer from the best sources and the summaries citing them only
+    summaries = state["web_research_result"]
+    sources = state["sources_gathered"]
+    if configurable.rank_sources_top_k > 0:
+        summaries, sources, ranking_metrics = rank_sources(
+            summaries,
+            sources,
+            configurable.rank_sources_top_k,
+            configurable.context_token_budget(reasoning_model),
+            state.get("source_pages"),
+        )
+        get_stream_writer()({"event": "source_ranking", **ranking_metrics})
+
+    # Keep the summaries within the model's context budget
+    summaries, context_metrics = fit_summaries_to_budget(
+        summaries,
+        configurable.context_token_budget(reasoning_model),
+    )
+    get_stream_writer()(
+        {"event": "context_budget", "node": "finalize_answer", **context_metrics}
+    )
 
-    # Format the prompt
+    # Format the prompt, referencing the cached instructions when enabled
     current_date = get_current_date()
-    formatted_prompt = answer_instructions.format(
+    cached_content, formatted_prompt = await split_prompt(
+        configurable,
+        reasoning_model,
+        answer_prefix,
+        answer_suffix,
         current_date=current_date,
         research_topic=get_research_topic(state["messages"]),
-        summaries="\n---\n\n".join(state["web_research_result"]),
+        summaries="\n---\n\n".join(summaries),
     )
 
-    # init Reasoning Model, default to Gemini 2.5 Flash
-    llm = ChatGoogleGenerativeAI(
-        model=reasoning_model,
-        temperature=0,
-        max_retries=2,
-        api_key=os.getenv("GEMINI_API_KEY"),
+    # Reasoning Model, default to Gemini 2.5 Flash
+    llm = model_runnable(
+        configurable, reasoning_model, 0, cached_content=cached_content
     )
-    result = llm.invoke(formatted_prompt)
-
-    # Replace the short urls with the original urls and add all used urls to the sources_gathered
-    unique_sources = []
-    for source in state["sources_gathered"]:
-        if source["short_url"] in result.content:
-            result.content = result.content.replace(
-                source["short_url"], source["value"]
+
+    content = None
+    node_errors = []
+    # Batch API responses arrive whole, so there is nothing to stream
+    if configurable.stream_final_answer and not configurable.use_batch_api:
+        # Stream rewritten tokens ourselves; the raw model tokens still contain short urls
+        rewriter = ShortUrlRewriter(sources)
+        try:
+            await wait_for_quota(
+                config, reasoning_model, count_tokens(formatted_prompt)
+            )
+            async for chunk in llm.astream(
+                formatted_prompt, config={"tags": [TAG_NOSTREAM]}
+            ):
+                record_message_usage(reasoning_model, chunk)
+                text = rewriter.feed(message_text(chunk))
+                if text:
+                    push_message(
+                        AIMessageChunk(content=text, id=message_id), state_key=None
+                    )
+        except Exception as exc:
+            # A stream that already reached the client cannot be retried; keep it
+            if rewriter.text:
+                node_errors.append(
+                    report_node_error("finalize_answer", exc, "kept the partial answer")
+                )
+            else:
+                rewriter = None
+        if rewriter is not None:
+            text = rewriter.flush()
+            if text:
+                push_message(
+                    AIMessageChunk(content=text, id=message_id), state_key=None
+                )
+            content, unique_sources = rewriter.text, rewriter.used_sources
+
+    if content is None:
+        try:
+            result = await call_with_retries(
+                lambda: llm.ainvoke(formatted_prompt),
+                config,
+                reasoning_model,
+                "llm",
+                configurable.llm_timeout_seconds,
+                tokens=count_tokens(formatted_prompt),
+            )
+            record_message_usage(reasoning_model, result)
+            answer = message_text(result)
+        except Exception as exc:
+            # Return the research summaries themselves rather than failing the run
+            answer = "\n\n".join(summaries)
+            node_errors.append(
+                report_node_error(
+                    "finalize_answer", exc, "returned the research summaries"
+                )
             )
-            unique_sources.append(source)
+        # Replace the short urls with the original urls and add all used urls to the sources_gathered
+        content, unique_sources = replace_short_urls(answer, sources)
+
+    # Searches citing the same page have their own short urls; list it once
+    unique_sources = dedupe_sources(unique_sources)
+
+    # Only complete runs are cached; a fallback answer is not worth serving again
+    answer_cache = get_answer_cache(configurable)
+    if answer_cache and not node_errors and not state.get("node_errors"):
+        await answer_cache.set(
+            _answer_cache_key(state, configurable),
+            {
+                "search_query": state["search_query"],
+                "web_research_result": state["web_research_result"],
+                "sources": [
+                    [source.label, source.short_url, source.value]
+                    for source in state["sources_gathered"]
+                ],
+                "answer": content,
+                "answer_sources": [
+                    [source.label, source.short_url, source.value]
+                    for source in unique_sources
+                ],
+            },
+        )
 
     return {
-        "messages": [AIMessage(content=result.content)],
+        "messages": [AIMessage(content=content, id=message_id)],
         "sources_gathered": unique_sources,
+        "node_errors": node_errors,
     }
 
 
@@ -279,7 +746,7 @@ builder.add_node("finalize_answer", finalize_answer)
 builder.add_edge(START, "generate_query")
 # Add conditional edge to continue with search queries in a parallel branch
 builder.add_conditional_edges(
-    "generate_query", continue_to_web_research, ["web_research"]
+    "generate_query", continue_to_web_research, ["web_research", "finalize_answer"]
 )
 # Reflect on the web research
 builder.add_edge("web_research", "reflection")
@@ -0,0 +1,196 @@
+"""Per-node timing, token and cost metrics."""
+
+import functools
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from functools import cache
+from typing import Any, Awaitable, Callable
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
+
+# OpenTelemetry is optional: install the `agent[otel]` extra and set
+# OTEL_EXPORTER_OTLP_ENDPOINT (e.g. http://localhost:4318) to export one span per
+# node to a collector.
+
+
+@dataclass
+class NodeMetrics:
+    """Measurements for one execution of a graph node."""
+
+    node: str
+    started_at: float
+    wall_seconds: float = 0.0
+    queue_wait_seconds: float = 0.0
+    rate_limit_wait_seconds: float = 0.0
+    model: str | None = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_input_tokens: int = 0
+    grounding_chunks: int = 0
+    retries: int = 0
+
+
+_current_metrics: ContextVar[NodeMetrics | None] = ContextVar(
+    "agent_node_metrics", default=None
+)
+
+
+def current_metrics() -> NodeMetrics | None:
+    """Get the metrics of the node running in the current context, if any."""
+    return _current_metrics.get()
+
+
+def record_queue_wait(seconds: float) -> None:
+    """Add time spent waiting for a concurrency slot to the current node."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.queue_wait_seconds += seconds
+
+
+def record_rate_limit_wait(seconds: float) -> None:
+    """Add time spent waiting for model quota to the current node."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.rate_limit_wait_seconds += seconds
+
+
+def record_retry() -> None:
+    """Count one retried model call in the current node."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.retries += 1
+
+
+def record_usage(
+    model: str, input_tokens: int, output_tokens: int, cached_input_tokens: int = 0
+) -> None:
+    """Add token usage of one model call to the current node."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.model = model
+        metrics.input_tokens += input_tokens or 0
+        metrics.output_tokens += output_tokens or 0
+        metrics.cached_input_tokens += cached_input_tokens or 0
+
+
+def record_message_usage(model: str, message: Any) -> None:
+    """Add the `usage_metadata` of a LangChain message or chunk to the current node."""
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        record_usage(
+            model,
+            usage.get("input_tokens", 0),
+            usage.get("output_tokens", 0),
+            (usage.get("input_token_details") or {}).get("cache_read", 0),
+        )
+    else:
+        record_usage(model, 0, 0)
+
+
+def record_search_response(model: str, response: Any) -> None:
+    """Add token usage and grounding chunk count of a google genai response."""
+    usage = response.usage_metadata
+    record_usage(
+        model,
+        usage.prompt_token_count if usage else 0,
+        usage.candidates_token_count if usage else 0,
+        usage.cached_content_token_count if usage else 0,
+    )
+    metrics = _current_metrics.get()
+    if metrics is not None and response.candidates:
+        grounding_metadata = response.candidates[0].grounding_metadata
+        if grounding_metadata and grounding_metadata.grounding_chunks:
+            metrics.grounding_chunks += len(grounding_metadata.grounding_chunks)
+
+
+@cache
+def _get_tracer() -> Any:
+    """Get the OpenTelemetry tracer, or None when tracing is unavailable."""
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        return None
+
+    if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or os.getenv(
+        "OTEL_EXPORTER_OTLP_TRACES_ENDPOINT"
+    ):
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import (
+                OTLPSpanExporter,
+            )
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError:
+            pass
+        else:
+            # Respect a provider configured by the host application
+            if not isinstance(trace.get_tracer_provider(), TracerProvider):
+                provider = TracerProvider()
+                provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+                trace.set_tracer_provider(provider)
+    return trace.get_tracer("agent")
+
+
+def _span_attributes(metrics: NodeMetrics, config: RunnableConfig | None) -> dict:
+    configurable = (config or {}).get("configurable", {})
+    metadata = (config or {}).get("metadata", {})
+    attributes = {
+        "agent.node": metrics.node,
+        "agent.queue_wait_seconds": metrics.queue_wait_seconds,
+        "agent.rate_limit_wait_seconds": metrics.rate_limit_wait_seconds,
+        "agent.grounding_chunks": metrics.grounding_chunks,
+        "agent.retries": metrics.retries,
+        "gen_ai.usage.input_tokens": metrics.input_tokens,
+        "gen_ai.usage.output_tokens": metrics.output_tokens,
+        "gen_ai.usage.cache_read_input_tokens": metrics.cached_input_tokens,
+    }
+    if metrics.model:
+        attributes["gen_ai.request.model"] = metrics.model
+    for key in ("run_id", "thread_id"):
+        if configurable.get(key) is not None:
+            attributes[f"agent.{key}"] = str(configurable[key])
+    if metadata.get("langgraph_step") is not None:
+        attributes["langgraph.step"] = metadata["langgraph_step"]
+    return attributes
+
+
+def instrument_node(
+    node: Callable[[Any, RunnableConfig], Awaitable[dict]],
+) -> Callable[[Any, RunnableConfig], Awaitable[dict]]:
+    """Wrap an async graph node to measure it.
+
+    The node's metrics are emitted on the `custom` stream as a `node_metrics` event
+    and written to the `run_metrics` state key, whose reducer folds them into a
+    per-run summary. When OpenTelemetry is installed every execution is also
+    recorded as a span.
+    """
+
+    @functools.wraps(node)
+    async def wrapper(state: Any, config: RunnableConfig) -> dict:
+        metrics = NodeMetrics(node=node.__name__, started_at=time.time())
+        token = _current_metrics.set(metrics)
+        tracer = _get_tracer()
+        span = tracer.start_span(f"agent.{metrics.node}") if tracer else None
+        start = time.perf_counter()
+        try:
+            update = await node(state, config)
+        except BaseException as exc:
+            if span is not None:
+                span.record_exception(exc)
+                span.end()
+            raise
+        finally:
+            metrics.wall_seconds = time.perf_counter() - start
+            _current_metrics.reset(token)
+
+        record = asdict(metrics)
+        get_stream_writer()({"event": "node_metrics", **record})
+        if span is not None:
+            span.set_attributes(_span_attributes(metrics, config))
+            span.end()
+        return {**update, "run_metrics": record}
+
+    return wrapper
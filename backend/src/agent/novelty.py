@@ -0,0 +1,92 @@
+"""Information gain of a research loop over the earlier loops."""
+
+import re
+from typing import Any, Iterable
+from urllib.parse import urlsplit
+
+from agent.context import strip_citations
+from agent.dedup import ngram_tfidf_matrix
+from agent.redirects import REDIRECT_HOSTS
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+# Weights of the individual signals in the combined information gain score
+GAIN_WEIGHTS = {"new_sources": 0.4, "new_ngrams": 0.3, "novelty": 0.3}
+
+
+def word_ngrams(text: str, n: int = 3) -> set[tuple[str, ...]]:
+    """Get the set of lowercase word n-grams in `text`, ignoring citation links."""
+    words = _WORD_RE.findall(strip_citations(text).lower())
+    if len(words) < n:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + n]) for i in range(len(words) - n + 1)}
+
+
+def source_key(source: Any) -> str:
+    """Get the key identifying a source's page across searches.
+
+    Grounding redirect links differ for every response, even for the same page,
+    so unresolved sources are identified by their site label. Resolved sources
+    use their canonical URL.
+    """
+    if urlsplit(source.value).hostname in REDIRECT_HOSTS:
+        return source.label.lower()
+    return source.value
+
+
+def _new_fraction(new: set, seen: set) -> float:
+    return len(new - seen) / len(new) if new else 0.0
+
+
+def information_gain(
+    new_summaries: list[str],
+    previous_summaries: list[str],
+    new_sources: Iterable[Any],
+    previous_sources: Iterable[Any],
+) -> dict[str, Any]:
+    """Measure how much a research loop added over the loops before it.
+
+    Three embedding-free signals in [0, 1] are combined with `GAIN_WEIGHTS`:
+
+    - new_sources: share of the loop's sources (by `source_key`) that were not
+      gathered before,
+    - new_ngrams: share of the loop's word trigrams absent from earlier summaries,
+    - novelty: one minus the mean, over the loop's summaries, of the highest
+      character n-gram TF-IDF cosine similarity to any earlier summary.
+
+    A first loop (no previous summaries) always scores 1.0.
+
+    Returns:
+        A dictionary with each signal and the combined "score".
+    """
+    if not previous_summaries:
+        return {"new_sources": 1.0, "new_ngrams": 1.0, "novelty": 1.0, "score": 1.0}
+    if not new_summaries:
+        return {"new_sources": 0.0, "new_ngrams": 0.0, "novelty": 0.0, "score": 0.0}
+
+    new_urls = {source_key(source) for source in new_sources}
+    previous_urls = {source_key(source) for source in previous_sources}
+
+    previous_ngrams: set = set()
+    for summary in previous_summaries:
+        previous_ngrams |= word_ngrams(summary)
+    new_ngrams: set = set()
+    for summary in new_summaries:
+        new_ngrams |= word_ngrams(summary)
+
+    texts = [strip_citations(summary) for summary in previous_summaries + new_summaries]
+    vectors = ngram_tfidf_matrix(texts)
+    offset = len(previous_summaries)
+    similarities = vectors[offset:] @ vectors[:offset].T
+    novelty = 1.0 - float(similarities.max(axis=1).mean())
+
+    signals = {
+        "new_sources": _new_fraction(new_urls, previous_urls),
+        "new_ngrams": _new_fraction(new_ngrams, previous_ngrams),
+        "novelty": min(1.0, max(0.0, novelty)),
+    }
+    score = sum(GAIN_WEIGHTS[name] * value for name, value in signals.items())
+    return {
+        **{name: round(value, 4) for name, value in signals.items()},
+        "score": round(score, 4),
+    }
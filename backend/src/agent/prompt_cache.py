@@ -0,0 +1,181 @@
+"""Gemini context caching of the static prompt prefixes."""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import weakref
+from typing import Any
+
+from agent.clients import get_genai_client
+from agent.configuration import Configuration
+from agent.context import count_tokens
+
+# How long a prefix whose cache could not be created is sent inline before the
+# cache is tried again
+_RETRY_AFTER_SECONDS = 300
+
+
+class PromptCacheManager:
+    """Creates and refreshes Gemini cached contents holding static prompt prefixes.
+
+    One cached content is kept per (model, prefix, tools). Its TTL is extended when
+    it comes within a tenth of its TTL of expiring, and concurrent calls wait for a
+    single create or refresh request. Prefixes shorter than the model's minimum
+    (Gemini rejects small caches) or whose cache could not be created are sent
+    inline.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        """Create a manager whose cached contents live for `ttl_seconds`."""
+        self.ttl_seconds = ttl_seconds
+        self.created = 0
+        self.refreshed = 0
+        self.failed = 0
+        self._handles: dict[tuple, tuple[str, float]] = {}
+        self._retry_at: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        self._pending: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[tuple, asyncio.Task]
+        ] = weakref.WeakKeyDictionary()
+
+    async def get(
+        self,
+        model: str,
+        prefix: str,
+        tools: list[dict[str, Any]] | None = None,
+        min_tokens: int = 0,
+    ) -> str | None:
+        """Get the name of the cached content holding `prefix` for `model`.
+
+        Args:
+            model: The model the prefix is sent to; caches are per model.
+            prefix: The static prompt text.
+            tools: Tools of the calls, which must be part of the cached content.
+            min_tokens: Smallest cached content `model` accepts, in estimated tokens.
+
+        Returns:
+            The cached content name, or None when the prefix should be sent inline.
+        """
+        if count_tokens(prefix) < min_tokens:
+            return None
+        key = (
+            model,
+            hashlib.blake2b(prefix.encode("utf-8"), digest_size=16).hexdigest(),
+            json.dumps(tools, sort_keys=True),
+        )
+        now = time.time()
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None and handle[1] - now > self.ttl_seconds / 10:
+                return handle[0]
+            if self._retry_at.get(key, 0.0) > now:
+                return None
+
+        pending = self._pending.setdefault(asyncio.get_running_loop(), {})
+        task = pending.get(key)
+        if task is None:
+            task = pending[key] = asyncio.ensure_future(
+                self._create_or_refresh(key, model, prefix, tools, handle)
+            )
+            task.add_done_callback(lambda _: pending.pop(key, None))
+        # A caller giving up must not cancel the request other callers wait for
+        return await asyncio.shield(task)
+
+    async def _create_or_refresh(
+        self,
+        key: tuple,
+        model: str,
+        prefix: str,
+        tools: list[dict[str, Any]] | None,
+        handle: tuple[str, float] | None,
+    ) -> str | None:
+        client = get_genai_client()
+        ttl = f"{self.ttl_seconds}s"
+        expires_at = time.time() + self.ttl_seconds
+        if handle is not None and handle[1] > time.time():
+            try:
+                await client.aio.caches.update(name=handle[0], config={"ttl": ttl})
+            except Exception:
+                # Create a new cache below
+                pass
+            else:
+                self.refreshed += 1
+                with self._lock:
+                    self._handles[key] = (handle[0], expires_at)
+                return handle[0]
+
+        config: dict[str, Any] = {
+            "contents": [{"role": "user", "parts": [{"text": prefix}]}],
+            "ttl": ttl,
+            "display_name": f"agent-prompt-{key[1][:8]}",
+        }
+        if tools:
+            config["tools"] = tools
+        try:
+            cached = await client.aio.caches.create(model=model, config=config)
+        except Exception:
+            self.failed += 1
+            with self._lock:
+                self._handles.pop(key, None)
+                self._retry_at[key] = time.time() + _RETRY_AFTER_SECONDS
+            return None
+        self.created += 1
+        with self._lock:
+            self._handles[key] = (cached.name, expires_at)
+        return cached.name
+
+    def stats(self) -> dict[str, int]:
+        """Return the create, refresh and failure counters and the number of caches."""
+        with self._lock:
+            return {
+                "caches": len(self._handles),
+                "created": self.created,
+                "refreshed": self.refreshed,
+                "failed": self.failed,
+            }
+
+
+_managers: dict[int, PromptCacheManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_prompt_cache(configurable: Configuration) -> PromptCacheManager | None:
+    """Get the process-wide prompt cache manager, or None unless `use_prompt_cache` is set."""
+    if not configurable.use_prompt_cache:
+        return None
+    key = configurable.prompt_cache_ttl_seconds
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = PromptCacheManager(key)
+        return manager
+
+
+async def split_prompt(
+    configurable: Configuration,
+    model: str,
+    prefix: str,
+    suffix: str,
+    tools: list[dict[str, Any]] | None = None,
+    **values: Any,
+) -> tuple[str | None, str]:
+    """Format a prompt, referencing its static prefix through a cached content if possible.
+
+    Returns:
+        The cached content name and the suffix to send, or None and the full prompt
+        when the prefix is not cached.
+    """
+    manager = get_prompt_cache(configurable)
+    static = prefix.format()
+    cached_content = (
+        await manager.get(
+            model, static, tools, configurable.prompt_cache_min_tokens_for(model)
+        )
+        if manager
+        else None
+    )
+    if cached_content is None:
+        return None, static + suffix.format(**values)
+    return cached_content, suffix.format(**values)
@@ -6,15 +6,18 @@ def get_current_date():
     return datetime.now().strftime("%B %d, %Y")
 
 
-query_writer_instructions = """Your goal is to generate sophisticated and diverse web search queries. These queries are intended for an advanced automated web research tool capable of analyzing complex results, following links, and synthesizing information.
+# Each prompt is a static prefix, identical in every call and cacheable with
+# Gemini context caching (see agent.prompt_cache), followed by a suffix holding
+# the per-call values. The prefixes are format strings without fields.
+
+query_writer_prefix = """Your goal is to generate sophisticated and diverse web search queries. These queries are intended for an advanced automated web research tool capable of analyzing complex results, following links, and synthesizing information.
 
 Instructions:
 - Always prefer a single search query, only add another query if the original question requests multiple aspects or elements and one query is not enough.
 - Each query should focus on one specific aspect of the original question.
-- Don't produce more than {number_queries} queries.
 - Queries should be diverse, if the topic is broad, generate more than 1 query.
 - Don't generate multiple similar queries, 1 is enough.
-- Query should ensure that the most current information is gathered. The current date is {current_date}.
+- Query should ensure that the most current information is gathered.
 
 Format: 
 - Format your response as a JSON object with ALL two of these exact keys:
@@ -30,24 +33,37 @@ Topic: What revenue grew more last year apple stock or the number of people buyi
     "query": ["Apple total revenue growth fiscal year 2024", "iPhone unit sales growth fiscal year 2024", "Apple stock price growth fiscal year 2024"],
 }}
 ```
+"""
+
+query_writer_suffix = """
+Don't produce more than {number_queries} queries. The current date is {current_date}.
 
 Context: {research_topic}"""
 
+query_writer_instructions = query_writer_prefix + query_writer_suffix
+
 
-web_searcher_instructions = """Conduct targeted Google Searches to gather the most recent, credible information on "{research_topic}" and synthesize it into a verifiable text artifact.
+web_searcher_prefix = """Conduct targeted Google Searches to gather the most recent, credible information on the research topic below and synthesize it into a verifiable text artifact.
 
 Instructions:
-- Query should ensure that the most current information is gathered. The current date is {current_date}.
+- Query should ensure that the most current information is gathered.
 - Conduct multiple, diverse searches to gather comprehensive information.
 - Consolidate key findings while meticulously tracking the source(s) for each specific piece of information.
 - The output should be a well-written summary or report based on your search findings. 
 - Only include the information found in the search results, don't make up any information.
+"""
+
+web_searcher_suffix = """
+The current date is {current_date}.
 
 Research Topic:
 {research_topic}
 """
 
-reflection_instructions = """You are an expert research assistant analyzing summaries about "{research_topic}".
+web_searcher_instructions = web_searcher_prefix + web_searcher_suffix
+
+
+reflection_prefix = """You are an expert research assistant analyzing summaries about the research topic below.
 
 Instructions:
 - Identify knowledge gaps or areas that need deeper exploration and generate a follow-up query. (1 or multiple).
@@ -55,8 +71,25 @@ Instructions:
 - If there is a knowledge gap, generate a follow-up query that would help expand your understanding.
 - Focus on technical details, implementation specifics, or emerging trends that weren't fully covered.
 
+Reading the summaries:
+- The summaries come from separate web searches and are separated by "---". They may repeat each other or disagree.
+- Only count a fact as covered when a summary states it and cites a source for it. A source mentioned without the fact itself doesn't cover it.
+- Keep track of the dates the summaries give. When the question asks about the latest or current state of something, the most recent dated fact is the one that matters.
+- Don't rely on your own knowledge of the topic to fill a gap. If a fact is missing from the summaries, it is a knowledge gap even if you believe you know it.
+
+Judging sufficiency:
+- The summaries are sufficient when every part of the user's question can be answered from them with specific facts, figures or dates, each backed by a cited source.
+- They are not sufficient when a part of the question is not covered at all, is only covered in general terms, or is covered by a single source whose claim is surprising or disputed.
+- Conflicting figures or dates across sources are a knowledge gap: ask for the authoritative or most recent source.
+- Information that may have changed since it was published, such as prices, rankings, versions or office holders, is a knowledge gap when the summaries don't show it is current.
+- Don't ask for more detail than the question needs. Background, history or related topics the user didn't ask about are not knowledge gaps.
+
 Requirements:
 - Ensure the follow-up query is self-contained and includes necessary context for web search.
+- Name the entities, products, places and time periods explicitly instead of referring to "it", "they" or "the above".
+- Each follow-up query should target one missing fact, phrased the way it would appear on a page that answers it.
+- Don't repeat a query whose results are already in the summaries, and don't rephrase the user's question as a follow-up query.
+- Prefer one follow-up query. Add more only when the gaps are unrelated and one search cannot cover them.
 
 Output Format:
 - Format your response as a JSON object with these exact keys:
@@ -73,24 +106,60 @@ Example:
 }}
 ```
 
-Reflect carefully on the Summaries to identify knowledge gaps and produce a follow-up query. Then, produce your output following this JSON format:
+Example with a knowledge gap:
+
+Research Topic: "How does the battery range of the 2024 Tesla Model 3 compare to the 2024 Hyundai Ioniq 6?"
+Summaries: The 2024 Tesla Model 3 Long Range has an EPA-estimated range of 341 miles [caranddriver](https://vertexaisearch.cloud.google.com/id/0-0). Hyundai says the Ioniq 6 is among the most efficient electric cars it has built [hyundai](https://vertexaisearch.cloud.google.com/id/0-1).
+```json
+{{
+    "is_sufficient": false,
+    "knowledge_gap": "The summaries give the EPA range of the 2024 Model 3 Long Range but no range figure for any 2024 Hyundai Ioniq 6 trim, so the two cars cannot be compared.",
+    "follow_up_queries": ["2024 Hyundai Ioniq 6 EPA estimated range by trim"]
+}}
+```
+
+Example without a knowledge gap:
+
+Research Topic: "When did the James Webb Space Telescope launch and where is it located?"
+Summaries: The James Webb Space Telescope launched on December 25, 2021 on an Ariane 5 rocket from Kourou, French Guiana [nasa](https://vertexaisearch.cloud.google.com/id/0-0). It orbits the second Sun-Earth Lagrange point (L2), about 1.5 million kilometers from Earth [esa](https://vertexaisearch.cloud.google.com/id/1-0).
+```json
+{{
+    "is_sufficient": true,
+    "knowledge_gap": "",
+    "follow_up_queries": []
+}}
+```
+
+Reflect carefully on the Summaries to identify knowledge gaps and produce a follow-up query. Then, produce your output following this JSON format.
+"""
+
+reflection_suffix = """
+Research Topic: "{research_topic}"
 
 Summaries:
 {summaries}
 """
 
-answer_instructions = """Generate a high-quality answer to the user's question based on the provided summaries.
+reflection_instructions = reflection_prefix + reflection_suffix
+
+
+answer_prefix = """Generate a high-quality answer to the user's question based on the provided summaries.
 
 Instructions:
-- The current date is {current_date}.
 - You are the final step of a multi-step research process, don't mention that you are the final step. 
 - You have access to all the information gathered from the previous steps.
 - You have access to the user's question.
 - Generate a high-quality answer to the user's question based on the provided summaries and the user's question.
 - Include the sources you used from the Summaries in the answer correctly, use markdown format (e.g. [apnews](https://vertexaisearch.cloud.google.com/id/1-0)). THIS IS A MUST.
+"""
+
+answer_suffix = """
+The current date is {current_date}.
 
 User Context:
 - {research_topic}
 
 Summaries:
 {summaries}"""
+
+answer_instructions = answer_prefix + answer_suffix
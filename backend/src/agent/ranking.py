@@ -0,0 +1,263 @@
+"""Scoring of cited sources and top-K selection before the final answer."""
+
+import re
+from datetime import datetime
+from typing import TYPE_CHECKING, Any
+
+from agent.context import count_tokens
+from agent.redirects import REDIRECT_HOSTS
+from agent.sources import Source
+
+# numpy is imported on first use to keep `import agent.graph` fast
+if TYPE_CHECKING:
+    import numpy as np
+
+# Columns of the source-by-feature matrix, each scaled to [0, 1]
+FEATURES = ("citations", "searches", "support", "authority", "recency")
+
+# Weights of the features in the combined source score
+FEATURE_WEIGHTS = {
+    "citations": 0.3,
+    "searches": 0.2,
+    "support": 0.2,
+    "authority": 0.2,
+    "recency": 0.1,
+}
+
+# Authority of well-known domains and domain suffixes, matched against every
+# dot-separated part of a source's domain. Unlisted domains score DEFAULT_AUTHORITY.
+DOMAIN_AUTHORITY = {
+    "gov": 0.9,
+    "edu": 0.9,
+    "int": 0.85,
+    "who": 0.9,
+    "nih": 0.9,
+    "nature": 0.9,
+    "science": 0.85,
+    "arxiv": 0.8,
+    "wikipedia": 0.8,
+    "reuters": 0.8,
+    "apnews": 0.8,
+    "bbc": 0.75,
+    "economist": 0.75,
+    "ft": 0.75,
+    "nytimes": 0.75,
+    "iea": 0.85,
+    "medium": 0.35,
+    "reddit": 0.3,
+    "quora": 0.25,
+    "pinterest": 0.1,
+}
+DEFAULT_AUTHORITY = 0.5
+
+# A source dated this many years ago or earlier gets no recency credit. Sources
+# without a date score in the middle.
+RECENCY_HORIZON_YEARS = 10
+UNKNOWN_RECENCY = 0.5
+
+_LINK_RE = re.compile(r"\s*\[[^\]]*\]\(([^)\s]+)\)")
+_HOST_RE = re.compile(r"^[a-zA-Z][\w+.-]*://(?:[^@/?#]*@)?([^:/?#]+)")
+_YEAR_RE = re.compile(r"(?<!\d)(199\d|20\d\d)(?!\d)")
+
+
+def citation_groups(summary: str) -> list[list[str]]:
+    """Get the short urls of each citation marker in a summary.
+
+    A marker is a run of adjacent markdown links, as written after a cited
+    segment by `insert_citation_markers`.
+    """
+    groups: list[list[str]] = []
+    end = -1
+    for match in _LINK_RE.finditer(summary):
+        if match.start() == end:
+            groups[-1].append(match.group(1))
+        else:
+            groups.append([match.group(1)])
+        end = match.end()
+    return groups
+
+
+def source_domain(source: Source) -> str:
+    """Get the domain of a source, falling back to its label for redirect links."""
+    match = _HOST_RE.match(source.value)
+    host = match.group(1).lower() if match else ""
+    if not host or host in REDIRECT_HOSTS:
+        return source.label.lower()
+    return host.removeprefix("www.")
+
+
+def domain_authority(domain: str) -> float:
+    """Look up the authority of `domain` in `DOMAIN_AUTHORITY`."""
+    scores = [
+        DOMAIN_AUTHORITY[part] for part in domain.split(".") if part in DOMAIN_AUTHORITY
+    ]
+    return max(scores) if scores else DEFAULT_AUTHORITY
+
+
+def publication_year(texts: list[str], current_year: int) -> int | None:
+    """Get the latest plausible year mentioned in a source's URL, title or text."""
+    years = [int(year) for year in _YEAR_RE.findall(" ".join(texts))]
+    years = [year for year in years if year <= current_year]
+    return max(years) if years else None
+
+
+def _scaled_log(values: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+
+    top = values.max(initial=0.0)
+    return np.log1p(values) / np.log1p(top) if top > 0 else np.zeros_like(values)
+
+
+def source_features(
+    summaries: list[str],
+    sources: list[Source],
+    source_pages: dict[str, dict[str, Any]] | None = None,
+) -> "tuple[list[str], np.ndarray, tuple[np.ndarray, np.ndarray]]":
+    """Build the feature matrix of the sources cited by the research summaries.
+
+    Sources are grouped by URL, so the short urls of one page found by several
+    searches count together. The features, in `FEATURES` order, are:
+
+    - citations: log-scaled number of citation markers of the URL,
+    - searches: share of the summaries citing the URL,
+    - support: log-scaled sum over the cited segments of one over the number of
+      sources cited for the segment, so sole support counts most,
+    - authority: `domain_authority` of the source's domain,
+    - recency: how recent the latest year in the URL or fetched page is.
+
+    Returns:
+        The URLs, the URL-by-feature matrix and the citations as parallel arrays
+        of summary and URL indices, one entry per cited segment.
+    """
+    import numpy as np
+
+    source_pages = source_pages or {}
+    urls = list(dict.fromkeys(source.value for source in sources))
+    url_index = {url: i for i, url in enumerate(urls)}
+    column = {
+        source.short_url: url_index[source.value]
+        for source in sources
+        if source.short_url
+    }
+    first = {}
+    for source in sources:
+        first.setdefault(source.value, source)
+
+    rows: list[int] = []
+    cols: list[int] = []
+    shares: list[float] = []
+    for row, summary in enumerate(summaries):
+        for group in citation_groups(summary):
+            cited = {column[url] for url in group if url in column}
+            for col in cited:
+                rows.append(row)
+                cols.append(col)
+                shares.append(1.0 / len(cited))
+
+    n_urls = len(urls)
+    rows_array = np.asarray(rows, dtype=np.intp)
+    cols_array = np.asarray(cols, dtype=np.intp)
+    citations = np.bincount(cols_array, minlength=n_urls).astype(np.float64)
+    # Distinct (summary, URL) pairs give the number of summaries citing each URL
+    pairs = np.unique(rows_array * n_urls + cols_array)
+    searches = np.bincount(pairs % max(n_urls, 1), minlength=n_urls) / max(
+        len(summaries), 1
+    )
+    support = np.bincount(cols_array, weights=np.asarray(shares), minlength=n_urls)
+
+    current_year = datetime.now().year
+    authority = np.empty(n_urls)
+    recency = np.full(n_urls, UNKNOWN_RECENCY)
+    for i, url in enumerate(urls):
+        authority[i] = domain_authority(source_domain(first[url]))
+        page = source_pages.get(url) or {}
+        year = publication_year(
+            [url, page.get("title", ""), page.get("text", "")[:2000]], current_year
+        )
+        if year is not None:
+            recency[i] = (
+                1.0
+                - min(current_year - year, RECENCY_HORIZON_YEARS)
+                / RECENCY_HORIZON_YEARS
+            )
+
+    features = np.column_stack(
+        [
+            _scaled_log(citations),
+            searches,
+            _scaled_log(support),
+            authority,
+            recency,
+        ]
+    )
+    return urls, features, (rows_array, cols_array)
+
+
+def rank_sources(
+    summaries: list[str],
+    sources: list[Source],
+    top_k: int,
+    budget: int,
+    source_pages: dict[str, dict[str, Any]] | None = None,
+) -> tuple[list[str], list[Source], dict[str, Any]]:
+    """Keep the `top_k` best sources and the summaries citing them within `budget`.
+
+    Sources are scored with `FEATURE_WEIGHTS` over `source_features`. Summaries
+    citing none of the kept sources are dropped, links to the other sources are
+    removed from the rest, and the summaries are added by the summed score of
+    the sources they cite until the next one would exceed `budget` tokens. At
+    least one summary is always kept, and the kept summaries stay in their
+    original order.
+
+    Returns:
+        The kept summaries, the kept sources and a metrics dictionary.
+    """
+    import numpy as np
+
+    urls, features, (rows, cols) = source_features(summaries, sources, source_pages)
+    weights = np.array([FEATURE_WEIGHTS[name] for name in FEATURES])
+    scores = features @ weights
+
+    k = min(top_k, len(urls))
+    top = np.argpartition(-scores, k - 1)[:k] if 0 < k < len(urls) else np.arange(k)
+    # Best first; ties keep the order the sources were found in
+    top = top[np.lexsort((top, -scores[top]))]
+    kept = np.zeros(len(urls), dtype=bool)
+    kept[top] = True
+
+    summary_scores = np.bincount(
+        rows, weights=np.where(kept[cols], scores[cols], 0.0), minlength=len(summaries)
+    )
+    candidates = np.flatnonzero(summary_scores > 0)
+    if candidates.size == 0:
+        candidates = np.arange(len(summaries))
+    order = candidates[np.argsort(-summary_scores[candidates], kind="stable")]
+
+    kept_urls = {urls[i] for i in top}
+    kept_sources = [source for source in sources if source.value in kept_urls]
+    kept_short_urls = {source.short_url for source in kept_sources}
+    chosen = []
+    used = 0
+    for row in order:
+        text = _LINK_RE.sub(
+            lambda match: match.group(0) if match.group(1) in kept_short_urls else "",
+            summaries[row],
+        )
+        cost = count_tokens(text)
+        if chosen and used + cost > budget:
+            break
+        chosen.append((row, text))
+        used += cost
+    chosen.sort()
+
+    metrics = {
+        "sources_before": len(urls),
+        "sources_kept": len(kept_urls),
+        "summaries_before": len(summaries),
+        "summaries_kept": len(chosen),
+        "tokens_after": used,
+        "top_sources": [
+            {"url": urls[i], "score": round(float(scores[i]), 4)} for i in top[:10]
+        ],
+    }
+    return [text for _, text in chosen], kept_sources, metrics
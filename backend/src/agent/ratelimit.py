@@ -0,0 +1,335 @@
+"""Per-model token-bucket rate limiting of Gemini calls."""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from typing import Any
+
+from agent.configuration import Configuration
+from agent.instrumentation import record_rate_limit_wait
+
+# Priority classes, highest first, and how many grants each gets per scheduling
+# round while lower classes are waiting, so batch work is slowed but never starved.
+PRIORITY_WEIGHTS = {"interactive": 4, "batch": 1}
+
+
+class BucketStore:
+    """Token buckets for the requests-per-minute and tokens-per-minute quotas.
+
+    Each quota is a bucket holding up to one minute of quota that refills
+    continuously. A request consumes one request token and its estimated tokens.
+    """
+
+    async def try_consume(
+        self, model: str, rpm: int | None, tpm: int | None, tokens: int
+    ) -> float:
+        """Take one request and `tokens` tokens from the model's buckets.
+
+        Returns:
+            0 when granted, otherwise the seconds until the buckets could grant it.
+            Nothing is consumed unless both buckets have enough.
+        """
+        raise NotImplementedError
+
+
+class MemoryBucketStore(BucketStore):
+    """Buckets shared by every run in this process."""
+
+    def __init__(self):
+        """Create an empty set of buckets."""
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _level(self, key: str, limit: int, now: float) -> float:
+        level, updated = self._buckets.get(key, (float(limit), now))
+        return min(float(limit), level + (now - updated) * limit / 60.0)
+
+    async def try_consume(
+        self, model: str, rpm: int | None, tpm: int | None, tokens: int
+    ) -> float:
+        """Take one request and `tokens` tokens from the model's buckets."""
+        now = time.monotonic()
+        wanted = [(f"rpm:{model}", rpm, 1), (f"tpm:{model}", tpm, tokens)]
+        wanted = [
+            (key, limit, min(cost, limit)) for key, limit, cost in wanted if limit
+        ]
+        with self._lock:
+            levels = [self._level(key, limit, now) for key, limit, _ in wanted]
+            wait = max(
+                [
+                    (cost - level) * 60.0 / limit
+                    for (_, limit, cost), level in zip(wanted, levels)
+                    if level < cost
+                ],
+                default=0.0,
+            )
+            if wait == 0.0:
+                levels = [level - cost for (_, _, cost), level in zip(wanted, levels)]
+            for (key, _, _), level in zip(wanted, levels):
+                self._buckets[key] = (level, now)
+        return wait
+
+
+# Checks and consumes both buckets atomically, using the Redis server clock so
+# every process sees the same refill.
+_TAKE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local wait = 0
+local levels = {}
+for i = 1, #KEYS do
+    local limit = tonumber(ARGV[2 * i - 1])
+    local cost = tonumber(ARGV[2 * i])
+    local bucket = redis.call('HMGET', KEYS[i], 'level', 'updated')
+    local level = tonumber(bucket[1]) or limit
+    local updated = tonumber(bucket[2]) or now
+    level = math.min(limit, level + (now - updated) * limit / 60)
+    levels[i] = level
+    if level < cost then
+        wait = math.max(wait, (cost - level) * 60 / limit)
+    end
+end
+for i = 1, #KEYS do
+    local level = levels[i]
+    if wait == 0 then
+        level = level - tonumber(ARGV[2 * i])
+    end
+    redis.call('HSET', KEYS[i], 'level', level, 'updated', now)
+    redis.call('EXPIRE', KEYS[i], 120)
+end
+return tostring(wait)
+"""
+
+
+class RedisBucketStore(BucketStore):
+    """Buckets shared by every process of a deployment through Redis."""
+
+    def __init__(self, uri: str):
+        """Connect to the Redis server at `uri`."""
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ImportError(
+                "The redis rate limiter backend requires the `redis` package. "
+                "Install it with `pip install agent[redis]`."
+            ) from e
+        self._client = redis.from_url(uri)
+        self._script = self._client.register_script(_TAKE_SCRIPT)
+
+    async def try_consume(
+        self, model: str, rpm: int | None, tpm: int | None, tokens: int
+    ) -> float:
+        """Take one request and `tokens` tokens from the model's buckets."""
+        keys, args = [], []
+        for name, limit, cost in (("rpm", rpm, 1), ("tpm", tpm, tokens)):
+            if limit:
+                keys.append(f"ratelimit:{name}:{model}")
+                args.extend([limit, min(cost, limit)])
+        if not keys:
+            return 0.0
+        return float(await self._script(keys=keys, args=args))
+
+
+class _Waiter:
+    __slots__ = ("future", "tokens", "enqueued_at")
+
+    def __init__(self, future: asyncio.Future, tokens: int):
+        self.future = future
+        self.tokens = tokens
+        self.enqueued_at = time.perf_counter()
+
+
+class _ModelScheduler:
+    """Grants one model's quota to queued calls of one event loop.
+
+    Calls wait in per-priority queues, and within a priority each run (tenant) has
+    its own queue served round-robin, so one run's fan-out cannot monopolize the
+    quota.
+    """
+
+    def __init__(self, limiter: "RateLimiter", model: str, rpm, tpm):
+        self.limiter = limiter
+        self.model = model
+        self.rpm = rpm
+        self.tpm = tpm
+        self.queues: dict[str, OrderedDict[str, deque[_Waiter]]] = {
+            priority: OrderedDict() for priority in PRIORITY_WEIGHTS
+        }
+        self.credits = dict(PRIORITY_WEIGHTS)
+        self.task: asyncio.Task | None = None
+
+    def depth(self) -> int:
+        return sum(
+            len(queue) for tenants in self.queues.values() for queue in tenants.values()
+        )
+
+    def enqueue(self, priority: str, tenant: str, waiter: _Waiter) -> None:
+        self.queues[priority].setdefault(tenant, deque()).append(waiter)
+        if self.task is None or self.task.done():
+            self.task = asyncio.ensure_future(self._dispatch())
+
+    def _next_priority(self) -> str | None:
+        waiting = [priority for priority, tenants in self.queues.items() if tenants]
+        if not waiting:
+            return None
+        if all(self.credits[priority] <= 0 for priority in waiting):
+            self.credits = dict(PRIORITY_WEIGHTS)
+        return next(priority for priority in waiting if self.credits[priority] > 0)
+
+    def _peek(self, priority: str) -> tuple[str, _Waiter]:
+        tenants = self.queues[priority]
+        tenant, queue = next(iter(tenants.items()))
+        return tenant, queue[0]
+
+    def _pop(self, priority: str, tenant: str) -> None:
+        tenants = self.queues[priority]
+        queue = tenants.pop(tenant)
+        queue.popleft()
+        if queue:
+            # Round-robin: the run goes to the back of its priority class
+            tenants[tenant] = queue
+
+    async def _dispatch(self) -> None:
+        while True:
+            priority = self._next_priority()
+            if priority is None:
+                return
+            tenant, waiter = self._peek(priority)
+            if waiter.future.done():
+                # Cancelled while waiting
+                self._pop(priority, tenant)
+                continue
+            try:
+                wait = await self.limiter.store.try_consume(
+                    self.model, self.rpm, self.tpm, waiter.tokens
+                )
+            except Exception as exc:
+                # Fail the call rather than leaving every waiter hanging
+                self._pop(priority, tenant)
+                if not waiter.future.done():
+                    waiter.future.set_exception(exc)
+                continue
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            self._pop(priority, tenant)
+            self.credits[priority] -= 1
+            self.limiter._granted(waiter)
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+
+
+class RateLimiter:
+    """Process-wide scheduler gating Gemini calls behind per-model RPM/TPM quotas.
+
+    Limits come from `model_rate_limits`; models without an entry (and no
+    "default" entry) are not limited. Queue depth and wait times are available
+    from `stats()`.
+    """
+
+    def __init__(self, store: BucketStore, limits: dict[str, dict[str, int]]):
+        """Create a limiter over `store` with the per-model `limits`."""
+        self.store = store
+        self.limits = limits
+        self.granted = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._schedulers: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, _ModelScheduler]
+        ] = weakref.WeakKeyDictionary()
+
+    def _limits_for(self, model: str) -> tuple[int | None, int | None]:
+        limits = self.limits.get(model, self.limits.get("default", {}))
+        return limits.get("rpm"), limits.get("tpm")
+
+    async def acquire(
+        self, model: str, tokens: int, priority: str = "interactive", tenant: str = ""
+    ) -> float:
+        """Wait until the call may be sent.
+
+        Args:
+            model: The Gemini model the call goes to.
+            tokens: Estimated tokens of the call, counted against the TPM quota.
+            priority: "interactive" or "batch".
+            tenant: The run (thread) the call belongs to, for fair queuing.
+
+        Returns:
+            The seconds spent waiting.
+        """
+        rpm, tpm = self._limits_for(model)
+        if not rpm and not tpm:
+            return 0.0
+        if priority not in PRIORITY_WEIGHTS:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        loop = asyncio.get_running_loop()
+        schedulers = self._schedulers.setdefault(loop, {})
+        scheduler = schedulers.get(model)
+        if scheduler is None or (scheduler.rpm, scheduler.tpm) != (rpm, tpm):
+            scheduler = schedulers[model] = _ModelScheduler(self, model, rpm, tpm)
+        waiter = _Waiter(loop.create_future(), tokens)
+        scheduler.enqueue(priority, tenant, waiter)
+        await waiter.future
+        waited = time.perf_counter() - waiter.enqueued_at
+        record_rate_limit_wait(waited)
+        return waited
+
+    def _granted(self, waiter: _Waiter) -> None:
+        waited = time.perf_counter() - waiter.enqueued_at
+        self.granted += 1
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def stats(self) -> dict[str, Any]:
+        """Return the current queue depth per model and the wait time counters."""
+        depth: dict[str, int] = {}
+        for schedulers in list(self._schedulers.values()):
+            for model, scheduler in schedulers.items():
+                depth[model] = depth.get(model, 0) + scheduler.depth()
+        return {
+            "queue_depth": depth,
+            "granted": self.granted,
+            "mean_wait_seconds": self.total_wait_seconds / self.granted
+            if self.granted
+            else 0.0,
+            "max_wait_seconds": self.max_wait_seconds,
+        }
+
+
+_limiters: dict[tuple, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(configurable: Configuration) -> RateLimiter | None:
+    """Get the process-wide rate limiter selected by the configuration.
+
+    Returns None when rate limiting is disabled with `rate_limit_backend="none"`
+    or no model has limits configured.
+    """
+    backend = configurable.rate_limit_backend
+    limits = configurable.model_rate_limits
+    if backend == "none" or not limits:
+        return None
+    if backend == "memory":
+        key: tuple = (backend,)
+    elif backend == "redis":
+        uri = configurable.rate_limit_redis_uri or os.getenv("REDIS_URI")
+        if not uri:
+            raise ValueError("REDIS_URI must be set to use the redis rate limiter")
+        key = (backend, uri)
+    else:
+        raise ValueError(f"Unknown rate limit backend: {backend}")
+
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            store = (
+                MemoryBucketStore() if backend == "memory" else RedisBucketStore(key[1])
+            )
+            limiter = _limiters[key] = RateLimiter(store, limits)
+        # Limits may change between runs; the buckets are kept
+        limiter.limits = limits
+        return limiter
@@ -0,0 +1,259 @@
+"""Resolution of grounding redirect links to canonical URLs."""
+
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+from typing import TYPE_CHECKING, Collection, Iterable
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+from agent.addresses import BlockedAddressError, check_peer_address, check_public_url
+from agent.configuration import Configuration
+
+if TYPE_CHECKING:
+    import httpx
+
+# Hosts of the grounding redirect links returned by Google Search grounding
+REDIRECT_HOSTS = frozenset({"vertexaisearch.cloud.google.com"})
+
+_MAX_REDIRECTS = 5
+
+# Query parameters that only track the visit and never change the page
+_TRACKING_PARAM_RE = re.compile(
+    r"^(utm_\w+|gclid|fbclid|msclkid|mc_cid|mc_eid|ref_src)$", re.IGNORECASE
+)
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str) -> str:
+    """Normalize a publisher URL so equal pages compare equal.
+
+    Lowercases the scheme and host, drops default ports, fragments and tracking
+    parameters such as `utm_source`, and keeps the remaining query in order.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    netloc = (
+        host
+        if parts.port in (None, _DEFAULT_PORTS.get(scheme))
+        else f"{host}:{parts.port}"
+    )
+    query = urlencode(
+        [
+            (name, value)
+            for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if not _TRACKING_PARAM_RE.match(name)
+        ]
+    )
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+class ResolvedUrlStore:
+    """SQLite table of redirect links and the canonical URLs they resolved to."""
+
+    def __init__(self, path: str):
+        """Open the SQLite table at `path`, creating it if needed."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS resolved_urls ("
+                "url TEXT PRIMARY KEY, canonical TEXT NOT NULL, resolved_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def _get_sync(self, url: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT canonical FROM resolved_urls WHERE url = ?", (url,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _set_sync(self, url: str, canonical: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resolved_urls (url, canonical, resolved_at) VALUES (?, ?, ?)",
+                (url, canonical, time.time()),
+            )
+            self._conn.commit()
+
+    async def get(self, url: str) -> str | None:
+        """Return the canonical URL stored for `url`, or None."""
+        return await asyncio.to_thread(self._get_sync, url)
+
+    async def set(self, url: str, canonical: str) -> None:
+        """Store the canonical URL that `url` resolved to."""
+        await asyncio.to_thread(self._set_sync, url, canonical)
+
+
+class RedirectResolver:
+    """Resolves redirect links to the canonical URL of the page they lead to.
+
+    Redirects are followed with HEAD requests (GET when a server rejects HEAD)
+    over one pooled httpx client per event loop, with at most `max_concurrency`
+    requests in flight. Resolved URLs are kept in an in-process LRU in front of
+    the optional persistent store, so a link is resolved once across runs and
+    processes, and concurrent lookups of one link share a single request. Links
+    that cannot be resolved are returned as they are and not cached.
+
+    Like `PageFetcher`, it never requests a host resolving to a private, loopback
+    or link-local address unless it is in `allowed_hosts`; a link redirecting to
+    one is left unresolved.
+    """
+
+    def __init__(
+        self,
+        timeout_seconds: float,
+        max_concurrency: int,
+        store: ResolvedUrlStore | None = None,
+        maxsize: int = 4096,
+        hosts: Iterable[str] | None = REDIRECT_HOSTS,
+        allowed_hosts: Collection[str] = (),
+    ):
+        """Create a resolver with the given limits and optional persistent store."""
+        self.timeout_seconds = timeout_seconds
+        self.max_concurrency = max_concurrency
+        self.store = store
+        self.maxsize = maxsize
+        self.hosts = frozenset(hosts) if hosts is not None else None
+        self.allowed_hosts = frozenset(allowed_hosts)
+        self.stats = Counter()
+        self._resolved: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loops: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop,
+            tuple[httpx.AsyncClient, asyncio.Semaphore, dict[str, asyncio.Task]],
+        ] = weakref.WeakKeyDictionary()
+
+    def _loop_state(
+        self,
+    ) -> "tuple[httpx.AsyncClient, asyncio.Semaphore, dict[str, asyncio.Task]]":
+        loop = asyncio.get_running_loop()
+        entry = self._loops.get(loop)
+        if entry is None:
+            import httpx
+
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                timeout=self.timeout_seconds,
+            )
+            entry = self._loops[loop] = (
+                client,
+                asyncio.Semaphore(self.max_concurrency),
+                {},
+            )
+        return entry
+
+    def needs_resolving(self, url: str) -> bool:
+        """Return whether `url` is a redirect link this resolver follows."""
+        return self.hosts is None or urlsplit(url).hostname in self.hosts
+
+    async def resolve(self, url: str) -> str:
+        """Return the canonical URL `url` redirects to, or `url` if it cannot be resolved."""
+        if not self.needs_resolving(url):
+            return url
+        with self._lock:
+            canonical = self._resolved.get(url)
+            if canonical is not None:
+                self._resolved.move_to_end(url)
+                self.stats["hits"] += 1
+                return canonical
+
+        _, _, pending = self._loop_state()
+        task = pending.get(url)
+        if task is None:
+            task = pending[url] = asyncio.ensure_future(self._lookup(url))
+            task.add_done_callback(lambda _: pending.pop(url, None))
+        # A caller giving up must not cancel the lookup other callers wait for
+        return await asyncio.shield(task)
+
+    async def resolve_many(self, urls: Iterable[str]) -> dict[str, str]:
+        """Resolve `urls` concurrently and return a map from each URL to its canonical URL."""
+        unique = list(dict.fromkeys(urls))
+        resolved = await asyncio.gather(*(self.resolve(url) for url in unique))
+        return dict(zip(unique, resolved))
+
+    async def _lookup(self, url: str) -> str:
+        canonical = await self.store.get(url) if self.store else None
+        if canonical is not None:
+            self.stats["store_hits"] += 1
+        else:
+            try:
+                # Each request has its own timeout; waiting for a slot does not count
+                canonical = await self._follow(url)
+            except BlockedAddressError:
+                self.stats["blocked"] += 1
+                canonical = None
+            except Exception:
+                canonical = None
+            if canonical is None:
+                self.stats["failures"] += 1
+                return url
+            self.stats["resolved"] += 1
+            if self.store:
+                await self.store.set(url, canonical)
+        self._remember(url, canonical)
+        return canonical
+
+    async def _follow(self, url: str) -> str | None:
+        client, slots, _ = self._loop_state()
+        current = url
+        for hop in range(_MAX_REDIRECTS + 1):
+            await check_public_url(current, self.allowed_hosts)
+            async with slots:
+                self.stats["requests"] += 1
+                response = await client.head(current)
+                if response.status_code in (405, 501):
+                    # Some servers reject HEAD; the GET body is never read
+                    async with client.stream("GET", current) as response:
+                        pass
+            check_peer_address(response, self.allowed_hosts)
+            location = response.headers.get("location")
+            if response.is_redirect and location:
+                current = urljoin(current, location)
+                continue
+            # A link that fails without redirecting has expired or is invalid
+            if hop == 0 and response.status_code >= 400:
+                return None
+            return canonicalize_url(current)
+        return None
+
+    def _remember(self, url: str, canonical: str) -> None:
+        with self._lock:
+            self._resolved[url] = canonical
+            self._resolved.move_to_end(url)
+            while len(self._resolved) > self.maxsize:
+                self._resolved.popitem(last=False)
+
+
+_resolvers: dict[tuple, RedirectResolver] = {}
+_resolvers_lock = threading.Lock()
+
+
+def get_redirect_resolver(configurable: Configuration) -> RedirectResolver | None:
+    """Get the process-wide redirect resolver, or None unless `resolve_source_urls` is set."""
+    if not configurable.resolve_source_urls:
+        return None
+    key = (
+        configurable.url_resolver_timeout_seconds,
+        configurable.url_resolver_max_concurrency,
+        configurable.url_resolver_cache_path,
+    )
+    with _resolvers_lock:
+        resolver = _resolvers.get(key)
+        if resolver is None:
+            store = ResolvedUrlStore(key[2]) if key[2] else None
+            resolver = _resolvers[key] = RedirectResolver(key[0], key[1], store)
+        return resolver
@@ -0,0 +1,265 @@
+"""Deadlines, retries, hedged requests and retry budgets for model calls."""
+
+import asyncio
+import random
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, TypeVar
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.config import get_stream_writer
+
+from agent.concurrency import get_run_id, get_run_key
+from agent.configuration import Configuration
+from agent.instrumentation import record_retry
+from agent.ratelimit import get_rate_limiter
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 8.0
+# Hedging only starts once enough latencies were observed for a stable p95
+HEDGE_MIN_SAMPLES = 20
+_LATENCY_WINDOW = 256
+_MAX_TRACKED_RUNS = 4096
+# Rate limiter waits longer than this are reported on the custom stream
+RATE_LIMIT_EVENT_SECONDS = 0.05
+
+
+def _status_code(exc: BaseException) -> int | None:
+    for attribute in ("code", "status_code"):
+        value = getattr(exc, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Check whether a failed Gemini call is worth retrying.
+
+    Timeouts, connection errors and 408/429/5xx responses are retryable. Wrapped
+    exceptions (langchain-google-genai re-raises SDK errors) are followed through
+    their `__cause__` chain.
+    """
+    import httpx
+
+    while exc is not None:
+        if isinstance(exc, (TimeoutError, ConnectionError, httpx.TransportError)):
+            return True
+        if _status_code(exc) in RETRYABLE_STATUS_CODES:
+            return True
+        exc = exc.__cause__
+    return False
+
+
+def backoff_delay(attempt: int) -> float:
+    """Get the delay before retry number `attempt` (from 1), with full jitter."""
+    ceiling = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+class LatencyTracker:
+    """Rolling window of call latencies per call kind, used to pick hedge delays."""
+
+    def __init__(self, window: int = _LATENCY_WINDOW):
+        """Create a tracker keeping the last `window` latencies of each kind."""
+        self.window = window
+        self._samples: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, kind: str, seconds: float) -> None:
+        """Record that a call of `kind` took `seconds`."""
+        with self._lock:
+            samples = self._samples.get(kind)
+            if samples is None:
+                samples = self._samples[kind] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def quantile(self, kind: str, q: float) -> float | None:
+        """Get the `q` quantile of the recent latencies, or None without enough samples."""
+        with self._lock:
+            samples = sorted(self._samples.get(kind, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class RetryBudget:
+    """Number of retries and hedged requests a run may still issue."""
+
+    def __init__(self, retries: int):
+        """Create a budget allowing `retries` retries."""
+        self.remaining = retries
+        self._lock = threading.Lock()
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget, returning False when it is exhausted."""
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+latency_tracker = LatencyTracker()
+_budgets: "OrderedDict[str, RetryBudget]" = OrderedDict()
+_budgets_lock = threading.Lock()
+
+
+def get_retry_budget(config: RunnableConfig | None) -> RetryBudget:
+    """Get the retry budget of the current run.
+
+    Budgets are shared by every node of a run through its run id (see
+    `get_run_id`). A thread's turns are separate runs, so `thread_id` is not
+    used. Invocations without a run id get a fresh budget for each call.
+    """
+    retries = Configuration.from_runnable_config(config).retry_budget_per_run
+    run_key = get_run_id(config)
+    if run_key is None:
+        return RetryBudget(retries)
+    with _budgets_lock:
+        budget = _budgets.get(run_key)
+        if budget is None:
+            budget = _budgets[run_key] = RetryBudget(retries)
+            while len(_budgets) > _MAX_TRACKED_RUNS:
+                _budgets.popitem(last=False)
+        _budgets.move_to_end(run_key)
+        return budget
+
+
+async def wait_for_quota(
+    config: RunnableConfig | None, model: str, tokens: int
+) -> None:
+    """Wait for the model's quota in the process rate limiter before a Gemini call.
+
+    Calls are queued by the run's priority class and served fairly across runs.
+    Noticeable waits are reported as `rate_limited` events on the custom stream.
+    """
+    configurable = Configuration.from_runnable_config(config)
+    limiter = get_rate_limiter(configurable)
+    if limiter is None:
+        return
+    waited = await limiter.acquire(
+        model, tokens, configurable.priority, get_run_key(config) or ""
+    )
+    if waited > RATE_LIMIT_EVENT_SECONDS:
+        get_stream_writer()(
+            {
+                "event": "rate_limited",
+                "model": model,
+                "priority": configurable.priority,
+                "waited_seconds": round(waited, 3),
+                "queue_depth": limiter.stats()["queue_depth"].get(model, 0),
+            }
+        )
+
+
+async def _hedged(
+    call: Callable[[], Awaitable[T]],
+    hedge_after: float | None,
+    budget: RetryBudget,
+    acquire: Callable[[], Awaitable[Any]],
+) -> T:
+    """Run `call`, starting a duplicate if it is slower than `hedge_after` seconds."""
+    primary = asyncio.ensure_future(call())
+    if hedge_after is None:
+        return await primary
+
+    async def hedge() -> T:
+        await acquire()
+        return await call()
+
+    tasks = {primary}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+        if not done and budget.try_spend():
+            record_retry()
+            tasks.add(asyncio.ensure_future(hedge()))
+        while True:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                tasks.discard(task)
+                # A failed copy only counts once no other copy is still running
+                if task.exception() is None or not tasks:
+                    return task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def call_with_retries(
+    call: Callable[[], Awaitable[T]],
+    config: RunnableConfig | None,
+    model: str,
+    kind: str,
+    timeout: float | None,
+    tokens: int = 0,
+    hedge: bool = False,
+) -> T:
+    """Run one Gemini call with a deadline, retries and optional hedging.
+
+    Every attempt first waits for the model's quota in the process rate limiter
+    (see `agent.ratelimit`), then is bounded by `timeout`. Retryable failures are
+    retried with exponential backoff and full jitter up to `max_attempts`, as long
+    as the run's retry budget lasts. With `hedge`, a duplicate request is started
+    when an attempt is slower than the observed p95 latency of the call kind;
+    hedges also draw from the retry budget.
+
+    Args:
+        call: Factory returning a fresh awaitable for every attempt.
+        config: The node's runnable config.
+        model: The Gemini model the call goes to.
+        kind: Kind of call, such as "search" or "llm", for latency tracking.
+        timeout: Deadline in seconds for each attempt, or None.
+        tokens: Estimated tokens of the call, counted against the model's TPM quota.
+        hedge: Whether to send hedged duplicate requests.
+    """
+    configurable = Configuration.from_runnable_config(config)
+    if configurable.use_batch_api:
+        # Batch jobs finish on their own schedule under the batch quota
+        return await call()
+    budget = get_retry_budget(config)
+
+    def acquire() -> Awaitable[None]:
+        return wait_for_quota(config, model, tokens)
+
+    latency_key = f"{kind}:{model}"
+    loop = asyncio.get_running_loop()
+    attempt = 1
+    while True:
+        hedge_after = latency_tracker.quantile(latency_key, 0.95) if hedge else None
+        await acquire()
+        start = loop.time()
+        try:
+            result = await asyncio.wait_for(
+                _hedged(call, hedge_after, budget, acquire), timeout
+            )
+        except Exception as exc:
+            if (
+                attempt >= configurable.max_attempts
+                or not is_retryable(exc)
+                or not budget.try_spend()
+            ):
+                raise
+            record_retry()
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+            continue
+        latency_tracker.observe(latency_key, loop.time() - start)
+        return result
+
+
+def report_node_error(node: str, exc: BaseException, fallback: str) -> dict[str, Any]:
+    """Build the record of a node that degraded after a failed model call.
+
+    The record is emitted as a `node_error` event on the custom stream and should be
+    returned under the `node_errors` state key.
+    """
+    error = {
+        "node": node,
+        "error": f"{type(exc).__name__}: {exc}",
+        "fallback": fallback,
+    }
+    get_stream_writer()({"event": "node_error", **error})
+    return error
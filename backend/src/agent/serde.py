@@ -0,0 +1,145 @@
+"""Checkpoint serializers for the research graph state.
+
+Pass one to a checkpointer to use it, e.g.
+`builder.compile(checkpointer=InMemorySaver(serde=SourceTableSerializer()))`.
+"""
+
+from typing import Any
+
+import ormsgpack
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    from langgraph.checkpoint.serde.types import _DeltaSnapshot
+except ImportError:
+    # Private to langgraph-checkpoint; without it snapshots are stored by
+    # JsonPlusSerializer itself, record by record
+    _DeltaSnapshot = None
+
+from agent.codec import ZstdCodec, get_codec
+from agent.sources import Source, make_source
+from agent.streaming import SHORT_URL_PREFIX
+
+
+def pack_sources(sources: list[Source]) -> bytes:
+    """Pack a list of sources as a table of unique records plus one index per item.
+
+    Ids are not stored because `make_source` derives them from the URL again, and
+    short URLs are stored without their common prefix.
+    """
+    rows: list[list[str]] = []
+    positions: dict[Source, int] = {}
+    indices: list[int] = []
+    for source in sources:
+        position = positions.get(source)
+        if position is None:
+            position = positions[source] = len(rows)
+            short_url = source.short_url
+            if short_url and short_url.startswith(SHORT_URL_PREFIX):
+                short_url = short_url[len(SHORT_URL_PREFIX) :]
+            rows.append([source.label, short_url, source.value])
+        indices.append(position)
+    return ormsgpack.packb([rows, indices])
+
+
+def unpack_sources(data: bytes) -> list[Source]:
+    """Rebuild the list packed by `pack_sources` as interned records."""
+    rows, indices = ormsgpack.unpackb(data)
+    table = [
+        make_source(
+            label=label,
+            short_url=(
+                SHORT_URL_PREFIX + short_url
+                if short_url is not None and "://" not in short_url
+                else short_url
+            ),
+            value=value,
+        )
+        for label, short_url, value in rows
+    ]
+    return [table[index] for index in indices]
+
+
+def _is_source_list(obj: Any) -> bool:
+    return (
+        isinstance(obj, list)
+        and bool(obj)
+        and all(isinstance(item, Source) for item in obj)
+    )
+
+
+class SourceTableSerializer(JsonPlusSerializer):
+    """JsonPlusSerializer that stores lists of Source records as compact tables.
+
+    This covers the node writes to `sources_gathered` and the snapshots its
+    delta channel writes periodically. This serializer also puts Source on its
+    msgpack allowlist, so a single record elsewhere in the state loads without a
+    warning, and the allowlist is strict for every other custom type. With the
+    default JsonPlusSerializer, the graph only allowlists Source under
+    `LANGGRAPH_STRICT_MSGPACK=true`; otherwise every record loaded logs a warning.
+    """
+
+    def __init__(self, **kwargs: Any):
+        """Create the serializer, adding Source to `allowed_msgpack_modules`."""
+        allowed = kwargs.pop("allowed_msgpack_modules", None)
+        if allowed is not True:
+            allowed = (*(allowed or ()), (Source.__module__, Source.__name__))
+        super().__init__(allowed_msgpack_modules=allowed, **kwargs)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        """Serialize `obj`, packing lists of sources as one table."""
+        if _is_source_list(obj):
+            return "sources", pack_sources(obj)
+        if (
+            _DeltaSnapshot is not None
+            and isinstance(obj, _DeltaSnapshot)
+            and _is_source_list(obj.value)
+        ):
+            return "sources_snapshot", pack_sources(obj.value)
+        return super().dumps_typed(obj)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        """Deserialize data written by `dumps_typed`."""
+        if data[0] == "sources":
+            return unpack_sources(data[1])
+        if data[0] == "sources_snapshot":
+            if _DeltaSnapshot is None:
+                raise ValueError(
+                    "Checkpoint has a sources snapshot, which needs a langgraph-checkpoint with delta channels"
+                )
+            return _DeltaSnapshot(unpack_sources(data[1]))
+        return super().loads_typed(data)
+
+
+class CompressedSerializer(SourceTableSerializer):
+    """SourceTableSerializer that zstd-compresses large payloads.
+
+    Values of at least `min_size` serialized bytes, mostly the lists of research
+    summaries, are stored compressed with their type tagged `+zstd`. The codec's
+    dictionary (see `agent.codec`) must be the same wherever the checkpoints are
+    read. Requires the `zstandard` package.
+    """
+
+    def __init__(
+        self, codec: ZstdCodec | None = None, min_size: int = 256, **kwargs: Any
+    ):
+        """Create the serializer compressing payloads of at least `min_size` bytes."""
+        super().__init__(**kwargs)
+        self.codec = codec or get_codec()
+        self.min_size = min_size
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        """Serialize `obj`, compressing large payloads with zstd."""
+        type_, data = super().dumps_typed(obj)
+        if len(data) < self.min_size:
+            return type_, data
+        return f"{type_}+zstd", self.codec.compress(data)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        """Deserialize data written by `dumps_typed`."""
+        type_, payload = data
+        if type_.endswith("+zstd"):
+            return super().loads_typed(
+                (type_[: -len("+zstd")], self.codec.decompress(payload))
+            )
+        return super().loads_typed(data)
@@ -0,0 +1,62 @@
+"""Compact records of the sources and citations of search results."""
+
+import hashlib
+import threading
+import weakref
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True, weakref_slot=True)
+class Source:
+    """A web source cited by a research summary.
+
+    `short_url` is the token-saving placeholder used in prompts and `value` the
+    original grounding URL it stands for. Use `make_source` to build instances so
+    identical sources share one object.
+    """
+
+    id: int
+    label: str
+    short_url: str
+    value: str
+
+
+@dataclass(frozen=True, slots=True)
+class Citation:
+    """A span of the search response text and the sources that support it.
+
+    Indices are the UTF-8 byte offsets reported in Gemini's grounding supports.
+    """
+
+    start_index: int
+    end_index: int
+    segments: tuple[Source, ...]
+
+
+_interned: "weakref.WeakValueDictionary[tuple[str, str], Source]" = (
+    weakref.WeakValueDictionary()
+)
+_interned_lock = threading.Lock()
+
+
+def source_id(url: str) -> int:
+    """Return a stable 63-bit id for `url` that is the same in every process."""
+    digest = hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+def make_source(label: str, short_url: str, value: str) -> Source:
+    """Get the interned Source for a (short_url, value) pair.
+
+    A support usually cites the same few chunks as its neighbours, so interning
+    keeps one record per URL instead of one per cited segment.
+    """
+    key = (short_url, value)
+    with _interned_lock:
+        source = _interned.get(key)
+        if source is None:
+            source = Source(
+                id=source_id(value), label=label, short_url=short_url, value=value
+            )
+            _interned[key] = source
+        return source
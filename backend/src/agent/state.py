@@ -1,20 +1,119 @@
 from __future__ import annotations
 
+import functools
+import operator
 from dataclasses import dataclass, field
-from typing import TypedDict
+from typing import Callable, Sequence, TypedDict
 
+from langgraph.channels import DeltaChannel
 from langgraph.graph import add_messages
-from typing_extensions import Annotated
+from typing_extensions import Annotated, NotRequired
 
+from agent.sources import Source
 
-import operator
+# The research channels only ever grow, so checkpoints store each step's appended
+# items (the node writes) instead of the whole list. Every DELTA_SNAPSHOT_FREQUENCY
+# updates a channel writes a full snapshot, which bounds how many writes have to
+# be replayed to restore it.
+DELTA_SNAPSHOT_FREQUENCY = 8
+
+
+def add_unique_queries(left: list, right: list) -> list:
+    """Append queries from `right` that are not in `left`, keeping insertion order."""
+    return list(dict.fromkeys([*left, *right]))
+
+
+def add_unique_sources(left: list, right: list) -> list:
+    """Append sources from `right` whose short URL is not in `left`, keeping insertion order."""
+    seen = {source.short_url: source for source in left}
+    for source in right:
+        seen.setdefault(source.short_url, source)
+    return list(seen.values())
+
+
+def fold_writes(
+    reducer: Callable[[list, list], list],
+) -> Callable[[list, Sequence[list]], list]:
+    """Adapt a `(left, right)` list reducer to the `(state, writes)` reducer of DeltaChannel."""
+
+    def fold(state: list, writes: Sequence[list]) -> list:
+        return functools.reduce(reducer, writes, state)
+
+    fold.__name__ = f"fold_{getattr(reducer, '__name__', 'reducer')}"
+    return fold
+
+
+_METRIC_TOTALS = (
+    "wall_seconds",
+    "queue_wait_seconds",
+    "rate_limit_wait_seconds",
+    "input_tokens",
+    "output_tokens",
+    "cached_input_tokens",
+    "grounding_chunks",
+    "retries",
+)
+
+
+def _add_totals(totals: dict, record: dict) -> dict:
+    summary = {"calls": totals.get("calls", 0) + 1}
+    for key in _METRIC_TOTALS:
+        summary[key] = totals.get(key, 0) + (record.get(key) or 0)
+    return summary
+
+
+def merge_run_metrics(left: dict, right: dict) -> dict:
+    """Fold one node metrics record from `right` into the run summary in `left`.
+
+    The summary holds totals for the whole run plus per-node and per-model totals.
+    """
+    summary = _add_totals(left, right)
+    summary["nodes"] = dict(left.get("nodes", {}))
+    summary["nodes"][right["node"]] = _add_totals(
+        summary["nodes"].get(right["node"], {}), right
+    )
+    summary["models"] = dict(left.get("models", {}))
+    if right.get("model"):
+        summary["models"][right["model"]] = _add_totals(
+            summary["models"].get(right["model"], {}), right
+        )
+    return summary
 
 
 class OverallState(TypedDict):
     messages: Annotated[list, add_messages]
-    search_query: Annotated[list, operator.add]
-    web_research_result: Annotated[list, operator.add]
-    sources_gathered: Annotated[list, operator.add]
+    search_query: Annotated[
+        list,
+        DeltaChannel(
+            fold_writes(add_unique_queries), snapshot_frequency=DELTA_SNAPSHOT_FREQUENCY
+        ),
+    ]
+    web_research_result: Annotated[
+        list,
+        DeltaChannel(
+            fold_writes(operator.add), snapshot_frequency=DELTA_SNAPSHOT_FREQUENCY
+        ),
+    ]
+    # Typed so LangGraph adds Source to the checkpointer's msgpack allowlist under
+    # LANGGRAPH_STRICT_MSGPACK=true
+    sources_gathered: Annotated[
+        list[Source],
+        DeltaChannel(
+            fold_writes(add_unique_sources), snapshot_frequency=DELTA_SNAPSHOT_FREQUENCY
+        ),
+    ]
+    dropped_queries: Annotated[list, operator.add]
+    run_metrics: Annotated[dict, merge_run_metrics]
+    research_gain: Annotated[list, operator.add]
+    incomplete_searches: Annotated[list, operator.add]
+    node_errors: Annotated[list, operator.add]
+    source_pages: Annotated[dict, operator.or_]
+    # Every web_research branch adds one, including failed and abandoned ones,
+    # so ids issued from it are never reused for another search's short urls
+    next_search_id: Annotated[int, operator.add]
+    # The queries generate_query kept this turn; search_query holds every turn's
+    pending_queries: list
+    cached_run: dict
     initial_search_query_count: int
     max_research_loops: int
     research_loop_count: int
@@ -24,9 +123,11 @@ class OverallState(TypedDict):
 class ReflectionState(TypedDict):
     is_sufficient: bool
     knowledge_gap: str
-    follow_up_queries: Annotated[list, operator.add]
+    follow_up_queries: list
     research_loop_count: int
     number_of_ran_queries: int
+    # Read by evaluate_research, which only sees the channels of this schema
+    next_search_id: Annotated[int, operator.add]
 
 
 class Query(TypedDict):
@@ -36,11 +137,16 @@ class Query(TypedDict):
 
 class QueryGenerationState(TypedDict):
     search_query: list[Query]
+    pending_queries: list
+    cached_run: NotRequired[dict]
 
 
 class WebSearchState(TypedDict):
     search_query: str
     id: str
+    branch_group: NotRequired[str]
+    branch_count: NotRequired[int]
+    cached_run: NotRequired[dict]
 
 
 @dataclass(kw_only=True)
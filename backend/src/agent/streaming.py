@@ -0,0 +1,116 @@
+"""Short url rewriting of streamed answer text."""
+
+import re
+from typing import Dict, List, Set
+
+from agent.sources import Source
+
+SHORT_URL_PREFIX = "https://vertexaisearch.cloud.google.com/id/"
+
+# A short url, with the markdown citation link around it if there is one
+SHORT_URL_CITATION_RE = re.compile(
+    r"(?P<link> ?\[[^\[\]\n]{0,100}\]\()?(?P<url>"
+    + re.escape(SHORT_URL_PREFIX)
+    + r"[\d-]+)(?P<close>\))?"
+)
+# The end of a text that could still grow into a citation link, down to its space
+_PARTIAL_CITATION_RE = re.compile(
+    r"(?: ?\[[^\[\]\n]{0,100}(?:\](?:\((?P<url>\S*))?)?| )\Z"
+)
+
+
+def rewrite_short_url(
+    match: re.Match, by_short_url: Dict[str, Source], used: Set[str]
+) -> str:
+    """Rewrite a `SHORT_URL_CITATION_RE` match to the original url of its source.
+
+    A short url without a source leads nowhere, so it is dropped, together with its
+    citation link if it has one. The short urls rewritten are added to `used`.
+    """
+    link, close = match.group("link") or "", match.group("close") or ""
+    source = by_short_url.get(match.group("url"))
+    if source is None:
+        return "" if link and close else link + close
+    used.add(match.group("url"))
+    return link + source.value + close
+
+
+class ShortUrlRewriter:
+    """Incrementally replace short urls with original urls in streamed text.
+
+    Text is released as soon as it cannot be part of a short url or its citation
+    link. Only a trailing fragment that could still grow into one (a partial
+    `https://vertexaisearch.cloud.google.com/id/` prefix, a short url whose id may
+    continue in the next chunk, or an unfinished ` [label](` link) is held back, so
+    no consumer ever sees a short url while the latency added per token stays
+    minimal. Short urls without a source are dropped with their citation link, as
+    `replace_short_urls` does for whole answers.
+    """
+
+    def __init__(self, sources: List[Source]):
+        """Create a rewriter for the short urls of `sources`."""
+        self._by_short_url = {
+            source.short_url: source for source in sources if source.short_url
+        }
+        self._buffer = ""
+        self._parts: List[str] = []
+        self._used: set[str] = set()
+
+    def feed(self, text: str) -> str:
+        """Add a streamed chunk and return the rewritten text that is safe to emit."""
+        self._buffer += text
+        return self._drain(final=False)
+
+    def flush(self) -> str:
+        """Return whatever is still buffered, rewritten, at the end of the stream."""
+        return self._drain(final=True)
+
+    @property
+    def text(self) -> str:
+        """The rewritten text emitted so far."""
+        return "".join(self._parts)
+
+    @property
+    def used_sources(self) -> List[Source]:
+        """The sources whose short url appeared in the text, in input order."""
+        return [
+            source
+            for short_url, source in self._by_short_url.items()
+            if short_url in self._used
+        ]
+
+    def _drain(self, final: bool) -> str:
+        buffer = self._buffer
+        out: List[str] = []
+        position = 0
+        for match in SHORT_URL_CITATION_RE.finditer(buffer):
+            if not final and match.end() == len(buffer) and not match.group("close"):
+                # The id or the citation link may continue in the next chunk
+                hold = match.start()
+                break
+            out.append(buffer[position : match.start()])
+            out.append(rewrite_short_url(match, self._by_short_url, self._used))
+            position = match.end()
+        else:
+            hold = len(buffer) if final else self._partial_start(buffer, position)
+        out.append(buffer[position:hold])
+        self._buffer = buffer[hold:]
+        return self._emit(out)
+
+    def _emit(self, out: List[str]) -> str:
+        text = "".join(out)
+        if text:
+            self._parts.append(text)
+        return text
+
+    @staticmethod
+    def _partial_start(buffer: str, position: int) -> int:
+        start = len(buffer)
+        link = _PARTIAL_CITATION_RE.search(buffer, position)
+        if link is not None and SHORT_URL_PREFIX.startswith(link.group("url") or ""):
+            start = link.start()
+        longest = min(len(SHORT_URL_PREFIX) - 1, len(buffer) - position)
+        for length in range(longest, 0, -1):
+            if buffer.endswith(SHORT_URL_PREFIX[:length]):
+                return min(start, len(buffer) - length)
+        return start
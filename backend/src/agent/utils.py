@@ -1,11 +1,13 @@
-from typing import Any, Dict, List
-from langchain_core.messages import AnyMessage, AIMessage, HumanMessage
+from typing import Any, Dict, List, Tuple
+
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage
+
+from agent.sources import Citation, Source, make_source
+from agent.streaming import SHORT_URL_CITATION_RE, rewrite_short_url
 
 
 def get_research_topic(messages: List[AnyMessage]) -> str:
-    """
-    Get the research topic from the messages.
-    """
+    """Get the research topic from the messages."""
     # check if request has a history and combine the messages into a single string
     if len(messages) == 1:
         research_topic = messages[-1].content
@@ -19,12 +21,22 @@ def get_research_topic(messages: List[AnyMessage]) -> str:
     return research_topic
 
 
+def message_text(message: AnyMessage) -> str:
+    """Get the text of a message or message chunk whose content may be a list of blocks."""
+    if isinstance(message.content, str):
+        return message.content
+    return "".join(
+        block if isinstance(block, str) else block.get("text", "")
+        for block in message.content
+        if isinstance(block, str) or block.get("type") == "text"
+    )
+
+
 def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
-    """
-    Create a map of the vertex ai search urls (very long) to a short url with a unique id for each url.
+    """Create a map of the vertex ai search urls (very long) to a short url with a unique id for each url.
     Ensures each original URL gets a consistent shortened form while maintaining uniqueness.
     """
-    prefix = f"https://vertexaisearch.cloud.google.com/id/"
+    prefix = "https://vertexaisearch.cloud.google.com/id/"
     urls = [site.web.uri for site in urls_to_resolve]
 
     # Create a dictionary that maps each unique URL to its first occurrence index
@@ -36,48 +48,125 @@ def resolve_urls(urls_to_resolve: List[Any], id: int) -> Dict[str, str]:
     return resolved_map
 
 
-def insert_citation_markers(text, citations_list):
+def replace_short_urls(text: str, sources: List[Source]) -> Tuple[str, List[Source]]:
+    """Replace every short url in the text with the original url of its source.
+
+    Matches any short url with one fixed pattern and looks each match up, so
+    the cost does not grow with the number of sources. The pattern consumes the
+    whole id, so `.../id/1-1` never matches the start of `.../id/1-10`. Short
+    urls without a source are removed with their citation link, like
+    `ShortUrlRewriter` does while streaming.
+
+    Returns:
+        The rewritten text and the sources whose short url appeared in it, in
+        the order of `sources`.
+    """
+    by_short_url = {source.short_url: source for source in sources if source.short_url}
+    used: set[str] = set()
+    rewritten = SHORT_URL_CITATION_RE.sub(
+        lambda match: rewrite_short_url(match, by_short_url, used), text
+    )
+    return rewritten, [
+        source for short_url, source in by_short_url.items() if short_url in used
+    ]
+
+
+def utf8_offsets_to_char_offsets(text: str, byte_offsets: List[int]) -> Dict[int, int]:
+    """Map UTF-8 byte offsets into `text` to Python string offsets.
+
+    Gemini reports grounding segment indices as byte offsets into the UTF-8 encoded
+    response text, which differ from string offsets as soon as the text contains
+    non-ASCII characters. Offsets inside a multi-byte character snap back to the
+    start of that character. Runs in O(n + k log k) for n bytes and k offsets.
     """
-    Inserts citation markers into a text string based on start and end indices.
+    encoded = text.encode("utf-8")
+    if len(encoded) == len(text):
+        return {offset: min(max(offset, 0), len(text)) for offset in byte_offsets}
+
+    mapping = {}
+    byte_pos = 0
+    char_pos = 0
+    for offset in sorted(set(byte_offsets)):
+        target = min(max(offset, 0), len(encoded))
+        # Continuation bytes look like 0b10xxxxxx
+        while (
+            target < len(encoded)
+            and target > byte_pos
+            and (encoded[target] & 0xC0) == 0x80
+        ):
+            target -= 1
+        if target > byte_pos:
+            char_pos += len(encoded[byte_pos:target].decode("utf-8"))
+            byte_pos = target
+        mapping[offset] = char_pos
+    return mapping
+
+
+def insert_citation_markers(text, citations_list, offsets_in_bytes=True):
+    """Inserts citation markers into a text string based on start and end indices.
+
+    The output is assembled once from the original text slices and markers, so
+    the cost is O(n + k log k) for a text of length n with k citations.
 
     Args:
         text (str): The original text string.
-        citations_list (list): A list of dictionaries, where each dictionary
-                               contains 'start_index', 'end_index', and
-                               'segment_string' (the marker to insert).
-                               Indices are assumed to be for the original text.
+        citations_list (list[Citation]): The citations whose 'segments' (the
+                               links for the marker to insert) go after
+                               'end_index'. Indices are assumed to be for the
+                               original text.
+        offsets_in_bytes (bool): Whether the indices are UTF-8 byte offsets, as
+                                 reported by Gemini, rather than string offsets.
 
     Returns:
         str: The text with citation markers inserted.
     """
-    # Sort citations by end_index in descending order.
-    # If end_index is the same, secondary sort by start_index descending.
-    # This ensures that insertions at the end of the string don't affect
-    # the indices of earlier parts of the string that still need to be processed.
-    sorted_citations = sorted(
-        citations_list, key=lambda c: (c["end_index"], c["start_index"]), reverse=True
+    end_offsets = [citation.end_index for citation in citations_list]
+    if offsets_in_bytes:
+        char_offsets = utf8_offsets_to_char_offsets(text, end_offsets)
+    else:
+        char_offsets = {
+            offset: min(max(offset, 0), len(text)) for offset in end_offsets
+        }
+
+    # Sort by end_index, then start_index. Citations sharing both indices keep
+    # the order of repeated insertions at the same position (last one first).
+    order = sorted(
+        range(len(citations_list)),
+        key=lambda i: (
+            citations_list[i].end_index,
+            citations_list[i].start_index,
+            -i,
+        ),
     )
 
-    modified_text = text
-    for citation_info in sorted_citations:
-        # These indices refer to positions in the *original* text,
-        # but since we iterate from the end, they remain valid for insertion
-        # relative to the parts of the string already processed.
-        end_idx = citation_info["end_index"]
-        marker_to_insert = ""
-        for segment in citation_info["segments"]:
-            marker_to_insert += f" [{segment['label']}]({segment['short_url']})"
-        # Insert the citation marker at the original end_idx position
-        modified_text = (
-            modified_text[:end_idx] + marker_to_insert + modified_text[end_idx:]
-        )
+    parts = []
+    previous = 0
+    for i in order:
+        citation_info = citations_list[i]
+        end_idx = max(char_offsets[citation_info.end_index], previous)
+        parts.append(text[previous:end_idx])
+        for segment in citation_info.segments:
+            parts.append(f" [{segment.label}]({segment.short_url})")
+        previous = end_idx
+    parts.append(text[previous:])
+
+    return "".join(parts)
 
-    return modified_text
 
+def dedupe_sources(sources: List[Source]) -> List[Source]:
+    """Keep the first source for each URL.
 
-def get_citations(response, resolved_urls_map):
+    Sources found by different searches have different short urls, but share
+    their URL once redirect links are resolved to canonical URLs.
     """
-    Extracts and formats citation information from a Gemini model's response.
+    first = {}
+    for source in sources:
+        first.setdefault(source.value, source)
+    return list(first.values())
+
+
+def get_citations(response, resolved_urls_map, canonical_urls_map=None):
+    """Extracts and formats citation information from a Gemini model's response.
 
     This function processes the grounding metadata provided in the response to
     construct a list of citation objects. Each citation object includes the
@@ -89,19 +178,18 @@ def get_citations(response, resolved_urls_map):
                   a structure including `candidates[0].grounding_metadata`.
                   It also relies on a `resolved_map` being available in its
                   scope to map chunk URIs to resolved URLs.
+        canonical_urls_map: Optional map from chunk URIs to the canonical
+                            URLs stored as the sources' values.
 
     Returns:
-        list: A list of dictionaries, where each dictionary represents a citation
-              and has the following keys:
-              - "start_index" (int): The starting character index of the cited
-                                     segment in the original text. Defaults to 0
-                                     if not specified.
-              - "end_index" (int): The character index immediately after the
-                                   end of the cited segment (exclusive).
-              - "segments" (list[str]): A list of individual markdown-formatted
-                                        links for each grounding chunk.
-              - "segment_string" (str): A concatenated string of all markdown-
-                                        formatted links for the citation.
+        list[Citation]: One record per grounding support, with:
+              - start_index (int): The starting byte index of the cited
+                                   segment in the original text. Defaults to 0
+                                   if not specified.
+              - end_index (int): The byte index immediately after the
+                                 end of the cited segment (exclusive).
+              - segments (tuple[Source, ...]): The interned sources of the
+                                               grounding chunks for the citation.
               Returns an empty list if no valid candidates or grounding supports
               are found, or if essential data is missing.
     """
@@ -120,8 +208,6 @@ def get_citations(response, resolved_urls_map):
         return citations
 
     for support in candidate.grounding_metadata.grounding_supports:
-        citation = {}
-
         # Ensure segment information is present
         if not hasattr(support, "segment") or support.segment is None:
             continue  # Skip this support if segment info is missing
@@ -136,12 +222,7 @@ def get_citations(response, resolved_urls_map):
         if support.segment.end_index is None:
             continue  # Skip if end_index is missing, as it's crucial
 
-        # Add 1 to end_index to make it an exclusive end for slicing/range purposes
-        # (assuming the API provides an inclusive end_index)
-        citation["start_index"] = start_index
-        citation["end_index"] = support.segment.end_index
-
-        citation["segments"] = []
+        segments = []
         if (
             hasattr(support, "grounding_chunk_indices")
             and support.grounding_chunk_indices
@@ -150,17 +231,25 @@ def get_citations(response, resolved_urls_map):
                 try:
                     chunk = candidate.grounding_metadata.grounding_chunks[ind]
                     resolved_url = resolved_urls_map.get(chunk.web.uri, None)
-                    citation["segments"].append(
-                        {
-                            "label": chunk.web.title.split(".")[:-1][0],
-                            "short_url": resolved_url,
-                            "value": chunk.web.uri,
-                        }
+                    segments.append(
+                        make_source(
+                            label=chunk.web.title.split(".")[:-1][0],
+                            short_url=resolved_url,
+                            value=(canonical_urls_map or {}).get(
+                                chunk.web.uri, chunk.web.uri
+                            ),
+                        )
                     )
                 except (IndexError, AttributeError, NameError):
                     # Handle cases where chunk, web, uri, or resolved_map might be problematic
                     # For simplicity, we'll just skip adding this particular segment link
                     # In a production system, you might want to log this.
                     pass
-        citations.append(citation)
+        citations.append(
+            Citation(
+                start_index=start_index,
+                end_index=support.segment.end_index,
+                segments=tuple(segments),
+            )
+        )
     return citations
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import importlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from agent.tools_and_schemas import Reflection, SearchQueryList
+
+# Run settings that keep the graph off disk and free of timing-dependent paths
+TEST_CONFIGURABLE = {
+    "search_cache_backend": "none",
+    "answer_cache_backend": "none",
+    "hedge_searches": False,
+    "max_attempts": 1,
+    "min_information_gain": 0.0,
+    "stream_final_answer": False,
+}
+
+
+def search_response(query: str, chunks: int = 3) -> Any:
+    """Build a grounded search response citing `chunks` pages about `query`."""
+    from google.genai.types import GenerateContentResponse
+
+    digest = hashlib.sha1(query.encode()).hexdigest()[:8]
+    sentences = [f"Finding {n} about {query}." for n in range(chunks)]
+    supports = []
+    offset = 0
+    for n, sentence in enumerate(sentences):
+        end = offset + len(sentence.encode("utf-8"))
+        supports.append(
+            {
+                "segment": {"start_index": offset, "end_index": end},
+                "grounding_chunk_indices": [n],
+            }
+        )
+        offset = end + 1
+    return GenerateContentResponse.model_validate(
+        {
+            "candidates": [
+                {
+                    "content": {
+                        "role": "model",
+                        "parts": [{"text": " ".join(sentences)}],
+                    },
+                    "grounding_metadata": {
+                        "grounding_chunks": [
+                            {
+                                "web": {
+                                    "uri": f"https://vertexaisearch.cloud.google.com/grounding-api-redirect/{digest}{n}",
+                                    "title": f"site-{digest}-{n}.com",
+                                }
+                            }
+                            for n in range(chunks)
+                        ],
+                        "grounding_supports": supports,
+                    },
+                }
+            ]
+        }
+    )
+
+
+class FakeModels:
+    """Canned Gemini calls for the graph nodes.
+
+    Queries are numbered across the run, so follow-ups never repeat earlier
+    ones; set `query_count` back to generate earlier queries again. Searches for a query in `failing_queries` raise, and searches for a
+    query in `slow_queries` take that many seconds.
+    """
+
+    def __init__(self, queries_per_call: int = 2):
+        self.queries_per_call = queries_per_call
+        self.failing_queries: set[str] = set()
+        self.slow_queries: dict[str, float] = {}
+        self.searched: list[str] = []
+        self.answer_prompts: list[str] = []
+        self.query_count = 0
+
+    def _queries(self) -> list[str]:
+        queries = [
+            f"topic {self.query_count + n} facts" for n in range(self.queries_per_call)
+        ]
+        self.query_count += self.queries_per_call
+        return queries
+
+    def model_runnable(
+        self, configurable, model, temperature, schema=None, cached_content=None
+    ):
+        models = self
+
+        class Runnable:
+            async def ainvoke(self, prompt):
+                if schema is SearchQueryList:
+                    return SearchQueryList(query=models._queries(), rationale="")
+                if schema is Reflection:
+                    return Reflection(
+                        is_sufficient=False,
+                        knowledge_gap="more detail",
+                        follow_up_queries=models._queries(),
+                    )
+                models.answer_prompts.append(prompt)
+                return AIMessage(content="The answer.")
+
+        return Runnable()
+
+    def content_generator(self, configurable):
+        async def generate_content(model, contents, config):
+            query = contents.rsplit("Research Topic:", 1)[-1].strip()
+            self.searched.append(query)
+            await asyncio.sleep(self.slow_queries.get(query, 0))
+            if query in self.failing_queries:
+                raise ValueError(f"search failed: {query}")
+            return search_response(query)
+
+        return generate_content
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    # `agent.graph` the attribute is the compiled graph re-exported by `agent`
+    graph_module = importlib.import_module("agent.graph")
+    models = FakeModels()
+    monkeypatch.setattr(graph_module, "model_runnable", models.model_runnable)
+    monkeypatch.setattr(graph_module, "content_generator", models.content_generator)
+    return models
+
+
+class LocalWeb:
+    """Local HTTP server answering each path from a table of canned responses.
+
+    `routes` maps a path to `(status, headers, body)`; other paths get a 404.
+    Requested paths are recorded in `requests`, HEAD requests included.
+    """
+
+    def __init__(self) -> None:
+        self.routes: dict[str, tuple[int, dict[str, str], bytes]] = {}
+        self.requests: list[str] = []
+        web = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                web.requests.append(self.path)
+                status, headers, body = web.routes.get(self.path, (404, {}, b""))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("content-length", str(len(body)))
+                self.end_headers()
+                if self.command != "HEAD":
+                    self.wfile.write(body)
+
+            do_HEAD = do_GET
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def route(
+        self, path: str, status: int = 200, body: bytes = b"", **headers: str
+    ) -> str:
+        """Serve `body` at `path` and return its URL; header names use `_` for `-`."""
+        self.routes[path] = (
+            status,
+            {k.replace("_", "-"): v for k, v in headers.items()},
+            body,
+        )
+        return self.url + path
+
+
+@pytest.fixture
+def local_web():
+    web = LocalWeb()
+    thread = threading.Thread(target=web._server.serve_forever, daemon=True)
+    thread.start()
+    yield web
+    web._server.shutdown()
+    web._server.server_close()
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from agent.codec import STREAM_MEDIA_TYPE
+
+pytest.importorskip("zstandard")
+
+
+def stream_response(headers, body):
+    """An ASGI app answering every request with an event stream."""
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+
+    return app
+
+
+def request_frames(app):
+    """Request `app` through the middleware, accepting compressed frames."""
+    from agent.app import CompressedStreamMiddleware
+
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/runs/stream",
+        "headers": [(b"accept", STREAM_MEDIA_TYPE.encode())],
+    }
+    asyncio.run(CompressedStreamMiddleware(app)(scope, receive, send))
+    start, *bodies = messages
+    return start["headers"], b"".join(message["body"] for message in bodies)
+
+
+def test_repeated_headers_are_kept_and_vary_on_accept():
+    headers, _ = request_frames(
+        stream_response(
+            [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"content-length", b"42"),
+                (b"set-cookie", b"a=1"),
+                (b"set-cookie", b"b=2"),
+                (b"vary", b"Origin"),
+            ],
+            b'event: metadata\ndata: {"run_id": "r"}\n\n',
+        )
+    )
+
+    assert [value for name, value in headers if name == b"set-cookie"] == [
+        b"a=1",
+        b"b=2",
+    ]
+    assert [value for name, value in headers if name == b"vary"] == [
+        b"Origin",
+        b"Accept",
+    ]
+    assert [value for name, value in headers if name == b"content-type"] == [
+        STREAM_MEDIA_TYPE.encode()
+    ]
+    assert not any(name == b"content-length" for name, _ in headers)
+
+
+def test_event_ids_are_carried_in_the_frames():
+    from agent.codec import get_codec
+
+    _, body = request_frames(
+        stream_response(
+            [(b"content-type", b"text/event-stream")],
+            b'event: metadata\ndata: {"run_id": "r"}\nid: 1\n\n'
+            b'event: updates\ndata: {"a": 1}\n\n'
+            b'event: values\r\ndata: {"b": 2}\r\nid: 3\r\n\r\n',
+        )
+    )
+
+    assert list(get_codec().iter_frames([body])) == [
+        ("metadata", {"run_id": "r"}, "1"),
+        ("updates", {"a": 1}, None),
+        ("values", {"b": 2}, "3"),
+    ]
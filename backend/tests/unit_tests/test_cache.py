@@ -0,0 +1,43 @@
+from agent.cache import make_search_cache_key, normalize_query
+from agent.dedup import suppress_near_duplicates
+
+
+def test_normalize_query_ignores_case_whitespace_and_stopwords():
+    assert normalize_query("  Trends in SOLAR   power? ") == normalize_query(
+        "trends solar power"
+    )
+
+
+def test_normalize_query_keeps_word_order():
+    assert normalize_query("python to rust migration") == "python rust migration"
+    assert make_search_cache_key(
+        "m", "python to rust migration"
+    ) != make_search_cache_key("m", "rust to python migration")
+
+
+def test_question_words_and_negations_change_the_key():
+    keys = {
+        make_search_cache_key("m", query)
+        for query in (
+            "When was Einstein born",
+            "Where was Einstein born",
+            "Why was Einstein born",
+        )
+    }
+    assert len(keys) == 3
+    assert make_search_cache_key(
+        "m", "solar farms with subsidies"
+    ) != make_search_cache_key("m", "solar farms without subsidies")
+    assert make_search_cache_key("m", "is nuclear safe") != make_search_cache_key(
+        "m", "is nuclear not safe"
+    )
+
+
+def test_swapped_words_are_not_near_duplicates():
+    kept, dropped = suppress_near_duplicates(
+        ["rust to python migration", "Python to Rust migration?"],
+        ["python to rust migration"],
+        0.85,
+    )
+    assert kept == ["rust to python migration"]
+    assert [record["query"] for record in dropped] == ["Python to Rust migration?"]
@@ -0,0 +1,36 @@
+import asyncio
+import gc
+
+from agent.concurrency import _branch_groups, get_branch_group
+
+
+def test_late_branches_join_the_group_of_their_fan_out():
+    config = {"configurable": {"run_id": "run-a"}}
+    branches = [
+        {"search_query": f"q{n}", "branch_group": "g", "branch_count": 3}
+        for n in range(3)
+    ]
+
+    async def run():
+        for branch in branches[:2]:
+            get_branch_group(branch, config, 0.5).finish()
+        # Nothing but the registry holds the group between branches
+        gc.collect()
+        late = get_branch_group(branches[2], config, 0.5)
+        assert late.finished == 2
+        assert late.quorum_reached.is_set()
+        late.finish()
+        return dict(_branch_groups[asyncio.get_running_loop()])
+
+    assert asyncio.run(run()) == {}
+
+
+def test_branch_groups_are_kept_apart_by_run():
+    branch = {"search_query": "q", "branch_group": "g", "branch_count": 2}
+
+    async def run():
+        first = get_branch_group(branch, {"configurable": {"run_id": "run-b"}}, 1.0)
+        second = get_branch_group(branch, {"configurable": {"run_id": "run-c"}}, 1.0)
+        return first is not second
+
+    assert asyncio.run(run())
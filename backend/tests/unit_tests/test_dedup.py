@@ -0,0 +1,43 @@
+from agent.dedup import suppress_near_duplicates
+
+
+def test_near_duplicates_of_existing_queries_are_dropped():
+    kept, dropped = suppress_near_duplicates(
+        ["Lithium battery storage costs 2024", "sodium-ion pilot projects"],
+        ["lithium battery storage cost 2024"],
+        threshold=0.8,
+    )
+
+    assert kept == ["sodium-ion pilot projects"]
+    assert [record["query"] for record in dropped] == [
+        "Lithium battery storage costs 2024"
+    ]
+    assert dropped[0]["duplicate_of"] == "lithium battery storage cost 2024"
+    assert dropped[0]["similarity"] >= 0.8
+
+
+def test_candidates_are_compared_with_kept_candidates():
+    kept, dropped = suppress_near_duplicates(
+        ["grid storage growth", "Grid storage growth!", "grid storage growth"],
+        [],
+        threshold=0.9,
+    )
+
+    assert kept == ["grid storage growth"]
+    assert [record["duplicate_of"] for record in dropped] == ["grid storage growth"] * 2
+    assert dropped[1]["similarity"] == 1.0
+
+
+def test_reordered_words_are_not_duplicates():
+    kept, dropped = suppress_near_duplicates(
+        ["migrating from rust to python"],
+        ["migrating from python to rust"],
+        threshold=0.8,
+    )
+
+    assert kept == ["migrating from rust to python"]
+    assert dropped == []
+
+
+def test_without_candidates():
+    assert suppress_near_duplicates([], ["a"], threshold=0.5) == ([], [])
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from agent.addresses import is_public_address
+from agent.enrichment import PageFetcher
+
+ARTICLE = (
+    "<html><head><title>Storage report</title><script>var x = 'SCRIPT';</script></head>"
+    "<body><nav>NAV</nav><article>"
+    + "<p>Grid operators added 12 gigawatts of storage this year.</p>" * 8
+    + "</article><footer>FOOTER</footer></body></html>"
+).encode()
+
+
+def fetcher(**kwargs):
+    options = {
+        "timeout_seconds": 5.0,
+        "max_bytes": 100_000,
+        "max_chars": 8000,
+        "connections_per_host": 4,
+    }
+    options.update(kwargs)
+    return PageFetcher(**options)
+
+
+def test_page_text_is_extracted_without_boilerplate(local_web):
+    url = local_web.route(
+        "/article", body=ARTICLE, content_type="text/html; charset=utf-8"
+    )
+
+    page = asyncio.run(fetcher(allowed_hosts={"127.0.0.1"}).fetch(url))
+
+    assert page["title"] == "Storage report"
+    assert "Grid operators added 12 gigawatts" in page["text"]
+    assert not any(marker in page["text"] for marker in ("SCRIPT", "NAV", "FOOTER"))
+    assert page["truncated"] is False
+
+
+def test_large_pages_are_read_up_to_max_bytes(local_web):
+    url = local_web.route(
+        "/big", body=b"<p>" + b"x" * 200_000 + b"</p>", content_type="text/html"
+    )
+    page_fetcher = fetcher(max_bytes=10_000, allowed_hosts={"127.0.0.1"})
+
+    page = asyncio.run(page_fetcher.fetch(url))
+
+    assert page["truncated"] is True
+    assert page_fetcher.stats["bytes"] == 10_000
+
+
+def test_non_text_responses_are_skipped(local_web):
+    url = local_web.route(
+        "/report.pdf", body=b"%PDF-1.4", content_type="application/pdf"
+    )
+    page_fetcher = fetcher(allowed_hosts={"127.0.0.1"})
+
+    assert asyncio.run(page_fetcher.fetch(url)) is None
+    assert page_fetcher.stats["skipped"] == 1
+
+
+def test_loopback_pages_are_not_requested(local_web):
+    url = local_web.route("/article", body=ARTICLE, content_type="text/html")
+    page_fetcher = fetcher()
+
+    assert asyncio.run(page_fetcher.fetch(url)) is None
+    assert (
+        asyncio.run(page_fetcher.fetch(url.replace("127.0.0.1", "localhost"))) is None
+    )
+    assert page_fetcher.stats["blocked"] == 2
+    assert local_web.requests == []
+
+
+@pytest.mark.parametrize(
+    "target",
+    [
+        "http://169.254.169.254/latest/meta-data/",
+        "http://10.0.0.7/admin",
+        "http://[::ffff:127.0.0.1]/",
+        "file:///etc/passwd",
+    ],
+)
+def test_redirects_to_private_addresses_are_not_followed(local_web, target):
+    url = local_web.route("/redirect", status=302, location=target)
+    page_fetcher = fetcher(allowed_hosts={"127.0.0.1"})
+
+    assert asyncio.run(page_fetcher.fetch(url)) is None
+    assert page_fetcher.stats["blocked"] == 1
+    assert page_fetcher.stats["requests"] == 1
+
+
+def test_redirect_to_a_loopback_host_name_is_not_followed(local_web):
+    local_web.route("/article", body=ARTICLE, content_type="text/html")
+    url = local_web.route(
+        "/redirect",
+        status=302,
+        location=local_web.url.replace("127.0.0.1", "localhost") + "/article",
+    )
+
+    assert asyncio.run(fetcher(allowed_hosts={"127.0.0.1"}).fetch(url)) is None
+    assert local_web.requests == ["/redirect"]
+
+
+@pytest.mark.parametrize(
+    "address, public",
+    [
+        ("8.8.8.8", True),
+        ("2606:4700:4700::1111", True),
+        ("127.0.0.1", False),
+        ("10.1.2.3", False),
+        ("172.16.0.1", False),
+        ("192.168.1.1", False),
+        ("169.254.169.254", False),
+        ("100.64.0.1", False),
+        ("0.0.0.0", False),
+        ("224.0.0.1", False),
+        ("::1", False),
+        ("fe80::1%eth0", False),
+        ("fd00::1", False),
+        ("::ffff:10.0.0.1", False),
+    ],
+)
+def test_is_public_address(address, public):
+    assert is_public_address(address) is public
@@ -0,0 +1,207 @@
+import asyncio
+import importlib
+import re
+import uuid
+
+from conftest import TEST_CONFIGURABLE
+from langchain_core.messages import HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+_SHORT_ID_RE = re.compile(r"/id/(\d+)-\d+$")
+
+
+def run_graph(question="battery storage?", **configurable):
+    from agent.graph import graph
+
+    return asyncio.run(
+        graph.ainvoke(
+            {"messages": [HumanMessage(content=question)]},
+            {"configurable": {**TEST_CONFIGURABLE, **configurable}},
+        )
+    )
+
+
+def search_ids(state):
+    """Map each search of the run to the ids of its short urls and incomplete record."""
+    ids = {}
+    for source in state["sources_gathered"]:
+        query = source.label.split("-")[1]
+        ids.setdefault(query, set()).add(
+            int(_SHORT_ID_RE.search(source.short_url).group(1))
+        )
+    return ids
+
+
+def test_failed_follow_up_search_does_not_reuse_search_ids(fake_models):
+    # Follow-up queries only reach search_query once their search succeeds
+    fake_models.failing_queries.add("topic 2 facts")
+
+    state = run_graph(max_research_loops=3)
+
+    assert fake_models.searched == [f"topic {n} facts" for n in range(6)]
+    assert [record["id"] for record in state["incomplete_searches"]] == [2]
+    ids = search_ids(state)
+    # One id per successful search, none shared and none equal to the failed one
+    assert all(len(found) == 1 for found in ids.values())
+    assert sorted(id_ for found in ids.values() for id_ in found) == [0, 1, 3, 4, 5]
+    assert len({source.short_url for source in state["sources_gathered"]}) == 5 * 3
+
+
+def test_abandoned_follow_up_search_does_not_reuse_search_ids(fake_models):
+    fake_models.slow_queries["topic 2 facts"] = 5.0
+
+    state = run_graph(max_research_loops=3, search_deadline_seconds=0.5)
+
+    assert [
+        (record["id"], record["reason"]) for record in state["incomplete_searches"]
+    ] == [(2, "deadline")]
+    ids = search_ids(state)
+    assert all(len(found) == 1 for found in ids.values())
+    assert sorted(id_ for found in ids.values() for id_ in found) == [0, 1, 3, 4, 5]
+
+
+def test_answers_are_not_cached_by_default(fake_models):
+    from agent.configuration import Configuration
+
+    assert Configuration().answer_cache_backend == "none"
+    question = f"storage {uuid.uuid4().hex}?"
+    run_graph(
+        question,
+        max_research_loops=1,
+        answer_cache_backend=Configuration().answer_cache_backend,
+    )
+    run_graph(
+        question,
+        max_research_loops=1,
+        answer_cache_backend=Configuration().answer_cache_backend,
+    )
+
+    assert len(fake_models.searched) == 4
+
+
+def test_opted_in_answer_cache_replays_the_run(fake_models):
+    question = f"storage {uuid.uuid4().hex}?"
+    first = run_graph(question, max_research_loops=1, answer_cache_backend="memory")
+    second = run_graph(question, max_research_loops=1, answer_cache_backend="memory")
+
+    assert len(fake_models.searched) == 2
+    assert second["messages"][-1].content == first["messages"][-1].content
+    assert second["web_research_result"] == first["web_research_result"]
+
+
+def test_later_turns_of_a_thread_only_search_new_queries(fake_models):
+    from agent.graph import builder
+
+    graph = builder.compile(checkpointer=InMemorySaver())
+    config = {
+        "configurable": {
+            **TEST_CONFIGURABLE,
+            "thread_id": uuid.uuid4().hex,
+            "max_research_loops": 1,
+        }
+    }
+
+    def ask(question):
+        return asyncio.run(
+            graph.ainvoke({"messages": [HumanMessage(content=question)]}, config)
+        )
+
+    ask("battery storage?")
+    assert fake_models.searched == ["topic 0 facts", "topic 1 facts"]
+
+    # The next turn repeats "topic 1 facts" and adds "topic 2 facts"
+    fake_models.query_count = 1
+    state = ask("and sodium-ion?")
+
+    assert fake_models.searched == ["topic 0 facts", "topic 1 facts", "topic 2 facts"]
+    assert state["search_query"] == [f"topic {n} facts" for n in range(3)]
+
+    # A turn repeating only earlier queries answers from the earlier research
+    fake_models.query_count = 0
+    state = ask("battery storage again?")
+
+    assert len(fake_models.searched) == 3
+    assert state["messages"][-1].content == "The answer."
+    assert len(fake_models.answer_prompts) == 3
+
+
+def test_prompt_cache_defaults_cache_the_reflection_instructions(
+    fake_models, monkeypatch
+):
+    from types import SimpleNamespace
+
+    import agent.prompt_cache
+
+    graph_module = importlib.import_module("agent.graph")
+    created = []
+
+    async def create(model, config):
+        created.append(model)
+        return SimpleNamespace(name=f"cachedContents/{len(created)}")
+
+    client = SimpleNamespace(aio=SimpleNamespace(caches=SimpleNamespace(create=create)))
+    monkeypatch.setattr(agent.prompt_cache, "get_genai_client", lambda: client)
+    cached_contents = []
+
+    def model_runnable(
+        configurable, model, temperature, schema=None, cached_content=None
+    ):
+        cached_contents.append((model, cached_content))
+        return fake_models.model_runnable(
+            configurable, model, temperature, schema, cached_content
+        )
+
+    monkeypatch.setattr(graph_module, "model_runnable", model_runnable)
+
+    run_graph(max_research_loops=2, use_prompt_cache=True, prompt_cache_ttl_seconds=7)
+
+    # The reflection instructions reach gemini-2.5-flash's minimum cache size
+    assert created == ["gemini-2.5-flash"]
+    assert [
+        cached for model, cached in cached_contents if model == "gemini-2.5-flash"
+    ] == ["cachedContents/1", "cachedContents/1"]
+
+
+def test_stale_cached_answer_is_refreshed_once(fake_models):
+    from agent.cache import get_answer_cache
+    from agent.configuration import Configuration
+    from agent.graph import _answer_cache_key, builder
+
+    saver = InMemorySaver()
+    graph = builder.compile(checkpointer=saver)
+    configurable = {
+        **TEST_CONFIGURABLE,
+        "max_research_loops": 1,
+        "answer_cache_backend": "memory",
+        # Every cached answer is stale but still served
+        "answer_cache_ttl_seconds": 0,
+        "answer_cache_stale_seconds": 3600,
+    }
+    answer_cache = get_answer_cache(Configuration(**configurable))
+    question = f"storage {uuid.uuid4().hex}?"
+
+    def ask():
+        return graph.ainvoke(
+            {"messages": [HumanMessage(content=question)]},
+            {"configurable": {**configurable, "thread_id": uuid.uuid4().hex}},
+        )
+
+    async def run():
+        await ask()
+        # Two stale hits while the refresh is running
+        await asyncio.gather(ask(), ask())
+        refreshes = list(answer_cache._revalidating.values())
+        await asyncio.gather(*refreshes)
+        return len(refreshes)
+
+    assert asyncio.run(run()) == 1
+    # The refresh searched again and replaced the cached run
+    assert len(fake_models.searched) == 4
+    key = _answer_cache_key(
+        {"messages": [HumanMessage(content=question)]}, Configuration(**configurable)
+    )
+    payload, _ = asyncio.run(answer_cache.get(key))
+    assert payload["search_query"] == fake_models.searched[2:]
+    # It ran on its own thread of the serving run's checkpointer
+    threads = {state.config["configurable"]["thread_id"] for state in saver.list(None)}
+    assert len([thread for thread in threads if thread.startswith("refresh:")]) == 1
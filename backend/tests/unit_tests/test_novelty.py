@@ -0,0 +1,72 @@
+import uuid
+
+from agent.configuration import Configuration
+from agent.novelty import information_gain
+from agent.sources import make_source
+
+SUMMARY = (
+    "Grid-scale lithium iron phosphate storage costs fell sharply in 2024, and "
+    "sodium-ion cells entered pilot deployments in China."
+)
+
+
+def redirect_sources(search_id, sites):
+    # Every grounding response links its pages through fresh redirect urls
+    return [
+        make_source(
+            site,
+            f"https://vertexaisearch.cloud.google.com/id/{search_id}-{n}",
+            f"https://vertexaisearch.cloud.google.com/grounding-api-redirect/{uuid.uuid4().hex}",
+        )
+        for n, site in enumerate(sites)
+    ]
+
+
+def test_loop_repeating_earlier_research_ends_the_research():
+    gain = information_gain(
+        [SUMMARY],
+        [SUMMARY],
+        redirect_sources(1, ["energy", "reuters"]),
+        redirect_sources(0, ["energy", "reuters"]),
+    )
+
+    assert gain["new_sources"] == 0.0
+    assert gain["score"] < Configuration().min_information_gain
+
+
+def test_loop_with_new_sites_and_findings_continues():
+    gain = information_gain(
+        [
+            "Flow batteries using vanadium electrolytes reached 2 GWh of orders in Europe."
+        ],
+        [SUMMARY],
+        redirect_sources(1, ["nature", "iea"]),
+        redirect_sources(0, ["energy", "reuters"]),
+    )
+
+    assert gain["new_sources"] == 1.0
+    assert gain["score"] > Configuration().min_information_gain
+
+
+def test_resolved_sources_count_by_canonical_url():
+    previous = [
+        make_source(
+            "energy",
+            "https://vertexaisearch.cloud.google.com/id/0-0",
+            "https://energy.gov/a",
+        )
+    ]
+    new = [
+        make_source(
+            "energy",
+            "https://vertexaisearch.cloud.google.com/id/1-0",
+            "https://energy.gov/a",
+        ),
+        make_source(
+            "energy",
+            "https://vertexaisearch.cloud.google.com/id/1-1",
+            "https://energy.gov/b",
+        ),
+    ]
+
+    assert information_gain([SUMMARY], [SUMMARY], new, previous)["new_sources"] == 0.5
@@ -0,0 +1,17 @@
+import subprocess
+import sys
+
+
+def test_importing_the_graph_does_not_import_numpy():
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, agent.graph; print('numpy' in sys.modules)",
+        ],
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,86 @@
+import asyncio
+
+from agent.redirects import RedirectResolver, canonicalize_url
+
+
+def resolver(**kwargs):
+    return RedirectResolver(
+        timeout_seconds=5.0, max_concurrency=4, hosts=None, **kwargs
+    )
+
+
+def grounding_link(local_web, n):
+    # A grounding-style link redirecting through a tracking hop to the page
+    local_web.route(f"/page/{n}", body=b"article")
+    local_web.route(
+        f"/redirect/{n}?utm_source=grounding", status=302, location=f"/page/{n}"
+    )
+    return local_web.route(
+        f"/grounding-api-redirect/{n}",
+        status=302,
+        location=f"/redirect/{n}?utm_source=grounding",
+    )
+
+
+def test_redirect_links_resolve_to_the_canonical_page_once(local_web):
+    link = grounding_link(local_web, 1)
+    url_resolver = resolver(allowed_hosts={"127.0.0.1"})
+
+    async def resolve_twice():
+        return await url_resolver.resolve_many(
+            [link, link]
+        ), await url_resolver.resolve(link)
+
+    resolved, again = asyncio.run(resolve_twice())
+
+    assert resolved == {link: f"{local_web.url}/page/1"}
+    assert again == f"{local_web.url}/page/1"
+    assert url_resolver.stats["requests"] == 3
+    assert url_resolver.stats["hits"] == 1
+
+
+def test_expired_links_are_returned_unchanged(local_web):
+    link = local_web.route("/expired/1", status=404)
+    url_resolver = resolver(allowed_hosts={"127.0.0.1"})
+
+    assert asyncio.run(url_resolver.resolve(link)) == link
+    assert url_resolver.stats["failures"] == 1
+
+
+def test_links_redirecting_to_private_addresses_stay_unresolved(local_web):
+    link = local_web.route(
+        "/grounding-api-redirect/1",
+        status=302,
+        location="http://169.254.169.254/latest/",
+    )
+    url_resolver = resolver(allowed_hosts={"127.0.0.1"})
+
+    assert asyncio.run(url_resolver.resolve(link)) == link
+    assert url_resolver.stats["blocked"] == 1
+    assert local_web.requests == ["/grounding-api-redirect/1"]
+
+
+def test_loopback_links_are_not_requested(local_web):
+    link = grounding_link(local_web, 1)
+    url_resolver = resolver()
+
+    assert asyncio.run(url_resolver.resolve(link)) == link
+    assert url_resolver.stats["blocked"] == 1
+    assert local_web.requests == []
+
+
+def test_only_redirect_hosts_are_resolved():
+    url_resolver = RedirectResolver(timeout_seconds=5.0, max_concurrency=4)
+
+    assert not url_resolver.needs_resolving("https://example.com/a")
+    assert url_resolver.needs_resolving(
+        "https://vertexaisearch.cloud.google.com/grounding-api-redirect/abc"
+    )
+
+
+def test_canonicalize_url_drops_tracking_and_defaults():
+    assert (
+        canonicalize_url("HTTPS://Example.COM:443/a?utm_source=x&id=2&gclid=y#top")
+        == "https://example.com/a?id=2"
+    )
+    assert canonicalize_url("http://example.com:8080") == "http://example.com:8080/"
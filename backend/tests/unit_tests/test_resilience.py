@@ -0,0 +1,75 @@
+import asyncio
+from typing import TypedDict
+from uuid import uuid4
+
+from langgraph.graph import END, START, StateGraph
+
+from agent.resilience import get_retry_budget
+
+
+def test_retry_budget_is_shared_within_a_run():
+    config = {
+        "configurable": {
+            "run_id": "run-a",
+            "thread_id": "thread",
+            "retry_budget_per_run": 2,
+        }
+    }
+
+    assert get_retry_budget(config).try_spend()
+    assert get_retry_budget(config).try_spend()
+    assert not get_retry_budget(config).try_spend()
+
+
+def test_retry_budget_is_not_shared_across_runs_of_a_thread():
+    first = {
+        "configurable": {
+            "run_id": "run-b",
+            "thread_id": "long-thread",
+            "retry_budget_per_run": 1,
+        }
+    }
+    second = {
+        "configurable": {
+            "run_id": "run-c",
+            "thread_id": "long-thread",
+            "retry_budget_per_run": 1,
+        }
+    }
+
+    assert get_retry_budget(first).try_spend()
+    assert get_retry_budget(second).try_spend()
+
+
+def test_retry_budget_without_run_id_is_fresh_per_call():
+    config = {"configurable": {"thread_id": "long-thread", "retry_budget_per_run": 1}}
+
+    assert get_retry_budget(config).try_spend()
+    assert get_retry_budget(config).try_spend()
+
+
+def test_nodes_of_one_local_run_share_the_retry_budget():
+    class State(TypedDict, total=False):
+        spent: list[bool]
+
+    def spend(state, config):
+        return {
+            "spent": state.get("spent", []) + [get_retry_budget(config).try_spend()]
+        }
+
+    builder = StateGraph(State)
+    builder.add_node("first", spend)
+    builder.add_node("second", spend)
+    builder.add_edge(START, "first")
+    builder.add_edge("first", "second")
+    builder.add_edge("second", END)
+    graph = builder.compile()
+    config = {"run_id": uuid4(), "configurable": {"retry_budget_per_run": 1}}
+
+    result = asyncio.run(graph.ainvoke({}, config))
+
+    assert result["spent"] == [True, False]
+    assert asyncio.run(graph.ainvoke({}, {**config, "run_id": uuid4()}))["spent"] == [
+        True,
+        False,
+    ]
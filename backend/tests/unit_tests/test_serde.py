@@ -0,0 +1,82 @@
+import logging
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from agent.serde import SourceTableSerializer
+from agent.sources import make_source
+
+SOURCES = [
+    make_source(
+        "a", "https://vertexaisearch.cloud.google.com/id/0-0", "https://a.example/x"
+    ),
+    make_source(
+        "b", "https://vertexaisearch.cloud.google.com/id/0-1", "https://b.example/y"
+    ),
+]
+
+
+def test_source_table_round_trip():
+    serde = SourceTableSerializer()
+    items = [SOURCES[0], SOURCES[1], SOURCES[0]]
+    type_, data = serde.dumps_typed(items)
+    assert type_ == "sources"
+    loaded = serde.loads_typed((type_, data))
+    assert loaded == items
+    assert loaded[0] is loaded[2]
+
+
+def test_single_source_loads_without_unregistered_warning(caplog):
+    serde = SourceTableSerializer()
+    with caplog.at_level(logging.WARNING):
+        loaded = serde.loads_typed(serde.dumps_typed({"source": SOURCES[0]}))
+    assert loaded == {"source": SOURCES[0]}
+    assert "unregistered" not in caplog.text
+
+
+def test_strict_msgpack_resumes_sources_gathered():
+    # Strict mode is read at import time, so it needs a fresh interpreter
+    script = textwrap.dedent(
+        """
+        import asyncio
+        from langgraph.checkpoint.memory import InMemorySaver
+        from agent.graph import builder
+        from agent.sources import make_source
+
+        async def main():
+            saver = InMemorySaver()
+            config = {"configurable": {"thread_id": "t"}}
+            for n in range(2):
+                graph = builder.compile(checkpointer=saver)
+                source = make_source("a", f"https://vertexaisearch.cloud.google.com/id/0-{n}", "https://a.example")
+                await graph.aupdate_state(config, {"sources_gathered": [source]}, as_node="web_research")
+            state = await builder.compile(checkpointer=saver).aget_state(config)
+            print(sorted(source.short_url[-3:] for source in state.values["sources_gathered"]))
+
+        asyncio.run(main())
+        """
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        env={**os.environ, "LANGGRAPH_STRICT_MSGPACK": "true"},
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "['0-0', '0-1']"
+
+
+def test_delta_snapshot_of_sources_round_trip():
+    from agent import serde as serde_module
+
+    if serde_module._DeltaSnapshot is None:
+        pytest.skip("langgraph-checkpoint without delta snapshots")
+    serde = SourceTableSerializer()
+    snapshot = serde_module._DeltaSnapshot(list(SOURCES))
+    type_, data = serde.dumps_typed(snapshot)
+    assert type_ == "sources_snapshot"
+    assert serde.loads_typed((type_, data)) == snapshot
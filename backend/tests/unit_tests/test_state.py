@@ -0,0 +1,18 @@
+from agent.sources import make_source
+from agent.state import add_unique_queries, add_unique_sources
+
+
+def test_add_unique_queries_appends_new_queries_in_order():
+    assert add_unique_queries(["a", "b"], ["b", "c", "a", "d"]) == ["a", "b", "c", "d"]
+    assert add_unique_queries([], ["x", "x"]) == ["x"]
+
+
+def test_add_unique_sources_keeps_the_first_source_per_short_url():
+    first = make_source("one", "https://short/0-0", "https://one.example")
+    second = make_source("two", "https://short/0-1", "https://two.example")
+    same_short_url = make_source("other", "https://short/0-0", "https://other.example")
+
+    merged = add_unique_sources([first], [same_short_url, second, second])
+
+    assert merged == [first, second]
+    assert merged[0] is first
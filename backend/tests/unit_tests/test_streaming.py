@@ -0,0 +1,64 @@
+from agent.sources import make_source
+from agent.streaming import SHORT_URL_PREFIX, ShortUrlRewriter
+from agent.utils import replace_short_urls
+
+SOURCES = [
+    make_source("one", SHORT_URL_PREFIX + "0-1", "https://one.example/a"),
+    make_source("two", SHORT_URL_PREFIX + "0-12", "https://two.example/b"),
+]
+
+
+def stream(text, size):
+    rewriter = ShortUrlRewriter(SOURCES)
+    emitted = [rewriter.feed(text[i : i + size]) for i in range(0, len(text), size)]
+    emitted.append(rewriter.flush())
+    return rewriter, emitted
+
+
+def test_short_urls_split_across_chunks_are_rewritten():
+    text = f"See [one]({SHORT_URL_PREFIX}0-1) and [two]({SHORT_URL_PREFIX}0-12)."
+    expected = "See [one](https://one.example/a) and [two](https://two.example/b)."
+
+    for size in (1, 3, 7, len(text)):
+        rewriter, emitted = stream(text, size)
+
+        assert "".join(emitted) == expected
+        assert rewriter.text == expected
+        assert not any("vertexaisearch" in chunk for chunk in emitted)
+        assert rewriter.used_sources == SOURCES
+
+
+def test_id_continuing_in_the_next_chunk_is_held_back():
+    rewriter = ShortUrlRewriter(SOURCES)
+
+    assert rewriter.feed(f"x {SHORT_URL_PREFIX}0-1") == "x "
+    assert rewriter.feed("2 y") == "https://two.example/b y"
+    assert rewriter.used_sources == [SOURCES[1]]
+
+
+def test_unknown_short_urls_are_stripped_and_partial_prefixes_kept_at_the_end():
+    rewriter = ShortUrlRewriter(SOURCES)
+
+    assert rewriter.feed(f"{SHORT_URL_PREFIX}9-9 then https://vertex") == " then "
+    assert rewriter.flush() == "https://vertex"
+    assert rewriter.used_sources == []
+
+
+def test_citation_links_of_unknown_short_urls_are_stripped_like_the_final_answer():
+    text = (
+        f"Storage grew [one]({SHORT_URL_PREFIX}0-1) [gone]({SHORT_URL_PREFIX}9-9)."
+        f" Prices fell [gone]({SHORT_URL_PREFIX}9-10) [two]({SHORT_URL_PREFIX}0-12)."
+        " See [the report] for more."
+    )
+    expected, _ = replace_short_urls(text, SOURCES)
+    assert expected == (
+        "Storage grew [one](https://one.example/a)."
+        " Prices fell [two](https://two.example/b). See [the report] for more."
+    )
+
+    for size in (1, 3, 7, len(text)):
+        rewriter, emitted = stream(text, size)
+
+        assert "".join(emitted) == expected
+        assert not any("vertexaisearch" in chunk for chunk in emitted)
+        assert rewriter.used_sources == SOURCES
@@ -0,0 +1,90 @@
+from agent.sources import Citation, make_source
+from agent.utils import insert_citation_markers, replace_short_urls
+
+PREFIX = "https://vertexaisearch.cloud.google.com/id/"
+
+
+def source(short_id, value):
+    return make_source("site", PREFIX + short_id, value)
+
+
+def test_replace_short_urls_rewrites_known_and_strips_unknown():
+    sources = [
+        source("1-1", "https://one.example"),
+        source("1-10", "https://ten.example"),
+    ]
+    text = f"a [x]({PREFIX}1-10) b [y]({PREFIX}1-1) c [z]({PREFIX}9-9). d {PREFIX}9-8"
+
+    rewritten, used = replace_short_urls(text, sources)
+
+    assert rewritten == "a [x](https://ten.example) b [y](https://one.example) c. d "
+    assert used == sources
+
+
+def test_replace_short_urls_reports_used_sources_in_input_order():
+    sources = [
+        source("0-0", "https://a.example"),
+        source("0-1", "https://b.example"),
+        source("0-2", "https://c.example"),
+    ]
+
+    _, used = replace_short_urls(
+        f"{PREFIX}0-2 and {PREFIX}0-0 and {PREFIX}0-2", sources
+    )
+
+    assert used == [sources[0], sources[2]]
+
+
+def test_replace_short_urls_without_sources():
+    assert replace_short_urls(f"see [a]({PREFIX}0-0).", []) == ("see.", [])
+
+
+def citation(text, sentence, *sources):
+    # Gemini reports UTF-8 byte offsets, not string offsets
+    start = len(text[: text.index(sentence)].encode("utf-8"))
+    return Citation(start, start + len(sentence.encode("utf-8")), tuple(sources))
+
+
+def test_insert_citation_markers_uses_byte_offsets_after_non_ascii_text():
+    text = "Überblick: Strom kostet 30 €. Speicher wächst schnell. Ende."
+    one, two = (
+        source("0-0", "https://one.example"),
+        source("0-1", "https://two.example"),
+    )
+
+    marked = insert_citation_markers(
+        text,
+        [
+            citation(text, "Speicher wächst schnell.", two),
+            citation(text, "Strom kostet 30 €.", one),
+        ],
+    )
+
+    assert marked == (
+        f"Überblick: Strom kostet 30 €. [site]({PREFIX}0-0) "
+        f"Speicher wächst schnell. [site]({PREFIX}0-1) Ende."
+    )
+
+
+def test_insert_citation_markers_keeps_every_segment_of_a_citation():
+    text = "Solar grew."
+    one, two = (
+        source("0-0", "https://one.example"),
+        source("0-1", "https://two.example"),
+    )
+
+    marked = insert_citation_markers(text, [citation(text, "Solar grew.", one, two)])
+
+    assert marked == f"Solar grew. [site]({PREFIX}0-0) [site]({PREFIX}0-1)"
+
+
+def test_insert_citation_markers_with_string_offsets():
+    text = "Ä b"
+
+    marked = insert_citation_markers(
+        text,
+        [Citation(0, 1, (source("0-0", "https://one.example"),))],
+        offsets_in_bytes=False,
+    )
+
+    assert marked == f"Ä [site]({PREFIX}0-0) b"
@@ -5,6 +5,7 @@ Objetivo: Executar o agente completo e analisar resultados
 ATENÇÃO: Requer GEMINI_API_KEY configurada!
 """
 
+import asyncio
 import os
 import sys
 import time
@@ -64,7 +65,7 @@ def exercicio_1_execucao_simples():
     inicio = time.time()
     
     try:
-        resultado = graph.invoke(estado)
+        resultado = asyncio.run(graph.ainvoke(estado))
         fim = time.time()
         
         print(f"✅ Execução concluída em {fim - inicio:.2f}s")
@@ -121,7 +122,7 @@ def exercicio_2_execucao_detalhada():
     inicio = time.time()
     
     try:
-        resultado = graph.invoke(estado)
+        resultado = asyncio.run(graph.ainvoke(estado))
         fim = time.time()
         
         print(f"✅ Execução concluída em {fim - inicio:.2f}s")
@@ -163,8 +164,7 @@ def analise_resultado_detalhada(resultado):
         print(f"\n📚 Fontes Coletadas: {len(resultado['sources_gathered'])}")
         fontes_unicas = set()
         for fonte in resultado["sources_gathered"]:
-            if isinstance(fonte, dict) and "value" in fonte:
-                fontes_unicas.add(fonte["value"])
+            fontes_unicas.add(fonte.value)
         print(f"  - Fontes únicas: {len(fontes_unicas)}")
     
     # Estatísticas
@@ -219,7 +219,7 @@ def exercicio_3_comparar_configuracoes():
         inicio = time.time()
         
         try:
-            resultado = graph.invoke(estado)
+            resultado = asyncio.run(graph.ainvoke(estado))
             fim = time.time()
             
             resultado_info = {
@@ -4,6 +4,7 @@
 Objetivo: Modificar e personalizar o agente para diferentes casos de uso
 """
 
+import asyncio
 import os
 import sys
 sys.path.append('../backend/src')
@@ -328,7 +329,7 @@ def exercicio_6_teste_personalizado():
         try:
             import time
             inicio = time.time()
-            resultado = graph.invoke(estado_teste)
+            resultado = asyncio.run(graph.ainvoke(estado_teste))
             fim = time.time()
             
             print(f"✅ Teste concluído em {fim - inicio:.2f}s")